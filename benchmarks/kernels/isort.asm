@@ -0,0 +1,84 @@
+# isort.asm
+# --------------------------------------------------------------------
+#   Insertion sort of 160 pseudo-random words.
+#   Exits with 0 if the output is sorted and its sum is preserved.
+
+.data
+  array:    .space 640
+  arrayLen: .word  160
+  seed:     .word  12345
+  lcgMul:   .word  1103515245
+
+.text
+  la    $t7, arrayLen
+  lw    $s0, 0($t7)
+  la    $t7, seed
+  lw    $t1, 0($t7)
+  la    $t7, lcgMul
+  lw    $t2, 0($t7)
+
+  # Fill the array with a linear congruential generator
+  la    $s1, array
+  addu  $t3, $s1, $0
+  addu  $t0, $0, $0
+  addu  $s2, $0, $0   # Sum of the inputs
+gen:
+  mul   $t1, $t1, $t2
+  addiu $t1, $t1, 12345
+  srl   $t4, $t1, 16
+  andi  $t4, $t4, 0x7fff
+  sw    $t4, 0($t3)
+  addu  $s2, $s2, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, gen
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addiu $t0, $0, 1
+outer:
+  sll   $t1, $t0, 2
+  addu  $t1, $s1, $t1   # &a[i]
+  lw    $t2, 0($t1)     # key
+  addu  $t3, $t1, $0    # Slot to fill
+inner:
+  beq   $t3, $s1, place
+  addiu $t5, $t3, -4
+  lw    $t4, 0($t5)
+  subu  $t6, $t2, $t4
+  bgez  $t6, place
+  sw    $t4, 0($t3)
+  addu  $t3, $t5, $0
+  j     inner
+place:
+  sw    $t2, 0($t3)
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, outer
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Check: count inversions and compare the sum
+  addu  $a0, $0, $0
+  lw    $t4, 0($s1)
+  addu  $s3, $t4, $0
+  addu  $t3, $s1, $0
+  addiu $t0, $s0, -1
+check:
+  lw    $t5, 4($t3)
+  addu  $s3, $s3, $t5
+  subu  $t6, $t5, $t4
+  bgez  $t6, check_ok
+  addiu $a0, $a0, 1
+check_ok:
+  addu  $t4, $t5, $0
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  beq   $s3, $s2, done
+  addiu $a0, $a0, 1
+done:
+  addiu $v0, $0, 17
+  syscall
@@ -0,0 +1,54 @@
+# llist.asm
+# --------------------------------------------------------------------
+#   Pointer chasing through a circular linked list of 256 nodes laid
+#   out with a stride of 97 nodes. Exits with 0 if the sum of the
+#   visited values matches.
+
+.data
+  nodes:    .space 2048
+  numNodes: .word  256
+  numSteps: .word  6144
+  expected: .word  783360
+
+.text
+  la    $t7, numNodes
+  lw    $s0, 0($t7)
+
+  # Build the list: node[i] = { &node[(i + 97) % 256], i }
+  la    $s1, nodes
+  addu  $t0, $0, $0
+build:
+  addiu $t1, $t0, 97
+  andi  $t1, $t1, 255
+  sll   $t1, $t1, 3
+  addu  $t1, $s1, $t1
+  sll   $t2, $t0, 3
+  addu  $t2, $s1, $t2
+  sw    $t1, 0($t2)
+  sw    $t0, 4($t2)
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, build
+
+  la    $t7, numSteps
+  lw    $t3, 0($t7)
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addu  $t0, $s1, $0
+  addu  $s2, $0, $0
+chase:
+  lw    $t1, 4($t0)
+  lw    $t0, 0($t0)
+  addu  $s2, $s2, $t1
+  addiu $t3, $t3, -1
+  bne   $t3, $zero, chase
+
+  addiu $v0, $0, 88
+  syscall
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $s2, $t6
+  addiu $v0, $0, 17
+  syscall
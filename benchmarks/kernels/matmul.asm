@@ -0,0 +1,87 @@
+# matmul.asm
+# --------------------------------------------------------------------
+#   Dense integer matrix multiplication (C = A x B) of 16x16 matrices.
+#   Exits with 0 if the checksum of C matches.
+
+.data
+  matA:     .space 1024
+  matB:     .space 1024
+  matC:     .space 1024
+  dim:      .word  16
+  expected: .word  1469440
+
+.text
+  la    $t7, dim
+  lw    $s0, 0($t7)
+
+  # Initialize the inputs: A[i][j] = i + j, B[i][j] = i + 2 * j
+  la    $t1, matA
+  la    $t2, matB
+  addu  $t3, $0, $0
+init_i:
+  addu  $t4, $0, $0
+init_j:
+  addu  $t5, $t3, $t4
+  sw    $t5, 0($t1)
+  addu  $t6, $t4, $t4
+  addu  $t6, $t6, $t3
+  sw    $t6, 0($t2)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t4, $t4, 1
+  bne   $t4, $s0, init_j
+  addiu $t3, $t3, 1
+  bne   $t3, $s0, init_i
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  sll   $s1, $s0, 2   # Row stride in bytes
+  la    $s2, matA     # &A[i][0]
+  la    $s4, matC     # &C[i][j]
+  addu  $t3, $0, $0
+mm_i:
+  addu  $t4, $0, $0
+  la    $s3, matB     # &B[0][j]
+mm_j:
+  addu  $t0, $0, $0
+  addu  $t1, $s2, $0
+  addu  $t2, $s3, $0
+  addu  $t5, $0, $0
+mm_k:
+  lw    $t6, 0($t1)
+  lw    $t7, 0($t2)
+  mul   $t8, $t6, $t7
+  addu  $t0, $t0, $t8
+  addiu $t1, $t1, 4
+  addu  $t2, $t2, $s1
+  addiu $t5, $t5, 1
+  bne   $t5, $s0, mm_k
+  sw    $t0, 0($s4)
+  addiu $s4, $s4, 4
+  addiu $s3, $s3, 4
+  addiu $t4, $t4, 1
+  bne   $t4, $s0, mm_j
+  addu  $s2, $s2, $s1
+  addiu $t3, $t3, 1
+  bne   $t3, $s0, mm_i
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Checksum
+  mul   $t0, $s0, $s0
+  la    $t3, matC
+  addu  $s5, $0, $0
+check:
+  lw    $t4, 0($t3)
+  addu  $s5, $s5, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $s5, $t6
+  addiu $v0, $0, 17
+  syscall
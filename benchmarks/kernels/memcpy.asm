@@ -0,0 +1,95 @@
+# memcpy.asm
+# --------------------------------------------------------------------
+#   Copies a 1 KiB buffer word by word (unrolled by four) and byte by
+#   byte. Exits with 0 if the checksum of both copies matches.
+
+.data
+  src:      .space 1024
+  dstW:     .space 1024
+  dstB:     .space 1024
+  numWords: .word  256
+  numReps:  .word  24
+  expected: .word  130815
+
+.text
+  la    $t7, numWords
+  lw    $s0, 0($t7)
+
+  # Initialize the source: src[i] = 3 * i
+  la    $t1, src
+  addu  $t0, $0, $0
+  addu  $t2, $0, $0
+init:
+  sw    $t2, 0($t1)
+  addiu $t2, $t2, 3
+  addiu $t1, $t1, 4
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, init
+
+  la    $t7, numReps
+  lw    $s1, 0($t7)
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  # Word copy
+word_reps:
+  la    $t1, src
+  la    $t2, dstW
+  sll   $t0, $s0, 2
+  addu  $t3, $t1, $t0
+word_copy:
+  lw    $t4, 0($t1)
+  lw    $t5, 4($t1)
+  lw    $t6, 8($t1)
+  lw    $t7, 12($t1)
+  sw    $t4, 0($t2)
+  sw    $t5, 4($t2)
+  sw    $t6, 8($t2)
+  sw    $t7, 12($t2)
+  addiu $t1, $t1, 16
+  addiu $t2, $t2, 16
+  bne   $t1, $t3, word_copy
+  addiu $s1, $s1, -1
+  bne   $s1, $zero, word_reps
+
+  # Byte copy
+  la    $t1, src
+  la    $t2, dstB
+  sll   $t0, $s0, 2
+  addu  $t3, $t1, $t0
+byte_copy:
+  lbu   $t4, 0($t1)
+  sb    $t4, 0($t2)
+  addiu $t1, $t1, 1
+  addiu $t2, $t2, 1
+  bne   $t1, $t3, byte_copy
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Checksum: sum of the words of dstW and the bytes of dstB
+  addu  $s2, $0, $0
+  la    $t1, dstW
+  addu  $t0, $s0, $0
+check_w:
+  lw    $t4, 0($t1)
+  addu  $s2, $s2, $t4
+  addiu $t1, $t1, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check_w
+
+  la    $t1, dstB
+  sll   $t0, $s0, 2
+check_b:
+  lbu   $t4, 0($t1)
+  addu  $s2, $s2, $t4
+  addiu $t1, $t1, 1
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check_b
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $s2, $t6
+  addiu $v0, $0, 17
+  syscall
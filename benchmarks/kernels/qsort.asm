@@ -0,0 +1,116 @@
+# qsort.asm
+# --------------------------------------------------------------------
+#   Recursive quicksort (Lomuto partitioning) of 256 pseudo-random
+#   words. Exits with 0 if the output is sorted and its sum is
+#   preserved.
+
+.data
+  array:    .space 1024
+  arrayLen: .word  256
+  seed:     .word  4242
+  lcgMul:   .word  1103515245
+
+.text
+  la    $t7, arrayLen
+  lw    $s0, 0($t7)
+  la    $t7, seed
+  lw    $t1, 0($t7)
+  la    $t7, lcgMul
+  lw    $t2, 0($t7)
+
+  # Fill the array with a linear congruential generator
+  la    $s1, array
+  addu  $t3, $s1, $0
+  addu  $t0, $0, $0
+  addu  $s2, $0, $0   # Sum of the inputs
+gen:
+  mul   $t1, $t1, $t2
+  addiu $t1, $t1, 12345
+  srl   $t4, $t1, 16
+  andi  $t4, $t4, 0x7fff
+  sw    $t4, 0($t3)
+  addu  $s2, $s2, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, 1
+  bne   $t0, $s0, gen
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  addu  $a0, $s1, $0
+  sll   $t0, $s0, 2
+  addu  $a1, $s1, $t0
+  addiu $a1, $a1, -4
+  jal   qsort
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Check: count inversions and compare the sum
+  addu  $a0, $0, $0
+  lw    $t4, 0($s1)
+  addu  $s3, $t4, $0
+  addu  $t3, $s1, $0
+  addiu $t0, $s0, -1
+check:
+  lw    $t5, 4($t3)
+  addu  $s3, $s3, $t5
+  subu  $t6, $t5, $t4
+  bgez  $t6, check_ok
+  addiu $a0, $a0, 1
+check_ok:
+  addu  $t4, $t5, $0
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  beq   $s3, $s2, done
+  addiu $a0, $a0, 1
+done:
+  addiu $v0, $0, 17
+  syscall
+
+# qsort($a0 = &a[lo], $a1 = &a[hi])
+qsort:
+  subu  $t0, $a1, $a0
+  blez  $t0, qsort_ret
+  addiu $sp, $sp, -16
+  sw    $ra, 0($sp)
+  sw    $a1, 8($sp)
+
+  # Partition around the last element
+  lw    $t1, 0($a1)     # Pivot
+  addu  $t2, $a0, $0    # Store slot
+  addu  $t3, $a0, $0
+part:
+  beq   $t3, $a1, part_done
+  lw    $t4, 0($t3)
+  subu  $t5, $t4, $t1
+  bgez  $t5, part_next
+  lw    $t6, 0($t2)
+  sw    $t4, 0($t2)
+  sw    $t6, 0($t3)
+  addiu $t2, $t2, 4
+part_next:
+  addiu $t3, $t3, 4
+  j     part
+part_done:
+  lw    $t6, 0($t2)
+  sw    $t1, 0($t2)
+  sw    $t6, 0($a1)
+  sw    $t2, 12($sp)
+
+  # Left half
+  addiu $a1, $t2, -4
+  jal   qsort
+
+  # Right half
+  lw    $t2, 12($sp)
+  addiu $a0, $t2, 4
+  lw    $a1, 8($sp)
+  jal   qsort
+
+  lw    $ra, 0($sp)
+  addiu $sp, $sp, 16
+qsort_ret:
+  jr    $ra
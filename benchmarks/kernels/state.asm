@@ -0,0 +1,96 @@
+# state.asm
+# --------------------------------------------------------------------
+#   A branchy state machine that tokenizes a string into numbers,
+#   words and punctuation. The sum of the numbers, the number of words
+#   and the number of punctuation marks are accumulated over a few
+#   repetitions. Exits with 0 if the checksum matches.
+
+.data
+  text:     .asciiz "the quick brown fox jumps over the lazy dog while 42 zebras count 1234 stars and 7 moons; then, 2048 birds sing 99 songs over 3 hills. pyarchsim models 5 stages, 2 caches and 1 memory."
+  numReps:  .word   16
+  expected: .word   5408528
+
+.text
+  la    $t7, numReps
+  lw    $s0, 0($t7)
+  addu  $s3, $0, $0   # Sum of the numbers
+  addu  $s4, $0, $0   # Number of words
+  addu  $s5, $0, $0   # Number of punctuation marks
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+reps:
+  la    $t0, text
+  addu  $t1, $0, $0   # State: 0 = idle, 1 = number, 2 = word
+  addu  $t2, $0, $0   # Current number
+sm_loop:
+  lbu   $t3, 0($t0)
+  beq   $t3, $zero, sm_end
+  addiu $t4, $t3, -48
+  bltz  $t4, not_digit
+  addiu $t5, $t3, -58
+  bgez  $t5, not_digit
+
+  # Digit
+  addiu $t6, $0, 1
+  beq   $t1, $t6, digit_cont
+  addu  $t2, $0, $0
+digit_cont:
+  addiu $t1, $0, 1
+  sll   $t7, $t2, 3
+  addu  $t7, $t7, $t2
+  addu  $t7, $t7, $t2
+  addu  $t2, $t7, $t4
+  j     sm_next
+
+not_digit:
+  addiu $t6, $0, 1
+  bne   $t1, $t6, flushed
+  addu  $s3, $s3, $t2
+flushed:
+  addiu $t4, $t3, -97
+  bltz  $t4, not_alpha
+  addiu $t5, $t3, -123
+  bgez  $t5, not_alpha
+
+  # Letter
+  addiu $t6, $0, 2
+  beq   $t1, $t6, alpha_cont
+  addiu $s4, $s4, 1
+alpha_cont:
+  addiu $t1, $0, 2
+  j     sm_next
+
+not_alpha:
+  addu  $t1, $0, $0
+  addiu $t4, $t3, -32
+  beq   $t4, $zero, sm_next
+  addiu $s5, $s5, 1
+
+sm_next:
+  addiu $t0, $t0, 1
+  j     sm_loop
+
+sm_end:
+  addiu $t6, $0, 1
+  bne   $t1, $t6, rep_done
+  addu  $s3, $s3, $t2
+rep_done:
+  addiu $s0, $s0, -1
+  bne   $s0, $zero, reps
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Checksum
+  sll   $t0, $s4, 8
+  sll   $t1, $s5, 16
+  addu  $t2, $s3, $t0
+  addu  $t2, $t2, $t1
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $t2, $t6
+  addiu $v0, $0, 17
+  syscall
@@ -0,0 +1,68 @@
+# string.asm
+# --------------------------------------------------------------------
+#   String processing: strlen, upper-casing into a buffer and counting
+#   the spaces, repeated a few times. Exits with 0 if the checksum
+#   matches.
+
+.data
+  text:     .asciiz "the quick brown fox jumps over the lazy dog while 42 zebras count 1234 stars and 7 moons; then, 2048 birds sing 99 songs over 3 hills. pyarchsim models 5 stages, 2 caches and 1 memory."
+  buffer:   .space  256
+  numReps:  .word   8
+  expected: .word   97392
+
+.text
+  la    $t7, numReps
+  lw    $s0, 0($t7)
+  addu  $s1, $0, $0   # Checksum
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+reps:
+  # strlen
+  la    $t0, text
+strlen:
+  lbu   $t1, 0($t0)
+  beq   $t1, $zero, strlen_done
+  addiu $t0, $t0, 1
+  j     strlen
+strlen_done:
+  la    $t1, text
+  subu  $t2, $t0, $t1
+  addu  $s1, $s1, $t2
+
+  # Upper-case the string into the buffer and count the spaces
+  la    $t0, text
+  la    $t1, buffer
+upper:
+  lbu   $t2, 0($t0)
+  beq   $t2, $zero, upper_done
+  addiu $t3, $t2, -32
+  bne   $t3, $zero, not_space
+  addiu $s1, $s1, 1
+not_space:
+  addiu $t3, $t2, -97
+  bltz  $t3, store
+  addiu $t3, $t2, -123
+  bgez  $t3, store
+  addiu $t2, $t2, -32
+store:
+  sb    $t2, 0($t1)
+  addu  $s1, $s1, $t2
+  addiu $t0, $t0, 1
+  addiu $t1, $t1, 1
+  j     upper
+upper_done:
+  sb    $zero, 0($t1)
+
+  addiu $s0, $s0, -1
+  bne   $s0, $zero, reps
+
+  addiu $v0, $0, 88
+  syscall
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $s1, $t6
+  addiu $v0, $0, 17
+  syscall
@@ -0,0 +1,75 @@
+# vvadd.asm
+# --------------------------------------------------------------------
+#   Element-wise addition of two vectors, repeated a few times.
+#   Exits with 0 if the checksum of the result matches.
+
+.data
+  array0:   .space 1024
+  array1:   .space 1024
+  array2:   .space 1024
+  arrayLen: .word  256
+  numReps:  .word  16
+  expected: .word  97920
+
+.text
+  # Initialize the inputs: array0[i] = i, array1[i] = 2 * i
+  la    $t7, arrayLen
+  lw    $t0, 0($t7)
+  la    $t1, array0
+  la    $t2, array1
+  addu  $t4, $0, $0
+init:
+  sw    $t4, 0($t1)
+  addu  $t5, $t4, $t4
+  sw    $t5, 0($t2)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t4, $t4, 1
+  bne   $t4, $t0, init
+
+  la    $t7, numReps
+  lw    $s0, 0($t7)
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+reps:
+  la    $t7, arrayLen
+  lw    $t0, 0($t7)
+  la    $t1, array0
+  la    $t2, array1
+  la    $t3, array2
+vvadd:
+  lw    $t4, 0($t1)
+  lw    $t5, 0($t2)
+  addu  $t4, $t4, $t5
+  sw    $t4, 0($t3)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, vvadd
+
+  addiu $s0, $s0, -1
+  bne   $s0, $zero, reps
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Checksum
+  la    $t7, arrayLen
+  lw    $t0, 0($t7)
+  la    $t3, array2
+  addu  $s1, $0, $0
+check:
+  lw    $t4, 0($t3)
+  addu  $s1, $s1, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $s1, $t6
+  addiu $v0, $0, 17
+  syscall
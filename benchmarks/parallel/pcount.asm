@@ -0,0 +1,91 @@
+# pcount.asm
+# --------------------------------------------------------------------
+#   Shared counters: every core adds 1 to a counter a number of times
+#   with ll/sc, and to another one under a spinlock (taken with ll/sc,
+#   and released with a plain store). Every core then checks in, again
+#   with ll/sc; core 0 waits for all of them, and exits with 0 if both
+#   counters are right.
+
+.data
+  counter:  .word  0
+  locked:   .word  0
+  lock:     .word  0
+  arrived:  .word  0
+  numIters: .word  64
+
+.text
+  addiu $v0, $0, 100 # core ID
+  syscall
+  addu  $s2, $v0, $0
+  addiu $v0, $0, 101 # number of cores
+  syscall
+  addu  $s3, $v0, $0
+
+  la    $t7, numIters
+  lw    $s0, 0($t7)
+  addu  $s1, $s0, $0
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+  # counter += 1, atomically
+  la    $t7, counter
+atomic:
+  ll    $t0, 0($t7)
+  addiu $t0, $t0, 1
+  sc    $t0, 0($t7)
+  beq   $t0, $zero, atomic
+  addiu $s0, $s0, -1
+  bne   $s0, $zero, atomic
+
+  # locked += 1, under the lock
+  la    $t6, lock
+  la    $t7, locked
+acquire:
+  ll    $t0, 0($t6)
+  bne   $t0, $zero, acquire
+  addiu $t0, $0, 1
+  sc    $t0, 0($t6)
+  beq   $t0, $zero, acquire
+  lw    $t1, 0($t7)
+  addiu $t1, $t1, 1
+  sw    $t1, 0($t7)
+  sw    $zero, 0($t6) # release
+  addiu $s1, $s1, -1
+  bne   $s1, $zero, acquire
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Check in
+  la    $t7, arrived
+checkin:
+  ll    $t0, 0($t7)
+  addiu $t0, $t0, 1
+  sc    $t0, 0($t7)
+  beq   $t0, $zero, checkin
+
+  bne   $s2, $zero, finish
+
+  # Core 0 waits for every core
+wait:
+  lw    $t0, 0($t7)
+  bne   $t0, $s3, wait
+
+  # Both counters must be cores * iterations
+  la    $t7, numIters
+  lw    $t0, 0($t7)
+  mul   $t0, $t0, $s3
+  la    $t7, counter
+  lw    $t1, 0($t7)
+  la    $t7, locked
+  lw    $t2, 0($t7)
+  subu  $t1, $t1, $t0
+  subu  $t2, $t2, $t0
+  or    $a0, $t1, $t2
+  addiu $v0, $0, 17
+  syscall
+
+finish:
+  addiu $v0, $0, 10
+  syscall
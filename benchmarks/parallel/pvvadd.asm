@@ -0,0 +1,138 @@
+# pvvadd.asm
+# --------------------------------------------------------------------
+#   Parallel vvadd: every core initializes and adds its own slice of
+#   the vectors, repeated a few times, and then raises its flag. Core 0
+#   waits for the flags of all the cores, and exits with 0 if the
+#   checksum of the result matches. Runs on up to 16 cores.
+
+.data
+  array0:   .space 1024
+  array1:   .space 1024
+  array2:   .space 1024
+  arrayLen: .word  256
+  numReps:  .word  16
+  expected: .word  97920
+  done:     .word  0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+
+.text
+  addiu $v0, $0, 100 # core ID
+  syscall
+  addu  $s2, $v0, $0
+  addiu $v0, $0, 101 # number of cores
+  syscall
+  addu  $s3, $v0, $0
+
+  # There are only 16 flags
+  addiu $t0, $s3, -17
+  bltz  $t0, slice
+  addiu $a0, $0, 1
+  addiu $v0, $0, 17
+  syscall
+
+  # This core gets the elements [start, start + count), with slices of
+  # ceil(len / cores) elements
+slice:
+  la    $t7, arrayLen
+  lw    $t0, 0($t7)
+  addu  $t1, $t0, $s3
+  addiu $t1, $t1, -1
+  divu  $t1, $t1, $s3
+  mul   $s4, $t1, $s2
+  subu  $t2, $t0, $s4
+  subu  $t3, $t2, $t1
+  bgez  $t3, full
+  addu  $t1, $t2, $0
+full:
+  addu  $s5, $t1, $0
+  sll   $s6, $s4, 2
+  blez  $s5, flag
+
+  # Initialize the slice: array0[i] = i, array1[i] = 2 * i
+  la    $t1, array0
+  addu  $t1, $t1, $s6
+  la    $t2, array1
+  addu  $t2, $t2, $s6
+  addu  $t4, $s4, $0
+  addu  $t0, $s5, $0
+init:
+  sw    $t4, 0($t1)
+  addu  $t5, $t4, $t4
+  sw    $t5, 0($t2)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t4, $t4, 1
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, init
+
+  la    $t7, numReps
+  lw    $s0, 0($t7)
+
+  addiu $v0, $0, 88 # ROI
+  syscall
+
+reps:
+  la    $t1, array0
+  addu  $t1, $t1, $s6
+  la    $t2, array1
+  addu  $t2, $t2, $s6
+  la    $t3, array2
+  addu  $t3, $t3, $s6
+  addu  $t0, $s5, $0
+vvadd:
+  lw    $t4, 0($t1)
+  lw    $t5, 0($t2)
+  addu  $t4, $t4, $t5
+  sw    $t4, 0($t3)
+  addiu $t1, $t1, 4
+  addiu $t2, $t2, 4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, vvadd
+
+  addiu $s0, $s0, -1
+  bne   $s0, $zero, reps
+
+  addiu $v0, $0, 88
+  syscall
+
+  # Raise the flag of this core
+flag:
+  la    $t7, done
+  sll   $t0, $s2, 2
+  addu  $t7, $t7, $t0
+  addiu $t0, $0, 1
+  sw    $t0, 0($t7)
+
+  bne   $s2, $zero, finish
+
+  # Core 0 waits for every core
+  la    $t7, done
+  addu  $t0, $s3, $0
+wait:
+  lw    $t1, 0($t7)
+  beq   $t1, $zero, wait
+  addiu $t7, $t7, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, wait
+
+  # Checksum
+  la    $t7, arrayLen
+  lw    $t0, 0($t7)
+  la    $t3, array2
+  addu  $s1, $0, $0
+check:
+  lw    $t4, 0($t3)
+  addu  $s1, $s1, $t4
+  addiu $t3, $t3, 4
+  addiu $t0, $t0, -1
+  bne   $t0, $zero, check
+
+  la    $t7, expected
+  lw    $t6, 0($t7)
+  subu  $a0, $s1, $t6
+  addiu $v0, $0, 17
+  syscall
+
+finish:
+  addiu $v0, $0, 10
+  syscall
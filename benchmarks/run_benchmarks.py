@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+#=====================================================================
+# pyArchSim Benchmarks
+#=====================================================================
+#   Runs a suite of MIPS32 kernels through the simulator and records
+#   the simulator throughput (host cycles per second), the peak RSS,
+#   and the simulated IPC in a JSON history file. Any kernel whose
+#   throughput dropped by more than a threshold compared to the last
+#   recorded run is flagged as a regression.
+
+#--------------------
+# Modify Import Path
+#--------------------
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Constants
+ROOT_INDICATOR = '.__PYTHON_ROOT__'
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+while root_dir and root_dir != '/':
+  if os.path.exists(os.path.join(root_dir, ROOT_INDICATOR)):
+    sys.path.insert(0, root_dir)
+    break
+  root_dir = os.path.dirname(root_dir)
+
+bench_dir   = os.path.dirname(os.path.abspath(__file__))
+kernels_dir = os.path.join(bench_dir, 'kernels')
+
+#--------------------
+# Imports from pyArchSim
+#--------------------
+
+from pyArchSimLib.arch.isa import mips32
+from pyArchSimLib.arch     import assembler
+from pyArchSimLib.system   import BasicSystem
+from pyArchSimLib.sim      import Simulator
+
+#--------------------
+# Benchmarking
+#--------------------
+
+def listKernels():
+  kernels = []
+  for filename in sorted(os.listdir(kernels_dir)):
+    if filename.endswith('.asm'):
+      kernels.append(filename[:-len('.asm')])
+  return kernels
+
+def runKernel(kernel, max_num_cycle):
+  # This runs in a fresh process, so the peak RSS is the kernel's own.
+  with open(os.path.join(kernels_dir, kernel + '.asm'), 'r') as file:
+    raw_asm = file.readlines()
+
+  system = BasicSystem()
+  elf    = assembler(mips32).assemble(raw_asm)
+  system.loader(elf)
+
+  sim = Simulator(system, max_num_cycle)
+
+  start = time.perf_counter()
+  exit_cond, exit_status = sim.run()
+  wall  = time.perf_counter() - start
+
+  stats = sim.getStats()
+
+  result = {}
+  result['cycles'       ] = stats['cycles']
+  result['insts'        ] = stats['insts' ]
+  result['ipc'          ] = stats['ipc'   ]
+  result['roi_ipc'      ] = stats['roi_ipc']
+  result['wall_s'       ] = wall
+  result['cycles_per_s' ] = stats['cycles'] / wall if wall > 0 else 0.0
+  result['peak_rss_kb'  ] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  result['passed'       ] = exit_cond and exit_status == 0
+
+  return result
+
+def runKernelIsolated(kernel, max_num_cycle, reps):
+  ctx  = multiprocessing.get_context('spawn')
+  best = None
+
+  for _ in range(reps):
+    with ctx.Pool(1) as pool:
+      result = pool.apply(runKernel, (kernel, max_num_cycle))
+
+    # Keep the fastest repetition; simulated numbers do not change.
+    if best is None or result['cycles_per_s'] > best['cycles_per_s']:
+      best = result
+
+  return best
+
+def getRevision():
+  try:
+    rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root_dir,
+                         capture_output=True, text=True, check=True)
+    return rev.stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return 'unknown'
+
+#--------------------
+# History
+#--------------------
+
+def loadHistory(filename):
+  if not os.path.exists(filename):
+    return []
+  with open(filename, 'r') as file:
+    return json.load(file)
+
+def saveHistory(filename, history):
+  with open(filename, 'w') as file:
+    json.dump(history, file, indent=2)
+    file.write('\n')
+
+def findRegressions(prev_run, results, threshold):
+  regressions = []
+  if prev_run is None:
+    return regressions
+
+  for kernel, result in results.items():
+    if kernel not in prev_run['results']:
+      continue
+    prev_cps = prev_run['results'][kernel]['cycles_per_s']
+    curr_cps = result['cycles_per_s']
+    if prev_cps > 0 and curr_cps < prev_cps * (1.0 - threshold):
+      regressions.append((kernel, prev_cps, curr_cps))
+
+  return regressions
+
+#--------------------
+# Main
+#--------------------
+
+def main():
+  parser = argparse.ArgumentParser(
+             prog='run_benchmarks',
+             description='Simulator-throughput benchmarks for pyArchSim',
+             epilog='By Khalid Al-Hawaj'
+           )
+
+  parser.add_argument('kernels', nargs='*', help='subset of kernels to run (default: all)')
+  parser.add_argument('-m', '--max-num-cycles', type=int, default=10000000)
+  parser.add_argument('-r', '--reps', type=int, default=3)
+  parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                      help='relative throughput drop flagged as a regression')
+  parser.add_argument('-o', '--history-file', type=str,
+                      default=os.path.join(bench_dir, 'history.json'))
+  parser.add_argument('--label', type=str, default='')
+  parser.add_argument('--no-record', action='store_true')
+
+  args = parser.parse_args()
+
+  kernels = args.kernels if args.kernels else listKernels()
+
+  # Run
+  results = {}
+
+  print('')
+  print(' + Benchmarks:')
+  print('     {: <12} {: >10} {: >10} {: >6} {: >12} {: >10} {: >6}'.format(
+        'kernel', 'cycles', 'insts', 'IPC', 'cycles/s', 'RSS (kB)', 'ok'))
+  for kernel in kernels:
+    result = runKernelIsolated(kernel, args.max_num_cycles, max(1, args.reps))
+    results[kernel] = result
+    print('     {: <12} {: >10} {: >10} {: >6.2f} {: >12.0f} {: >10} {: >6}'.format(
+          kernel, result['cycles'], result['insts'], result['ipc'],
+          result['cycles_per_s'], result['peak_rss_kb'],
+          'yes' if result['passed'] else 'NO'))
+  print('')
+
+  # Compare with the last recorded run
+  history  = loadHistory(args.history_file)
+  prev_run = history[-1] if history else None
+
+  regressions = findRegressions(prev_run, results, args.threshold)
+
+  if prev_run is not None:
+    print(' + Compared to {} ({}):'.format(prev_run['revision'], prev_run['date']))
+    for kernel, result in results.items():
+      if kernel not in prev_run['results']: continue
+      prev_cps = prev_run['results'][kernel]['cycles_per_s']
+      print('     - {: <12} {:+7.2f}%'.format(kernel, 100.0 * (result['cycles_per_s'] / prev_cps - 1.0)))
+    print('')
+
+  for kernel, prev_cps, curr_cps in regressions:
+    print('  WARNING! Throughput regression in \'{}\': {:.0f} -> {:.0f} cycles/s'.format(
+          kernel, prev_cps, curr_cps))
+  if regressions: print('')
+
+  # Record
+  if not args.no_record:
+    run = {}
+    run['date'    ] = datetime.datetime.now().isoformat(timespec='seconds')
+    run['revision'] = getRevision()
+    run['label'   ] = args.label
+    run['python'  ] = sys.version.split()[0]
+    run['results' ] = results
+    history.append(run)
+    saveHistory(args.history_file, history)
+
+  failed = [k for k in results if not results[k]['passed']]
+  for kernel in failed:
+    print('  ERROR! Kernel \'{}\' did not finish successfully.'.format(kernel))
+
+  return 1 if (regressions or failed) else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -2,3 +2,5 @@ from .arch   import *
 from .proc   import *
 from .mem    import *
 from .system import *
+from .stats  import *
+from .sim    import *
@@ -1,3 +1,6 @@
 from .isa import *
 
 from .assembler import assembler
+from .asm_cache import AsmCache
+from .pxe       import Pxe
+from .program_builder import ProgramBuilder
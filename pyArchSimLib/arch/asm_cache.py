@@ -0,0 +1,84 @@
+# asm_cache.py
+# --------------------------------------------------------------------
+#   On-disk cache of assembled binaries.
+#
+#   Entries are keyed by a hash of the source text, the ISA definition
+#   and the assembler itself. Each entry is a pyArchSim executable
+#   (.pxe), which is memory-mapped when it is loaded.
+
+import os
+import inspect
+import hashlib
+import struct
+import tempfile
+
+from pyArchSimLib.arch.assembler import assembler
+from pyArchSimLib.arch.pxe       import Pxe
+
+class AsmCache():
+  VERSION = 2
+
+  def __init__(s, isa, cache_dir=None):
+    if cache_dir is None:
+      cache_dir = AsmCache.getDefaultDir()
+
+    s.cache_dir = cache_dir
+
+    # Everything but the source text that the binary depends on
+    digest = hashlib.sha256()
+    digest.update(isa.fingerprint().encode('utf-8'))
+    with open(inspect.getsourcefile(assembler), 'rb') as file:
+      digest.update(file.read())
+    digest.update(struct.pack('<H', AsmCache.VERSION))
+    s.base_digest = digest
+
+  @staticmethod
+  def getDefaultDir():
+    if 'PASIM_CACHE_DIR' in os.environ:
+      return os.environ['PASIM_CACHE_DIR']
+
+    xdg_cache = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(xdg_cache, 'pyArchSim')
+
+  #=====================================================================
+  # Keys
+  #=====================================================================
+  def getKey(s, raw_asm):
+    digest = s.base_digest.copy()
+    for line in raw_asm:
+      digest.update(line.encode('utf-8'))
+    return digest.hexdigest()
+
+  def getPath(s, key):
+    return os.path.join(s.cache_dir, key[:2], key + '.pxe')
+
+  #=====================================================================
+  # Interface
+  #=====================================================================
+  def load(s, raw_asm):
+    path = s.getPath(s.getKey(raw_asm))
+
+    try:
+      return Pxe.load(path)
+    except OSError:
+      return None
+
+  def store(s, raw_asm, elf):
+    # Included files are not part of the key, and they are
+    # mapped for free anyway; do not cache such binaries.
+    for section in elf['sections'].values():
+      if 'file' in section:
+        return
+
+    path = s.getPath(s.getKey(raw_asm))
+
+    # Write to a temporary file first, so concurrent runs never see a
+    # partially-written entry.
+    try:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+      with os.fdopen(fd, 'wb') as file:
+        file.write(Pxe.serialize(elf))
+      os.replace(tmp_path, path)
+    except OSError:
+      pass # a cache that cannot be written is not an error
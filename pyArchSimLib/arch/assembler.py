@@ -2,405 +2,513 @@
 # --------------------------------------------------------------------
 #   Assembler to generate an executable binary for MIPS32.
 #
+#   The source is processed in a single streaming pass: every line is
+#   tokenized once, labels are entered into the symbol table as they
+#   are encountered, data directives are encoded right away, and the
+#   instructions are recorded with their address. A final fix-up pass
+#   over the recorded instructions encodes them once all the labels
+#   are known.
+#
+#   Host binary files can be included into a section with `.incbin`
+#   and `.incwords`. Their contents are mapped rather than read, and
+#   each of them becomes a segment of its own in the `elf`, so the
+#   loader can hand the mapping to the memory without copying it.
+#
 # Author\ Khalid Al-Hawaj
 # Date  \ 02 May 2025
 
+import ast
+import mmap
 import os
 import re
-import json
-import struct
 import random
+import struct
 
 class assembler():
+  # Patterns are compiled once
+  label_re  = re.compile(r'^[A-Za-z_.$][\w.$]*$')
+  mem_re    = re.compile(r'^([^()]*)\(\s*([^()]*?)\s*\)$')
+  lbl_re    = re.compile(r'^(LSH|MSH)\((.*)\)$')
+  char_re   = re.compile(r"^'(\\?.)'$")
+  dec_re    = re.compile(r'^[+-]?\d+$')
+
+  # Default section layout
+  sections_layout = [('text', 0x0400_0000), ('data', 0x1000_0000)]
+
   def __init__(s, isa):
     s.arch = isa.arch()
     s.dtype_re = isa.dtype_re
 
-  def getAlignment(s, decl):
-    match = s.dtype_re.match(decl)
-
-    elem_sz   = 0
-    num_elems = 0
-
-    if match:
-      dtype = match.group(1).strip()
-      args  = match.group(2).strip()
-
-      dtype_def = s.arch['dtypes'][dtype]
-
-      elem_sz = dtype_def['elem_sz']
-      syntax  = dtype_def['syntax' ]
-
-    return elem_sz
-
-  def getAllocSize(s, decl):
-    match = s.dtype_re.match(decl)
-
-    elem_sz   = 0
-    num_elems = 0
-
-    if match:
-      dtype = match.group(1).strip()
-      args  = match.group(2).strip()
-
-      dtype_def = s.arch['dtypes'][dtype]
-
-      elem_sz = dtype_def['elem_sz']
-      syntax  = dtype_def['syntax' ]
-
-      if   syntax == 'n':
-        num_elems = int(args)
-      elif syntax == 'str':
-        num_elems = len(eval(args))
-      elif syntax == 'strz':
-        num_elems = len(eval(args)) + 1
-      else:
-        num_elems = len(args.split(","))
-
-    return elem_sz, num_elems
-
-  def assembleDataDeclaration(s, decl):
-    match = s.dtype_re.match(decl)
-
-    byte_array = []
-    elem_sz    = 0
-    num_elems  = 0 
+    s.regs   = s.arch['regs'  ]
+    s.dtypes = s.arch['dtypes']
+
+    # The operand syntax comes pre-split from the ISA tables
+    tbl = isa.tables()
+    s.insts = {}
+    for mnemonic, inst_def in s.arch['insts'].items():
+      s.insts[mnemonic] = (tbl['syntax'][tbl['ids'][mnemonic]], inst_def)
+
+  #=====================================================================
+  # Errors
+  #=====================================================================
+  def error(s, lineno, msg):
+    print('')
+    if lineno is None:
+      print('  ERROR! {}'.format(msg))
+    else:
+      print('  ERROR! Line {}: {}'.format(lineno, msg))
+    print('')
+
+    exit(-1)
+
+  #=====================================================================
+  # Literals
+  #=====================================================================
+  # Constant integer expressions are still accepted (e.g., `4 * 10`),
+  # but they are evaluated on a restricted syntax tree instead of eval.
+  def evalExpr(s, node):
+    if isinstance(node, ast.Expression):
+      return s.evalExpr(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+      return node.value
+    if isinstance(node, ast.UnaryOp):
+      val = s.evalExpr(node.operand)
+      if isinstance(node.op, ast.USub  ): return -val
+      if isinstance(node.op, ast.UAdd  ): return  val
+      if isinstance(node.op, ast.Invert): return ~val
+    if isinstance(node, ast.BinOp):
+      lhs = s.evalExpr(node.left )
+      rhs = s.evalExpr(node.right)
+      if isinstance(node.op, ast.Add     ): return lhs +  rhs
+      if isinstance(node.op, ast.Sub     ): return lhs -  rhs
+      if isinstance(node.op, ast.Mult    ): return lhs *  rhs
+      if isinstance(node.op, ast.FloorDiv): return lhs // rhs
+      if isinstance(node.op, ast.Div     ): return int(lhs / rhs)
+      if isinstance(node.op, ast.Mod     ): return lhs %  rhs
+      if isinstance(node.op, ast.LShift  ): return lhs << rhs
+      if isinstance(node.op, ast.RShift  ): return lhs >> rhs
+      if isinstance(node.op, ast.BitOr   ): return lhs |  rhs
+      if isinstance(node.op, ast.BitAnd  ): return lhs &  rhs
+      if isinstance(node.op, ast.BitXor  ): return lhs ^  rhs
+    raise ValueError('not a constant integer expression')
+
+  def parseInt(s, tok, lineno=None):
+    # Fast path: plain decimal/hex/octal/binary literals
+    try:
+      return int(tok, 0)
+    except ValueError:
+      pass
+
+    tok = tok.strip()
+
+    # Decimal with leading zeros
+    if s.dec_re.match(tok):
+      return int(tok, 10)
+
+    # Character literal
+    match = s.char_re.match(tok)
     if match:
-      dtype = match.group(1).strip()
-      args  = match.group(2).strip()
-
-      dtype_def = s.arch['dtypes'][dtype]
-
-      elem_sz = dtype_def['elem_sz']
-      syntax  = dtype_def['syntax' ]
-
-      if syntax == 'n':
-        num_elems = int(args)
-        byte_array = [random.randint(0, 256) for _ in range(num_elems)]
-      elif syntax == 'str':
-        data = eval(args).encode(encoding="utf-8")
-        num_elems = len(data)
-        byte_array = [x for x in data]
-      elif syntax == 'strz':
-        data = eval(args).encode(encoding="utf-8")
-        num_elems = len(data) + 1
-        byte_array = [x for x in data]
-        byte_array.append(0)
-      else:
-        elems = args.split(",")
-        num_elems = len(elems)
-        for elem in elems:
-          data = eval(elem.strip())
-          for i in range(elem_sz):
-            byte_array.append(data & 0xff)
-            data = int(data / 0x100)
-
-    return elem_sz, num_elems, byte_array
-
-  def assembleInstruction(s, pc, inst_str, sym_tbl):
-    inst_parts = inst_str.split(" ")
-
-    byte_array = []
-
-    mnemonics = inst_parts[0].strip()
-    operands  = " ".join(inst_parts[1:]).strip()
-
-    inst_metadata = s.arch['insts'][mnemonics] if mnemonics in s.arch['insts'] else None
-
-    if inst_metadata:
-      op_syntax = inst_metadata['syntax'  ]
-      assemble  = inst_metadata['assemble']
-      opcode    = inst_metadata['opcode'  ]
-      funct     = inst_metadata['funct'   ]
-      cond      = inst_metadata['cond'    ]
-      shamt     = inst_metadata['shamt'   ]
-      code      = inst_metadata['code'    ]
-
-      operands_lst = [x.strip() for x in operands .split(",")]
-      syntax_lst   = [x.strip() for x in op_syntax.split(",")]
-
-      fields = {}
-      fields['opcode'] = opcode
-      fields['rd'    ] = 0
-      fields['rs'    ] = 0
-      fields['rt'    ] = 0
-      fields['shamt' ] = 0
-      fields['imm16' ] = 0
-      fields['imm26' ] = 0
-      fields['funct' ] = funct
-
-      for op,field in zip(operands_lst, syntax_lst):
-        if   field == 'd':
-          fields['rd'] = s.arch['regs'][op]
-        elif field == 'T':
-          fields['rt'] = s.arch['regs'][op]
-        elif field == 's':
-          fields['rs'] = s.arch['regs'][op]
-        elif field == 't':
-          fields['rt'] = s.arch['regs'][op]
-        elif field == 'S':
-          fields['shamt'] = eval(op) & 0x1f
-        elif field == 'i':
-          lbl_re = re.compile(r"(^LSH|^MSH)\((.*)\)$")
-          parsed = lbl_re.match(op.strip())
-          if parsed:
-            addr = sym_tbl[parsed.group(2)]
-            if   parsed.group(1) == 'LSH':
-              op = (addr >>  0) & 0xffff
-            elif parsed.group(1) == 'MSH':
-              op = (addr >> 16) & 0xffff
-            op = '{:#010x}'.format(op)
-          fields['imm16'] = eval(op) & 0xffff
-        elif field == 'm':
-          mem_re = re.compile(r"^([\d]*)\((.*)\)$")
-          parsed = mem_re.match(op)
-          if parsed:
-            offset_str = '0'
-            if parsed.group(1) is not None:
-              offset_str = parsed.group(1).strip()
-            offset = eval(offset_str)
-            base_reg = s.arch['regs'][parsed.group(2).strip()]
-            fields['imm16'] = offset
-            fields['rs'   ] = base_reg
-        elif field == 'p':
-          # We use the PC-relative addressing mode
-          target_pc = sym_tbl[op]
-          offset = int((target_pc - pc - 4) / 4) & 0xffff
-          fields['imm16'] = offset
-        elif field == 'l':
-          # Pseudo-direct addressing mode
-          target_pc = sym_tbl[op]
-          assert(int(pc >> 26) == int(target_pc >> 26))
-          imm = (target_pc >> 2) & 0x3ffffff
-          fields['imm26'] = imm
-
-      # hawajkm: I don't know of a better way to handle the 'cond' field!
-      #          This shows how MIPS is not that elegant after all, aye.
-      if cond is not None:
-        fields['rt'] = cond
-
-      if shamt is not None:
-        fields['shamt'] = shamt
-
-      if code is not None:
-        fields['rs'   ] = (code >> 15) & 0x1f
-        fields['rt'   ] = (code >> 10) & 0x1f
-        fields['rd'   ] = (code >>  5) & 0x1f
-        fields['shamt'] = (code >>  0) & 0x1f
-
-      # Ready?
-      inst = assemble(fields)
-
-      byte_array = []
-      for i in range(4):
-        byte = inst & 0xff
-        byte_array.append(byte)
-        inst = int(inst / 0x100)
+      return ord(ast.literal_eval(tok))
+
+    # Constant expressions
+    try:
+      return s.evalExpr(ast.parse(tok, mode='eval'))
+    except (SyntaxError, ValueError, ZeroDivisionError):
+      s.error(lineno, 'Cannot parse the integer \'{}\'.'.format(tok))
+
+  def parseString(s, tok, lineno=None):
+    tok = tok.strip()
+    if len(tok) < 2 or tok[0] not in '"\'' or tok[-1] != tok[0]:
+      s.error(lineno, 'Cannot parse the string {}.'.format(tok))
+    try:
+      return ast.literal_eval(tok)
+    except (SyntaxError, ValueError):
+      s.error(lineno, 'Cannot parse the string {}.'.format(tok))
+
+  #=====================================================================
+  # Tokenizing
+  #=====================================================================
+  def stripComment(s, line):
+    idx = line.find('#')
+    if idx < 0:
+      return line
+    if '"' not in line and '\'' not in line:
+      return line[:idx]
+
+    # A '#' might be inside a string
+    quote = None
+    i = 0
+    while i < len(line):
+      c = line[i]
+      if quote:
+        if   c == '\\' : i += 1
+        elif c == quote: quote = None
+      elif c == '"' or c == '\'':
+        quote = c
+      elif c == '#':
+        return line[:i]
+      i += 1
+
+    return line
+
+  def splitArgs(s, args):
+    if '"' not in args and '\'' not in args:
+      return [x.strip() for x in args.split(',')]
+
+    # Split on commas outside strings
+    parts = []
+    quote = None
+    start = 0
+    i = 0
+    while i < len(args):
+      c = args[i]
+      if quote:
+        if   c == '\\' : i += 1
+        elif c == quote: quote = None
+      elif c == '"' or c == '\'':
+        quote = c
+      elif c == ',':
+        parts.append(args[start:i].strip())
+        start = i + 1
+      i += 1
+    parts.append(args[start:].strip())
+
+    return parts
+
+  #=====================================================================
+  # Data
+  #=====================================================================
+  def getAlignment(s, dtype):
+    return s.dtypes[dtype]['elem_sz']
+
+  # Floating-point formats of the data types
+  float_fmts = {'float': '<f', 'double': '<d'}
+
+  def packElements(s, dtype, elems, lineno=None):
+    elem_sz = s.dtypes[dtype]['elem_sz']
+
+    buf = bytearray()
+    if dtype in s.float_fmts:
+      for elem in elems:
+        try:
+          fval = float(elem)
+        except ValueError:
+          s.error(lineno, 'Cannot parse the floating-point number \'{}\'.'.format(elem.strip()))
+        buf += struct.pack(s.float_fmts[dtype], fval)
+      return buf
+
+    mask = (1 << (8 * elem_sz)) - 1
+    for elem in elems:
+      val  = s.parseInt(elem, lineno)
+      buf += (val & mask).to_bytes(elem_sz, 'little')
+
+    return buf
+
+  def assembleData(s, dtype, args, lineno=None):
+    dtype_def = s.dtypes[dtype]
+    elem_sz   = dtype_def['elem_sz']
+    syntax    = dtype_def['syntax' ]
+
+    if syntax == 'n':
+      # Uninitialized space
+      num_elems = s.parseInt(args, lineno)
+      return bytearray(random.randbytes(num_elems * elem_sz))
+    elif syntax == 'str' or syntax == 'strz':
+      buf = bytearray()
+      for tok in s.splitArgs(args):
+        buf += s.parseString(tok, lineno).encode(encoding='utf-8')
+        if syntax == 'strz': buf.append(0)
+      return buf
     else:
-      print('')
-      print('  ERROR! Instruction with mnemonics \'{}\' is undefined.'.format(mnemonics))
-      print('')
-
-      exit(-1)
-
-    return byte_array
+      return s.packElements(dtype, s.splitArgs(args), lineno)
+
+  #=====================================================================
+  # Included Files
+  #=====================================================================
+  #   .incbin   "file"[, offset[, length]]   offset/length in bytes
+  #   .incwords "file"[, offset[, count ]]   offset/count  in words
+  def includeFile(s, directive, args, base_dir, lineno=None):
+    toks = s.splitArgs(args)
+    if not toks or len(toks) > 3:
+      s.error(lineno, 'Expected \'.{} "file"[, offset[, length]]\'.'.format(directive))
+
+    filename = s.parseString(toks[0], lineno)
+    if base_dir is not None:
+      filename = os.path.join(base_dir, filename)
+
+    unit   = 4 if directive == 'incwords' else 1
+    offset = s.parseInt(toks[1], lineno) * unit if len(toks) > 1 else 0
+
+    try:
+      with open(filename, 'rb') as file:
+        file_sz = os.fstat(file.fileno()).st_size
+
+        length = s.parseInt(toks[2], lineno) * unit if len(toks) > 2 else file_sz - offset
+        if offset < 0 or length < 0 or offset + length > file_sz:
+          s.error(lineno, 'Range [{}, {}) is outside of \'{}\' ({} bytes).'.format(
+                          offset, offset + length, filename, file_sz))
+        if length % unit != 0:
+          s.error(lineno, 'Size of \'{}\' is not a multiple of {} bytes.'.format(filename, unit))
+
+        if length == 0:
+          return filename, bytearray()
+
+        # A private (copy-on-write) mapping: the program may write to
+        # its data without touching the file.
+        buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    except OSError as e:
+      s.error(lineno, 'Cannot include \'{}\': {}.'.format(filename, e.strerror))
+
+    return filename, memoryview(buf)[offset:offset + length]
+
+  #=====================================================================
+  # Instructions
+  #=====================================================================
+  def getReg(s, op, lineno):
+    reg = s.regs.get(op)
+    if reg is None:
+      s.error(lineno, 'Unknown register \'{}\'.'.format(op))
+    return reg
+
+  def getSymbol(s, sym_tbl, lbl, lineno):
+    addr = sym_tbl.get(lbl)
+    if addr is None:
+      s.error(lineno, 'Undefined label \'{}\'.'.format(lbl))
+    return addr
+
+  def encodeInstruction(s, pc, mnemonic, operands, sym_tbl, lineno=None):
+    inst = s.insts.get(mnemonic)
+    if inst is None:
+      s.error(lineno, 'Instruction with mnemonics \'{}\' is undefined.'.format(mnemonic))
+
+    syntax, inst_def = inst
+
+    if len(operands) != len(syntax):
+      s.error(lineno, '\'{}\' expects {} operand(s), but got {}.'.format(mnemonic, len(syntax), len(operands)))
+
+    fields = {}
+    fields['opcode'] = inst_def['opcode']
+    fields['rd'    ] = 0
+    fields['rs'    ] = 0
+    fields['rt'    ] = 0
+    fields['shamt' ] = 0
+    fields['imm16' ] = 0
+    fields['imm26' ] = 0
+    fields['funct' ] = inst_def['funct']
+
+    for op, field in zip(operands, syntax):
+      if   field == 'd':
+        fields['rd'] = s.getReg(op, lineno)
+      elif field == 'T' or field == 't':
+        fields['rt'] = s.getReg(op, lineno)
+      elif field == 's':
+        fields['rs'] = s.getReg(op, lineno)
+      elif field == 'S':
+        fields['shamt'] = s.parseInt(op, lineno) & 0x1f
+      elif field == 'i':
+        parsed = s.lbl_re.match(op)
+        if parsed:
+          addr = s.getSymbol(sym_tbl, parsed.group(2).strip(), lineno)
+          if parsed.group(1) == 'LSH': imm = (addr >>  0) & 0xffff
+          else                       : imm = (addr >> 16) & 0xffff
+        else:
+          imm = s.parseInt(op, lineno)
+        fields['imm16'] = imm & 0xffff
+      elif field == 'm':
+        parsed = s.mem_re.match(op)
+        if not parsed:
+          s.error(lineno, 'Cannot parse the memory operand \'{}\'.'.format(op))
+        offset_str = parsed.group(1).strip()
+        offset     = s.parseInt(offset_str, lineno) if offset_str else 0
+        fields['imm16'] = offset & 0xffff
+        fields['rs'   ] = s.getReg(parsed.group(2), lineno)
+      elif field == 'p':
+        # We use the PC-relative addressing mode
+        target_pc = s.getSymbol(sym_tbl, op, lineno)
+        fields['imm16'] = ((target_pc - pc - 4) >> 2) & 0xffff
+      elif field == 'l':
+        # Pseudo-direct addressing mode
+        target_pc = s.getSymbol(sym_tbl, op, lineno)
+        if (pc >> 28) != (target_pc >> 28):
+          s.error(lineno, 'Jump target \'{}\' is out of range.'.format(op))
+        fields['imm26'] = (target_pc >> 2) & 0x3ffffff
+
+    # hawajkm: I don't know of a better way to handle the 'cond' field!
+    #          This shows how MIPS is not that elegant after all, aye.
+    cond  = inst_def['cond' ]
+    shamt = inst_def['shamt']
+    code  = inst_def['code' ]
+
+    if cond is not None:
+      fields['rt'] = cond
+
+    if shamt is not None:
+      fields['shamt'] = shamt
+
+    if code is not None:
+      fields['rs'   ] = (code >> 15) & 0x1f
+      fields['rt'   ] = (code >> 10) & 0x1f
+      fields['rd'   ] = (code >>  5) & 0x1f
+      fields['shamt'] = (code >>  0) & 0x1f
+
+    return inst_def['assemble'](fields)
+
+  # Pseudo-instructions expand into (mnemonic, operands) pairs
+  def expandPseudo(s, mnemonic, operands):
+    # Let's support 'la' at least
+    if mnemonic == 'la' and len(operands) == 2:
+      rd, lbl = operands
+      return [('lui', [rd, 'MSH({})'.format(lbl)]),
+              ('ori', [rd, rd, 'LSH({})'.format(lbl)])]
+    return [(mnemonic, operands)]
+
+  #=====================================================================
+  # Assembling
+  #=====================================================================
+  def makeSection(s, base_addr):
+    section = {}
+    section['base_addr'] = base_addr
+    section['bytes'    ] = bytearray()
+    return section
+
+  def align(s, section, alignment):
+    misalign = (section['base_addr'] + len(section['bytes'])) % alignment
+    if misalign != 0:
+      padding_sz = alignment - misalign
+      section['bytes'] += random.randbytes(padding_sz)
+
+  def assemble(s, raw_asm, base_dir=None):
+    # Symbol table
+    sym_tbl = {}
 
-  def getElem(s, elem):
-    if isinstance(elem, str):
-      return '\'{}\''.format(elem)
-    else:
-      return '{}'.format(elem)
-
-  def assemble(s, raw_asm):
-    arch = s.arch
-
-    # Remove comments and empty lines
-    comm = re.compile(f'([^#]*)(#.*$)')
-    asm = []
-    for line in raw_asm:
-      match = comm.match(line)
-      if match is not None:
-        line = match.group(1)
-      if line.strip():
-        asm.append(line.strip())
-
-    # Inline all labels
-    old_asm = asm
-    asm = []
-    buffer = ''
-    for line in old_asm:
-      buffer = buffer + line
-      if line.endswith(':'):
-        buffer = buffer + ' '
+    # Sections; each one is a list of segments, the last of which is
+    # the one being appended to.
+    sections = {}
+    for name, base_addr in s.sections_layout:
+      sections[name] = [s.makeSection(base_addr)]
+
+    # By default, we are in the text section
+    section_name = 'text'
+    section      = sections[section_name][-1]
+
+    # Instructions waiting for the fix-up pass:
+    #   (section, offset, mnemonic, operands, lineno)
+    insts = []
+
+    # Labels waiting for the next statement to learn their address
+    pending_labels = []
+
+    dtypes    = s.dtypes
+    label_re  = s.label_re
+
+    for lineno, line in enumerate(raw_asm, 1):
+      line = s.stripComment(line).strip()
+      if not line:
+        continue
+
+      # Labels
+      while True:
+        idx = line.find(':')
+        if idx <= 0:
+          break
+        lbl = line[:idx].strip()
+        if not label_re.match(lbl):
+          break
+        pending_labels.append(lbl)
+        line = line[idx + 1:].strip()
+
+      if not line:
+        continue
+
+      parts    = line.split(None, 1)
+      keyword  = parts[0]
+      args     = parts[1].strip() if len(parts) > 1 else ''
+
+      if keyword[0] == '.':
+        directive = keyword[1:]
+        lower     = directive.lower()
+
+        if   lower == 'data' or lower == 'text':
+          section_name = lower
+          section      = sections[section_name][-1]
+          continue
+        elif lower == 'globl' or lower == 'global':
+          continue
+        elif lower == 'align':
+          s.align(section, 1 << s.parseInt(args, lineno))
+        elif lower == 'incbin':
+          pass
+        elif lower == 'incwords':
+          s.align(section, 4)
+        elif directive in dtypes:
+          s.align(section, s.getAlignment(directive))
+        else:
+          s.error(lineno, 'Unknown directive \'{}\'.'.format(keyword))
+
+        # Labels point to the aligned address
+        addr = section['base_addr'] + len(section['bytes'])
+        for lbl in pending_labels:
+          if lbl not in sym_tbl: sym_tbl[lbl] = addr # hawajkm: throw error
+        pending_labels = []
+
+        if directive in dtypes:
+          section['bytes'] += s.assembleData(directive, args, lineno)
+        elif lower == 'incbin' or lower == 'incwords':
+          filename, buf = s.includeFile(lower, args, base_dir, lineno)
+
+          # The file becomes a segment of its own, followed by a new
+          # segment for whatever comes next in the section.
+          segment = s.makeSection(addr)
+          segment['bytes'] = buf
+          segment['file' ] = filename
+
+          section = s.makeSection(addr + len(buf))
+          sections[section_name] += [segment, section]
       else:
-        asm.append(buffer)
-        buffer = ''
+        # Instructions are always word-aligned
+        s.align(section, 4)
 
-    # Process pseudo-instructions
-    # As if, lol...
+        addr = section['base_addr'] + len(section['bytes'])
+        for lbl in pending_labels:
+          if lbl not in sym_tbl: sym_tbl[lbl] = addr # hawajkm: throw error
+        pending_labels = []
 
-    # Let's support 'la' at least
-    la_re = re.compile(r'(^.*)(la)\s+(.*)\s*,\s*(.*)\s*$')
-    old_asm = asm
-    asm = []
-    buffer = ''
-    for line in old_asm:
-      buffer = buffer + line
-      if line.endswith(':'):
-        buffer = buffer + ' '
-      else:
-        parsed = la_re.match(buffer)
+        operands = [x.strip() for x in args.split(',')] if args else []
 
-        if parsed:
-          rd  = parsed.group(3)
-          lbl = parsed.group(4)
-          expand  = ''
-          expand +=        'lui {}, MSH({})'.format(rd, lbl)
-          expand += '\n' + 'ori {}, {}, LSH({})'.format(rd, rd, lbl)
-          buffer  = parsed.group(1) + expand
+        for mnemonic, ops in s.expandPseudo(keyword, operands):
+          insts.append((section, len(section['bytes']), mnemonic, ops, lineno))
+          section['bytes'] += b'\x00\x00\x00\x00'
 
-        buffers = buffer.split('\n')
-        for buf in buffers:
-          asm.append(buf)
-        buffer = ''
+    # Dangling labels point to the end of the active section
+    addr = section['base_addr'] + len(section['bytes'])
+    for lbl in pending_labels:
+      if lbl not in sym_tbl: sym_tbl[lbl] = addr
 
-    # After this point, there should NEVER be any additions to static code
-    # hawajkm: we perhaps do not need en elaborate code to handle symbols?
+    s.fixup(insts, sym_tbl)
 
-    # Symbol table
-    sym_tbl = {}
+    return s.makeElf(sections, sym_tbl)
 
-    # Two sections: Data and Text
-    text_section = {'base_addr': 0x0400_0000,
-                    'bytes'    : [],
-                    'raw'      : [],
-                    'curr_addr': 0}
-    data_section = {'base_addr': 0x1000_0000,
-                    'bytes'    : [],
-                    'raw'      : [],
-                    'curr_addr': 0}
-
-    lst_dtypes = r'|'.join([r'\.' + x for x in s.arch['dtypes']])
-    data_directive = re.compile(r'(^{})(.*$)'.format(lst_dtypes))
-
-    # Fill-in the raw part of the sections and construct the symbol table
-    curr_section = 0 # By default, we are in the text section
-
-    # Initialize
-    text_section['curr_addr'] = text_section['base_addr']
-    data_section['curr_addr'] = data_section['base_addr']
-
-    for line in asm:
-      if   line.lower() == '.data':
-        curr_section = 1
-      elif line.lower() == '.text':
-        curr_section = 0
-      else:
-        # Get active section
-        section = None
-        if   curr_section == 0:
-          section = text_section
-        elif curr_section == 1:
-          section = data_section
-
-        # Get all labels
-        parts = [x.strip() for x in line.split(':')]
-        labels = parts[0:-1]
-        line   = parts[-1]
-
-        # Get address
-        addr = section['curr_addr']
-
-        # Process data
-        isDataDirective = s.dtype_re.match(line)
-        if isDataDirective:
-          elem_sz = s.getAlignment(line)
-          if addr % elem_sz != 0:
-            addr = addr + (elem_sz - (addr % elem_sz))
-            section['curr_addr'] = addr
-
-        # Add labels
-        for label in labels:
-          if label in sym_tbl:
-            continue # hawajkm: throw error
-          else:
-            sym_tbl[label] = addr
-
-        allocSize = 4
-
-        # Process data
-        isDataDirective = s.dtype_re.match(line)
-        if isDataDirective:
-          directive = isDataDirective.group(1).strip()
-          elems     = isDataDirective.group(2).strip()
-
-          elems = elems.replace(r'"', r"'")
-          elems_decl = eval(r"[{}]".format(elems))
-          line = [r'.' + directive + ' ' + s.getElem(x) for x in elems_decl]
-
-          allocSize = 0
-          for alloc in line:
-            elem_sz, num_elems = s.getAllocSize(alloc)
-            allocSize += (num_elems * elem_sz)
-
-        section['curr_addr'] += allocSize
-
-        # Add to section
-        if type(line) is list:
-          section['raw'].extend(line)
-        else:
-          section['raw'].append(line)
-
-    # Substitute symbols
-
-    # Generate binary
-    ## Start with data section
-    addr = data_section['base_addr']
-    for decl in data_section['raw']:
-      elem_sz, num_elems, byte_array = s.assembleDataDeclaration(decl)
-      if addr % elem_sz != 0:
-        padding_sz = elem_sz - (addr % elem_sz)
-        addr += padding_sz
-        # Add padding
-        data_section['bytes'].extend([random.randint(0, 256) for _ in range(padding_sz)])
-      data_section['bytes'].extend(byte_array)
-      addr += (num_elems * elem_sz)
-
-    ## Now, we do the text section
-    addr = text_section['base_addr']
-    for inst in text_section['raw']:
-      byte_array = s.assembleInstruction(addr, inst, sym_tbl)
-      # All instructions should be aligned
-      text_section['bytes'].extend(byte_array)
-      addr += len(byte_array)
-
-    # Print it?
-    #print('Text Section:----------------------')
-    #print(os.linesep.join(['  ' + x for x in text_section['raw']]))
-    #print('-----------------------------------')
-    #print('Data Section:----------------------')
-    #print(os.linesep.join(['  ' + x for x in data_section['raw']]))
-    #print('-----------------------------------')
-    #print('Symbol Table:----------------------')
-    #for x in sym_tbl:
-    #  print("{} | {:#010x}".format(x.ljust(15), sym_tbl[x]))
-    #print('-----------------------------------')
-    #print('Assembled Data Section:------------', end='')
-    #i = 0
-    #for i in range(len(data_section['bytes'])):
-    #  if i % 16 == 0: print('\n{:#010x}  '.format(data_section['base_addr'] + i), end='')
-    #  print("{:02x} ".format(data_section['bytes'][i]), end='')
-    #print('\n-----------------------------------')
-    #print('Assembled Text Section:------------', end='')
-    #i = 0
-    #for i in range(len(text_section['bytes'])):
-    #  if i % 16 == 0: print('\n{:#010x}  '.format(text_section['base_addr'] + i), end='')
-    #  print("{:02x} ".format(text_section['bytes'][i]), end='')
-    #print('\n-----------------------------------')
+  # Fix-up pass: encode the instructions now that all labels are known
+  def fixup(s, insts, sym_tbl):
+    for section, offset, mnemonic, operands, lineno in insts:
+      pc   = section['base_addr'] + offset
+      inst = s.encodeInstruction(pc, mnemonic, operands, sym_tbl, lineno)
+      section['bytes'][offset:offset + 4] = inst.to_bytes(4, 'little')
 
+  # The first segment keeps the name of the section; the others are
+  # numbered (e.g., 'data', 'data.1', ...). Empty ones are dropped.
+  # Execution starts at the beginning of the text section.
+  def makeElf(s, sections, sym_tbl):
     elf = {}
+    elf['entry'   ] = sections['text'][0]['base_addr']
+    elf['sym_tbl' ] = dict(sym_tbl)
     elf['sections'] = {}
-    elf['sections']['data'] = data_section
-    elf['sections']['text'] = text_section
+    for name in ['data', 'text']:
+      elf['sections'][name] = sections[name][0]
+      idx = 1
+      for segment in sections[name][1:]:
+        if len(segment['bytes']) > 0:
+          elf['sections']['{}.{}'.format(name, idx)] = segment
+          idx += 1
 
     return elf
@@ -10,10 +10,18 @@ import re
 import json
 import struct
 import random
+import hashlib
+import inspect
 
 class mips32():
   __arch__ = None
 
+  # Register roles, as used by the read/write masks
+  REG_RS = 0x1
+  REG_RT = 0x2
+  REG_RD = 0x4
+  REG_RA = 0x8 # implicit $ra (e.g., jal)
+
   #=============================================
   # Formats
   #=============================================
@@ -57,17 +65,25 @@ class mips32():
     ret['cond'    ] = None
     ret['shamt'   ] = None
     ret['code'    ] = None
+    ret['type'    ] = None
+    ret['exec'    ] = None
+    ret['link'    ] = False
+    ret['mem_sz'  ] = 0
+    ret['mem_sext'] = False
+    ret['atomic'  ] = False
 
     return ret
 
   @classmethod
-  def define_alu_1r2r(cls, opcode, funct=0, shamt=None):
+  def define_alu_1r2r(cls, opcode, funct=0, shamt=None, exec_name=None):
     ret = cls.define_base()
     ret['syntax'  ] = 'd,s,t'
     ret['assemble'] = cls.rformat
     ret['opcode'  ] = opcode
     ret['funct'   ] = funct
     ret['shamt'   ] = shamt
+    ret['type'    ] = 'alu'
+    ret['exec'    ] = exec_name
     return ret
 
   @classmethod
@@ -78,14 +94,17 @@ class mips32():
     ret['opcode'  ] = opcode
     ret['funct'   ] = funct
     ret['shamt'   ] = shamt
+    ret['type'    ] = 'alu'
     return ret
 
   @classmethod
-  def define_alu_1r1r1i(cls, opcode):
+  def define_alu_1r1r1i(cls, opcode, exec_name=None):
     ret = cls.define_base()
     ret['syntax'  ] = 'T,s,i'
     ret['assemble'] = cls.iformat
     ret['opcode'  ] = opcode
+    ret['type'    ] = 'alu'
+    ret['exec'    ] = exec_name
     return ret
 
   @classmethod
@@ -94,22 +113,47 @@ class mips32():
     ret['syntax'  ] = 'T,i'
     ret['assemble'] = cls.iformat
     ret['opcode'  ] = opcode
+    ret['type'    ] = 'alu'
     return ret
 
   @classmethod
-  def define_mem_ld(cls, opcode):
+  def define_mem_ld(cls, opcode, size, sext=False):
     ret = cls.define_base()
     ret['syntax'  ] = 'T,m'
     ret['assemble'] = cls.iformat
     ret['opcode'  ] = opcode
+    ret['type'    ] = 'load'
+    ret['exec'    ] = 'load'
+    ret['mem_sz'  ] = size
+    ret['mem_sext'] = sext
     return ret
 
   @classmethod
-  def define_mem_st(cls, opcode):
+  def define_mem_st(cls, opcode, size):
     ret = cls.define_base()
     ret['syntax'  ] = 't,m'
     ret['assemble'] = cls.iformat
     ret['opcode'  ] = opcode
+    ret['type'    ] = 'store'
+    ret['exec'    ] = 'store'
+    ret['mem_sz'  ] = size
+    return ret
+
+  # Load-linked: a load that also sets the link of the core
+  @classmethod
+  def define_mem_ll(cls, opcode, size):
+    ret = cls.define_mem_ld(opcode, size)
+    ret['exec'    ] = 'll'
+    ret['atomic'  ] = True
+    return ret
+
+  # Store-conditional: a store that only happens if the link is still
+  # set, and writes whether it did (1 or 0) to rt
+  @classmethod
+  def define_mem_sc(cls, opcode, size):
+    ret = cls.define_mem_st(opcode, size)
+    ret['exec'    ] = 'sc'
+    ret['atomic'  ] = True
     return ret
 
   @classmethod
@@ -119,6 +163,7 @@ class mips32():
     ret['assemble'] = cls.iformat
     ret['opcode'  ] = opcode
     ret['cond'    ] = cond
+    ret['type'    ] = 'branch'
     return ret
 
   @classmethod
@@ -128,14 +173,17 @@ class mips32():
     ret['assemble'] = cls.iformat
     ret['opcode'  ] = opcode
     ret['cond'    ] = cond
+    ret['type'    ] = 'branch'
     return ret
 
   @classmethod
-  def define_jump_0r(cls, opcode, funct=0):
+  def define_jump_0r(cls, opcode, funct=0, link=False):
     ret = cls.define_base()
     ret['syntax'  ] = 'l'
     ret['assemble'] = cls.jformat
     ret['opcode'  ] = opcode
+    ret['type'    ] = 'jump'
+    ret['link'    ] = link
     return ret
 
   @classmethod
@@ -147,6 +195,7 @@ class mips32():
     ret['funct'   ] = funct
     ret['cond'    ] = cond
     ret['shamt'   ] = shamt
+    ret['type'    ] = 'jump_r'
     return ret
 
   @classmethod
@@ -157,6 +206,7 @@ class mips32():
     ret['opcode'  ] = opcode
     ret['funct'   ] = funct
     ret['code'    ] = code
+    ret['type'    ] = 'syscall'
     return ret
 
   #=============================================
@@ -168,6 +218,33 @@ class mips32():
       cls.initialize_arch()
     return cls.__arch__
 
+  @classmethod
+  def tables(cls):
+    return cls.arch()['tables']
+
+  # A digest of everything that affects the encoding of a program; used
+  # to key caches of assembled binaries.
+  @classmethod
+  def fingerprint(cls):
+    arch = cls.arch()
+
+    desc = {}
+    desc['isa'   ] = cls.__name__
+    desc['regs'  ] = arch['regs'  ]
+    desc['dtypes'] = arch['dtypes']
+    desc['insts' ] = {}
+    for mnemonic, inst_def in arch['insts'].items():
+      inst_desc = dict(inst_def)
+      inst_desc['assemble'] = inst_def['assemble'].__name__
+      desc['insts'][mnemonic] = inst_desc
+
+    # The encoders are only named above; their code (and that of the
+    # tables) is in the source of the ISA
+    digest = hashlib.sha256(json.dumps(desc, sort_keys=True).encode('utf-8'))
+    with open(inspect.getsourcefile(cls), 'rb') as file:
+      digest.update(file.read())
+    return digest.hexdigest()
+
   #=============================================
   # Architecture Definition
   #   hawajkm: we need an automated way to parse
@@ -281,9 +358,9 @@ class mips32():
     cls.__arch__['insts'] = {}
     ## ALU Reg-Reg
     cls.__arch__['insts']['add'    ] = cls.define_alu_1r2r  (0x00, 0x20)
-    cls.__arch__['insts']['addu'   ] = cls.define_alu_1r2r  (0x00, 0x21)
+    cls.__arch__['insts']['addu'   ] = cls.define_alu_1r2r  (0x00, 0x21, exec_name='add')
     cls.__arch__['insts']['sub'    ] = cls.define_alu_1r2r  (0x00, 0x22)
-    cls.__arch__['insts']['subu'   ] = cls.define_alu_1r2r  (0x00, 0x23)
+    cls.__arch__['insts']['subu'   ] = cls.define_alu_1r2r  (0x00, 0x23, exec_name='sub')
     cls.__arch__['insts']['and'    ] = cls.define_alu_1r2r  (0x00, 0x24)
     cls.__arch__['insts']['or'     ] = cls.define_alu_1r2r  (0x00, 0x25)
     cls.__arch__['insts']['xor'    ] = cls.define_alu_1r2r  (0x00, 0x26)
@@ -301,7 +378,7 @@ class mips32():
 
     ## ALU Reg-Imm
     cls.__arch__['insts']['addi'   ] = cls.define_alu_1r1r1i(0x08)
-    cls.__arch__['insts']['addiu'  ] = cls.define_alu_1r1r1i(0x09)
+    cls.__arch__['insts']['addiu'  ] = cls.define_alu_1r1r1i(0x09, exec_name='addi')
     cls.__arch__['insts']['andi'   ] = cls.define_alu_1r1r1i(0x0c)
     cls.__arch__['insts']['ori'    ] = cls.define_alu_1r1r1i(0x0d)
     cls.__arch__['insts']['xori'   ] = cls.define_alu_1r1r1i(0x0e)
@@ -316,14 +393,16 @@ class mips32():
     cls.__arch__['insts']['srav'   ] = cls.define_alu_1r2r  (0x00, 0x07)
 
     ## Memory
-    cls.__arch__['insts']['lb'     ] = cls.define_mem_ld    (0x20)
-    cls.__arch__['insts']['lh'     ] = cls.define_mem_ld    (0x21)
-    cls.__arch__['insts']['lw'     ] = cls.define_mem_ld    (0x23)
-    cls.__arch__['insts']['lbu'    ] = cls.define_mem_ld    (0x24)
-    cls.__arch__['insts']['lhu'    ] = cls.define_mem_ld    (0x25)
-    cls.__arch__['insts']['sb'     ] = cls.define_mem_st    (0x28)
-    cls.__arch__['insts']['sh'     ] = cls.define_mem_st    (0x29)
-    cls.__arch__['insts']['sw'     ] = cls.define_mem_st    (0x2b)
+    cls.__arch__['insts']['lb'     ] = cls.define_mem_ld    (0x20, 1, sext=True)
+    cls.__arch__['insts']['lh'     ] = cls.define_mem_ld    (0x21, 2, sext=True)
+    cls.__arch__['insts']['lw'     ] = cls.define_mem_ld    (0x23, 4)
+    cls.__arch__['insts']['lbu'    ] = cls.define_mem_ld    (0x24, 1)
+    cls.__arch__['insts']['lhu'    ] = cls.define_mem_ld    (0x25, 2)
+    cls.__arch__['insts']['sb'     ] = cls.define_mem_st    (0x28, 1)
+    cls.__arch__['insts']['sh'     ] = cls.define_mem_st    (0x29, 2)
+    cls.__arch__['insts']['sw'     ] = cls.define_mem_st    (0x2b, 4)
+    cls.__arch__['insts']['ll'     ] = cls.define_mem_ll    (0x30, 4)
+    cls.__arch__['insts']['sc'     ] = cls.define_mem_sc    (0x38, 4)
 
     ## Branches
     cls.__arch__['insts']['beq'    ] = cls.define_branch_2r (0x04)
@@ -335,7 +414,7 @@ class mips32():
 
     ## Jumps
     cls.__arch__['insts']['j'      ] = cls.define_jump_0r   (0x02)
-    cls.__arch__['insts']['jal'    ] = cls.define_jump_0r   (0x03)
+    cls.__arch__['insts']['jal'    ] = cls.define_jump_0r   (0x03, link=True)
     cls.__arch__['insts']['jr'     ] = cls.define_jump_1r   (0x00, 0x08)
 
     ## Syscall
@@ -344,3 +423,125 @@ class mips32():
     #cls.lst_dtypes = r'|'.join([r'\.' + x for x in cls.__arch__['dtypes']])
     cls.lst_dtypes = r'|'.join([r'\b{}\b'.format(x) for x in cls.__arch__['dtypes']])
     cls.dtype_re = re.compile(r'^\.({})(.*$)'.format(cls.lst_dtypes))
+
+    # Lookup tables
+    cls.__arch__['tables'] = cls.compile_tables(cls.__arch__['insts'])
+
+  #=============================================
+  # Precompiled Tables
+  #   Everything the assembler and the cores need
+  #   to know about an instruction, indexed by an
+  #   instruction ID. ID 0 is the undefined
+  #   instruction.
+  #=============================================
+  @classmethod
+  def compile_tables(cls, insts):
+    tbl = {}
+
+    # Instruction IDs
+    tbl['mnemonic'] = ['undef'] + list(insts.keys())
+    tbl['ids'     ] = {mnemonic: iid for iid, mnemonic in enumerate(tbl['mnemonic'])}
+
+    num_insts = len(tbl['mnemonic'])
+
+    # Per-instruction attributes
+    tbl['syntax'   ] = [()    for _ in range(num_insts)]
+    tbl['type'     ] = [None  for _ in range(num_insts)]
+    tbl['rmask'    ] = [0     for _ in range(num_insts)]
+    tbl['wmask'    ] = [0     for _ in range(num_insts)]
+    tbl['is_mem'   ] = [False for _ in range(num_insts)]
+    tbl['is_branch'] = [False for _ in range(num_insts)]
+    tbl['mem_sz'   ] = [0     for _ in range(num_insts)]
+    tbl['mem_sext' ] = [False for _ in range(num_insts)]
+    tbl['is_atomic'] = [False for _ in range(num_insts)]
+    tbl['exec'     ] = [0     for _ in range(num_insts)]
+
+    # Execute handlers; instructions with the same semantics share one
+    tbl['exec_names'] = ['undef']
+
+    for mnemonic, inst_def in insts.items():
+      iid    = tbl['ids'][mnemonic]
+      syntax = tuple(x.strip() for x in inst_def['syntax'].split(',') if x.strip())
+
+      rmask = 0
+      wmask = 0
+      for op in syntax:
+        if   op == 's' or op == 'm': rmask |= cls.REG_RS
+        elif op == 't'             : rmask |= cls.REG_RT
+        elif op == 'd'             : wmask |= cls.REG_RD
+        elif op == 'T'             : wmask |= cls.REG_RT
+      if inst_def['link']:
+        wmask |= cls.REG_RA
+      if inst_def['atomic'] and inst_def['type'] == 'store':
+        wmask |= cls.REG_RT
+
+      exec_name = inst_def['exec'] or mnemonic
+      if exec_name not in tbl['exec_names']:
+        tbl['exec_names'].append(exec_name)
+
+      tbl['syntax'   ][iid] = syntax
+      tbl['type'     ][iid] = inst_def['type']
+      tbl['rmask'    ][iid] = rmask
+      tbl['wmask'    ][iid] = wmask
+      tbl['is_mem'   ][iid] = inst_def['type'] in ('load', 'store')
+      tbl['is_branch'][iid] = inst_def['type'] in ('branch', 'jump', 'jump_r')
+      tbl['mem_sz'   ][iid] = inst_def['mem_sz']
+      tbl['mem_sext' ][iid] = inst_def['mem_sext']
+      tbl['is_atomic'][iid] = inst_def['atomic']
+      tbl['exec'     ][iid] = tbl['exec_names'].index(exec_name)
+
+    # Decoding: a flat 64x64 table indexed by (opcode << 6) | funct.
+    # Only R-format instructions are told apart by their funct; the
+    # others fill all the slots of their opcode. Slots shared by a few
+    # instructions (e.g., mul/muh, bltz/bgez) hold -(k + 1), where k is
+    # a 32-entry block of `decode_ext` indexed by the field at bit
+    # `decode_ext_shift[k]` (shamt or cond).
+    slots = {}
+    for mnemonic, inst_def in insts.items():
+      opcode = inst_def['opcode']
+      if inst_def['assemble'] == cls.rformat:
+        functs = [inst_def['funct']]
+      else:
+        functs = range(64)
+
+      for funct in functs:
+        slots.setdefault((opcode << 6) | funct, []).append(mnemonic)
+
+    tbl['decode'          ] = [0 for _ in range(64 * 64)]
+    tbl['decode_ext'      ] = []
+    tbl['decode_ext_shift'] = []
+
+    ext_blocks = {}
+    for slot, mnemonics in slots.items():
+      if len(mnemonics) == 1:
+        tbl['decode'][slot] = tbl['ids'][mnemonics[0]]
+        continue
+
+      # Blocks are shared by identical groups (e.g., all the funct
+      # slots of a REGIMM opcode)
+      group = tuple(mnemonics)
+      if group not in ext_blocks:
+        field = 'shamt' if insts[mnemonics[0]]['shamt'] is not None else 'cond'
+        block = [0 for _ in range(32)]
+        for mnemonic in mnemonics:
+          block[insts[mnemonic][field]] = tbl['ids'][mnemonic]
+
+        ext_blocks[group] = len(tbl['decode_ext_shift'])
+        tbl['decode_ext'      ] += block
+        tbl['decode_ext_shift'].append(6 if field == 'shamt' else 16)
+
+      tbl['decode'][slot] = -(ext_blocks[group] + 1)
+
+    return tbl
+
+  # Decodes an encoded instruction into its ID (0 if undefined)
+  @classmethod
+  def decode(cls, inst):
+    tbl = cls.tables()
+
+    iid = tbl['decode'][((inst >> 20) & 0xfc0) | (inst & 0x3f)]
+    if iid < 0:
+      k   = -iid - 1
+      iid = tbl['decode_ext'][(k << 5) | ((inst >> tbl['decode_ext_shift'][k]) & 0x1f)]
+
+    return iid
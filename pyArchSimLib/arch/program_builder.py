@@ -0,0 +1,189 @@
+# program_builder.py
+# --------------------------------------------------------------------
+#   Programmatic construction of executable binaries.
+#
+#   A ProgramBuilder produces the same `elf` as the assembler, but
+#   without going through assembly text: instructions are appended by
+#   calling methods named after their mnemonics, and data is appended
+#   from Python lists, `bytes`, or NumPy arrays. Labels are resolved in
+#   a single fix-up pass when the program is built.
+#
+#     prog = ProgramBuilder(mips32)
+#     prog.data.words([1, 2, 3], label='array')
+#     prog.la   ('$t0', 'array')
+#     prog.label('loop')
+#     prog.lw   ('$t1', '0($t0)')
+#     ...
+#     elf = prog.build()
+#
+#   Mnemonics that are Python keywords take a trailing underscore
+#   (e.g., `prog.and_(...)`), or can be given to `prog.inst('and', ...)`.
+
+import random
+import struct
+
+from pyArchSimLib.arch.assembler import assembler
+
+class SectionBuilder():
+  def __init__(s, prog, name):
+    s.prog = prog
+    s.name = name
+
+  #=====================================================================
+  # Addresses and Labels
+  #=====================================================================
+  def segment(s):
+    return s.prog.sections[s.name][-1]
+
+  def addr(s):
+    segment = s.segment()
+    return segment['base_addr'] + len(segment['bytes'])
+
+  def label(s, lbl):
+    return s.prog.defineLabel(lbl, s.addr())
+
+  # Alignment is in bytes (unlike `.align n`, which is 2^n)
+  def align(s, alignment):
+    s.prog.asm.align(s.segment(), alignment)
+    return s.addr()
+
+  #=====================================================================
+  # Data
+  #=====================================================================
+  def put(s, elem_sz, data, label, is_float=False):
+    s.align(elem_sz)
+    addr = s.label(label) if label is not None else s.addr()
+    s.segment()['bytes'] += s.pack(elem_sz, data, is_float)
+    return addr
+
+  def pack(s, elem_sz, data, is_float):
+    # Raw bytes are taken as they are
+    if isinstance(data, (bytes, bytearray)):
+      if len(data) % elem_sz != 0:
+        s.prog.asm.error(None, 'Size of the data ({} bytes) is not a multiple of {}.'.format(len(data), elem_sz))
+      return data
+
+    # Buffers (e.g., NumPy arrays or array.array) with elements of the
+    # right size and kind are copied in one go.
+    try:
+      view = memoryview(data)
+    except TypeError:
+      view = None
+
+    if view is not None and view.itemsize == elem_sz and view.c_contiguous:
+      fmt = view.format
+      if fmt[0] not in '>!' and (fmt[-1] in 'efd') == is_float:
+        return view.cast('B')
+
+    # Element by element
+    if hasattr(data, 'ravel'): data = data.ravel()
+    elems = data.tolist() if hasattr(data, 'tolist') else data
+
+    if is_float:
+      return struct.pack('<{}{}'.format(len(elems), 'f' if elem_sz == 4 else 'd'), *elems)
+
+    mask = (1 << (8 * elem_sz)) - 1
+    buf  = bytearray()
+    for elem in elems:
+      buf += (int(elem) & mask).to_bytes(elem_sz, 'little')
+    return buf
+
+  def bytes(s, data, label=None):
+    return s.put(1, data, label)
+
+  def halfs(s, data, label=None):
+    return s.put(2, data, label)
+
+  def words(s, data, label=None):
+    return s.put(4, data, label)
+
+  def floats(s, data, label=None):
+    return s.put(4, data, label, is_float=True)
+
+  def doubles(s, data, label=None):
+    return s.put(8, data, label, is_float=True)
+
+  def space(s, num_bytes, label=None):
+    return s.put(1, random.randbytes(num_bytes), label)
+
+  def ascii(s, string, label=None):
+    return s.put(1, string.encode(encoding='utf-8'), label)
+
+  def asciiz(s, string, label=None):
+    return s.put(1, string.encode(encoding='utf-8') + b'\x00', label)
+
+class ProgramBuilder():
+  def __init__(s, isa):
+    s.asm = assembler(isa)
+
+    # Same layout as the assembler's
+    s.sections = {}
+    for name, base_addr in s.asm.sections_layout:
+      s.sections[name] = [s.asm.makeSection(base_addr)]
+
+    s.text = SectionBuilder(s, 'text')
+    s.data = SectionBuilder(s, 'data')
+
+    # Symbol table
+    s.sym_tbl = {}
+
+    # Instructions waiting for the fix-up pass:
+    #   (section, offset, mnemonic, operands, lineno)
+    s.insts = []
+
+  #=====================================================================
+  # Labels
+  #=====================================================================
+  def defineLabel(s, lbl, addr):
+    if lbl in s.sym_tbl:
+      s.asm.error(None, 'Label \'{}\' is defined more than once.'.format(lbl))
+    s.sym_tbl[lbl] = addr
+    return addr
+
+  # Labels the next instruction
+  def label(s, lbl):
+    return s.text.label(lbl)
+
+  #=====================================================================
+  # Instructions
+  #=====================================================================
+  def isMnemonic(s, mnemonic):
+    return mnemonic in s.asm.insts or mnemonic == 'la'
+
+  def inst(s, mnemonic, *operands):
+    if not s.isMnemonic(mnemonic):
+      s.asm.error(None, 'Instruction with mnemonics \'{}\' is undefined.'.format(mnemonic))
+
+    # Operands are written as in assembly; numbers are also accepted
+    operands = [str(op) for op in operands]
+
+    s.text.align(4)
+    segment = s.text.segment()
+
+    addr = s.text.addr()
+    for mnemonic, ops in s.asm.expandPseudo(mnemonic, operands):
+      s.insts.append((segment, len(segment['bytes']), mnemonic, ops, None))
+      segment['bytes'] += b'\x00\x00\x00\x00'
+
+    return addr
+
+  def __getattr__(s, name):
+    mnemonic = name.rstrip('_')
+    if name.startswith('__') or 'asm' not in s.__dict__ or not s.isMnemonic(mnemonic):
+      raise AttributeError(name)
+    return lambda *operands: s.inst(mnemonic, *operands)
+
+  #=====================================================================
+  # Building
+  #=====================================================================
+  def build(s):
+    s.asm.fixup(s.insts, s.sym_tbl)
+
+    # The builder keeps its own copy; it can still be appended to
+    elf = s.asm.makeElf(s.sections, s.sym_tbl)
+    for name, section in elf['sections'].items():
+      copy = dict(section)
+      copy['bytes'] = bytearray(section['bytes'])
+      elf['sections'][name] = copy
+
+    return elf
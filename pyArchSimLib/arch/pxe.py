@@ -0,0 +1,188 @@
+# pxe.py
+# --------------------------------------------------------------------
+#   The pyArchSim executable (.pxe) format.
+#
+#   A .pxe file holds an assembled program: its sections, its symbol
+#   table and its entry point. It is laid out so that it can be
+#   memory-mapped and handed to the loader as-is:
+#
+#     header      : 36 bytes
+#       magic     : 4 bytes, b'PXE\0'
+#       version   : u16
+#       flags     : u16, reserved (0)
+#       entry     : u32, address of the first instruction
+#       nsections : u32
+#       nsymbols  : u32
+#       sect_off  : u32, file offset of the section table
+#       sym_off   : u32, file offset of the symbol table
+#       str_off   : u32, file offset of the string table
+#       str_sz    : u32, size of the string table
+#
+#     sections    : nsections x { name: u32, base_addr: u32,
+#                                 offset: u32, size: u32 }
+#     symbols     : nsymbols  x { name: u32, addr: u32 }
+#     strings     : NUL-terminated UTF-8 names; `name` fields are
+#                   offsets into this table
+#     data        : the contents of each section at its `offset`
+#
+#   The contents of a section start at a file offset that is congruent
+#   to its base address modulo the page size (4kB), so whole pages of
+#   the file line up with whole pages of the simulated memory. All
+#   integers are little-endian.
+
+import mmap
+import os
+import struct
+import tempfile
+
+class Pxe():
+  MAGIC     = b'PXE\x00'
+  VERSION   = 1
+  PAGE_SIZE = 1 << 12
+
+  HEADER  = struct.Struct('<4sHHIIIIIII')
+  SECTION = struct.Struct('<IIII')
+  SYMBOL  = struct.Struct('<II')
+
+  #=====================================================================
+  # Writing
+  #=====================================================================
+  @staticmethod
+  def serialize(elf):
+    sections = elf['sections']
+    sym_tbl  = elf.get('sym_tbl', {})
+    entry    = elf.get('entry', sections['text']['base_addr'])
+
+    # String table
+    strings = bytearray()
+    str_idx = {}
+    def addString(name):
+      if name not in str_idx:
+        str_idx[name] = len(strings)
+        strings.extend(name.encode('utf-8') + b'\x00')
+      return str_idx[name]
+
+    sect_names = [addString(name) for name in sections]
+    sym_names  = [addString(name) for name in sym_tbl  ]
+
+    # Layout
+    sect_off = Pxe.HEADER.size
+    sym_off  = sect_off + Pxe.SECTION.size * len(sections)
+    str_off  = sym_off  + Pxe.SYMBOL .size * len(sym_tbl )
+    offset   = str_off  + len(strings)
+
+    data_offs = []
+    for section in sections.values():
+      offset += (section['base_addr'] - offset) % Pxe.PAGE_SIZE
+      data_offs.append(offset)
+      offset += len(section['bytes'])
+
+    buf = bytearray(offset)
+
+    Pxe.HEADER.pack_into(buf, 0, Pxe.MAGIC, Pxe.VERSION, 0, entry,
+                         len(sections), len(sym_tbl), sect_off, sym_off,
+                         str_off, len(strings))
+
+    for i, section in enumerate(sections.values()):
+      size = len(section['bytes'])
+      Pxe.SECTION.pack_into(buf, sect_off + i * Pxe.SECTION.size,
+                            sect_names[i], section['base_addr'], data_offs[i], size)
+      buf[data_offs[i]:data_offs[i] + size] = section['bytes']
+
+    for i, addr in enumerate(sym_tbl.values()):
+      Pxe.SYMBOL.pack_into(buf, sym_off + i * Pxe.SYMBOL.size, sym_names[i], addr)
+
+    buf[str_off:str_off + len(strings)] = strings
+
+    return buf
+
+  @staticmethod
+  def write(elf, filename):
+    # Write to a temporary file first, so nobody sees a partially-
+    # written executable.
+    dirname = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(dir=dirname)
+    try:
+      with os.fdopen(fd, 'wb') as file:
+        file.write(Pxe.serialize(elf))
+
+      # mkstemp() creates private files; executables are meant to be shared
+      umask = os.umask(0)
+      os.umask(umask)
+      os.chmod(tmp_path, 0o666 & ~umask)
+
+      os.replace(tmp_path, filename)
+    except BaseException:
+      os.unlink(tmp_path)
+      raise
+
+  #=====================================================================
+  # Reading
+  #=====================================================================
+  @staticmethod
+  def isPxe(filename):
+    try:
+      with open(filename, 'rb') as file:
+        return file.read(len(Pxe.MAGIC)) == Pxe.MAGIC
+    except OSError:
+      return False
+
+  # Returns the elf, or None if the buffer is not a valid executable.
+  # The sections are views into the buffer.
+  @staticmethod
+  def deserialize(buf):
+    view = memoryview(buf)
+
+    if len(view) < Pxe.HEADER.size:
+      return None
+
+    (magic, version, flags, entry, nsections, nsymbols,
+     sect_off, sym_off, str_off, str_sz) = Pxe.HEADER.unpack_from(view, 0)
+
+    if magic != Pxe.MAGIC or version != Pxe.VERSION:
+      return None
+
+    if (sect_off + nsections * Pxe.SECTION.size > len(view) or
+        sym_off  + nsymbols  * Pxe.SYMBOL .size > len(view) or
+        str_off  + str_sz                       > len(view)):
+      return None
+
+    strings = bytes(view[str_off:str_off + str_sz])
+    def getString(idx):
+      return strings[idx:strings.index(b'\x00', idx)].decode('utf-8')
+
+    elf = {}
+    elf['entry'   ] = entry
+    elf['sections'] = {}
+    elf['sym_tbl' ] = {}
+
+    for i in range(nsections):
+      name, base_addr, offset, size = Pxe.SECTION.unpack_from(view, sect_off + i * Pxe.SECTION.size)
+      if offset + size > len(view):
+        return None
+
+      section = {}
+      section['base_addr'] = base_addr
+      section['bytes'    ] = view[offset:offset + size]
+
+      elf['sections'][getString(name)] = section
+
+    for i in range(nsymbols):
+      name, addr = Pxe.SYMBOL.unpack_from(view, sym_off + i * Pxe.SYMBOL.size)
+      elf['sym_tbl'][getString(name)] = addr
+
+    return elf
+
+  # Maps the file privately (copy-on-write), so the loader can hand
+  # whole pages to the memory without copying them.
+  @staticmethod
+  def load(filename):
+    with open(filename, 'rb') as file:
+      if os.fstat(file.fileno()).st_size == 0:
+        return None
+      buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    try:
+      return Pxe.deserialize(buf)
+    except (struct.error, ValueError, UnicodeDecodeError):
+      return None
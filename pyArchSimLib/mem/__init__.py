@@ -1,2 +1,9 @@
 from .cache import *
 from .main  import *
+
+from .trace import MemTracer
+from .trace import MemTraceWriter
+from .trace import MemTraceReader
+from .trace import MemTraceReplayer
+from .trace import MemPort
+from .interconnect import Crossbar
@@ -1 +1,3 @@
 from .no_cache import NoCache
+from .snoop_bus import SnoopBus
+from .coherent_cache import CoherentCache
@@ -0,0 +1,366 @@
+# coherent_cache.py
+# --------------------------------------------------------------------
+#   Private write-back data cache, kept coherent over a snooping bus.
+#
+#   Lines are modified (M), exclusive (E, MESI only) or shared (S);
+#   lines that are not in the cache are invalid. Sets are replaced in
+#   LRU order. A hit is answered right away, like a memory with no
+#   latency. A miss, or a write to a shared line, waits for the bus (see
+#   SnoopBus); once the transaction is through, a modified victim is
+#   written back and the line is read from memory, unless another cache
+#   supplied it. Accesses that span two lines get both.
+#
+#   The link of a load-linked (op 2) is kept here: it is broken when its
+#   line is invalidated or evicted, and a store-conditional (op 3) only
+#   writes while it is there. The response to a store-conditional holds
+#   1 (written) or 0 as a word.
+
+from collections import OrderedDict
+
+class CoherentCache():
+  def __init__(s, port_id, bus, size=4096, line_size=16, assoc=2):
+    if line_size < 4 or line_size & (line_size - 1):
+      raise ValueError('the line size must be a power of two of at least 4 bytes')
+    if assoc < 1:
+      raise ValueError('the cache needs at least one way')
+    if size < line_size * assoc or size % (line_size * assoc):
+      raise ValueError('the cache size must be a multiple of {} B (line size times ways)'.format(line_size * assoc))
+
+    s.port_id   = port_id
+    s.bus       = bus
+    s.id        = bus.attach(s)
+
+    s.size      = size
+    s.line_size = line_size
+    s.assoc     = assoc
+    s.nsets     = size // (line_size * assoc)
+
+    # Every set maps a line address to its [state, data], LRU first
+    s.sets = [OrderedDict() for _ in range(s.nsets)]
+
+    # Request of the core, and its response
+    s.req  = None
+    s.resp = None
+
+    # Miss being handled: the line, whether it is written, and where it
+    # is at (waiting for the bus, on the bus, writing the victim back,
+    # or reading the line)
+    s.miss_la    = None
+    s.miss_write = False
+    s.phase      = None
+    s.kind       = None
+    s.delay      = 0
+    s.shared     = False
+    s.supplied   = None
+    s.mem_req    = None
+    s.mem_sent   = False
+
+    # Address linked by a load-linked
+    s.link = None
+
+    # Memory interface
+    s.MemCanReq   = None
+    s.MemSendReq  = None
+    s.MemHasResp  = None
+    s.MemRecvResp = None
+
+    # Statistics
+    s.num_accesses   = 0
+    s.num_misses     = 0 # lines missing, or shared and written
+    s.num_upgrades   = 0 # ... of which were shared
+    s.num_writebacks = 0
+    s.num_invals     = 0 # lines invalidated by other caches
+    s.num_supplied   = 0 # modified lines supplied to other caches
+    s.num_sc         = 0
+    s.num_sc_fails   = 0
+
+  # Connections
+  def setMemCanReq(s, MemCanReq):
+    s.MemCanReq   = MemCanReq
+  def setMemSendReq(s, MemSendReq):
+    s.MemSendReq  = MemSendReq
+  def setMemHasResp(s, MemHasResp):
+    s.MemHasResp  = MemHasResp
+  def setMemRecvResp(s, MemRecvResp):
+    s.MemRecvResp = MemRecvResp
+
+  # Lines
+  def find(s, la):
+    return s.sets[la % s.nsets].get(la)
+
+  def touch(s, la):
+    s.sets[la % s.nsets].move_to_end(la)
+
+  def drop(s, la):
+    del s.sets[la % s.nsets][la]
+    if s.link is not None and s.link // s.line_size == la:
+      s.link = None
+
+  # Interface
+  def canReq(s):
+    return s.req is None
+
+  def sendReq(s, req):
+    assert (s.req is None)
+    s.req = req
+    s.num_accesses += 1
+    if req['op'] == 3:
+      s.num_sc += 1
+    if not s.access():
+      s.phase = 'wait'
+      s.bus.request(s.id)
+
+  def hasResp(s):
+    return s.resp is not None
+
+  def recvResp(s):
+    resp = s.resp
+    s.resp = None
+    return resp
+
+  # Performs the request if all its lines are here (with write
+  # permission if needed); otherwise, the first line that is not is
+  # the one to miss on. Returns whether it was performed
+  def access(s):
+    req  = s.req
+    op   = req['op'  ]
+    addr = req['addr']
+    size = req['size']
+    data = req['data']
+
+    # A store-conditional without its link fails right away
+    if op == 3 and s.link != addr:
+      s.link = None
+      s.num_sc_fails += 1
+      s.respond([0, 0, 0, 0])
+      return True
+
+    write = op == 1 or op == 3
+    first = addr // s.line_size
+    last  = (addr + size - 1) // s.line_size
+    for la in range(first, last + 1):
+      line = s.find(la)
+      if line is None or (write and line[0] == 'S'):
+        s.miss_la    = la
+        s.miss_write = write
+        return False
+
+    # Hit
+    if write:
+      mask = req['mask']
+      for la in range(first, last + 1):
+        line = s.find(la)
+        line[0] = 'M'
+        s.touch(la)
+        base = la * s.line_size
+        for j in range(max(addr, base), min(addr + size, base + s.line_size)):
+          if mask is None or mask[j - addr]:
+            line[1][j - base] = data[j - addr]
+      if op == 3:
+        s.link = None
+        data   = [1, 0, 0, 0]
+    else:
+      data = bytearray()
+      for la in range(first, last + 1):
+        line = s.find(la)
+        s.touch(la)
+        base = la * s.line_size
+        data += line[1][max(addr, base) - base:min(addr + size, base + s.line_size) - base]
+      data = bytes(data)
+      if op == 2:
+        s.link = addr
+
+    s.respond(data)
+    return True
+
+  def respond(s, data):
+    req = s.req
+
+    resp = {}
+    resp['op'  ] = req['op'  ]
+    resp['addr'] = req['addr']
+    resp['data'] = data
+    resp['size'] = req['size']
+    resp['mask'] = req['mask']
+    resp['tag' ] = req['tag' ]
+
+    s.req  = None
+    s.resp = resp
+
+  # The bus is ours: the line may have been invalidated (or the link
+  # broken) while we waited, so the request is looked at again
+  def grant(s):
+    if s.access():
+      s.phase = None
+      s.bus.release(s.id)
+      return
+
+    la   = s.miss_la
+    line = s.find(la)
+    if   line is not None: s.kind = 'BusUpgr'
+    elif s.miss_write    : s.kind = 'BusRdX'
+    else                 : s.kind = 'BusRd'
+
+    s.num_misses += 1
+    if line is not None:
+      s.num_upgrades += 1
+
+    s.shared, s.supplied = s.bus.snoop(s.id, la, s.kind)
+    s.phase = 'bus'
+    s.delay = s.bus.latency
+
+  # Another cache's transaction for line `la`; returns whether we had
+  # it, and its data if it was modified
+  def snoop(s, la, kind):
+    line = s.find(la)
+    if line is None:
+      return False, None
+
+    data = None
+    if line[0] == 'M':
+      data = bytes(line[1])
+      s.num_supplied += 1
+
+    if kind == 'BusRd':
+      line[0] = 'S'
+    else:
+      s.drop(la)
+      s.num_invals += 1
+
+    return True, data
+
+  # Memory requests of a whole line
+  def lineReq(s, op, la, data=None):
+    req = {}
+    req['op'  ] = op
+    req['data'] = list(data) if data is not None else []
+    req['addr'] = la * s.line_size
+    req['size'] = s.line_size
+    req['mask'] = None
+    req['tag' ] = None
+    return req
+
+  # Sends the memory request of the miss, once the port takes it;
+  # returns its response once it is back
+  def memAccess(s):
+    if not s.mem_sent:
+      if s.MemCanReq(s.port_id):
+        s.MemSendReq(s.port_id, s.mem_req)
+        s.mem_sent = True
+      return None
+    if not s.MemHasResp(s.port_id):
+      return None
+    s.mem_sent = False
+    return s.MemRecvResp(s.port_id)
+
+  def tick(s):
+    if s.phase is None or s.phase == 'wait':
+      return
+
+    if s.phase == 'bus':
+      s.delay -= 1
+      if s.delay > 0:
+        return
+
+      if s.kind == 'BusUpgr':
+        s.find(s.miss_la)[0] = 'M'
+        s.finish()
+        return
+
+      # Make room
+      ways = s.sets[s.miss_la % s.nsets]
+      if len(ways) == s.assoc:
+        victim, (state, data) = next(iter(ways.items()))
+        s.drop(victim)
+        if state == 'M':
+          s.mem_req = s.lineReq(1, victim, data)
+          s.phase   = 'wb'
+          s.num_writebacks += 1
+          return
+
+      s.phase = 'wb'
+      s.mem_req = None
+
+    if s.phase == 'wb':
+      if s.mem_req is not None and s.memAccess() is None:
+        return
+
+      if s.supplied is not None:
+        s.install(s.supplied)
+        return
+
+      s.mem_req = s.lineReq(0, s.miss_la)
+      s.phase   = 'fill'
+
+    if s.phase == 'fill':
+      resp = s.memAccess()
+      if resp is not None:
+        s.install(resp['data'])
+
+  def install(s, data):
+    if   s.miss_write                          : state = 'M'
+    elif s.shared or s.bus.protocol == 'msi'   : state = 'S'
+    else                                       : state = 'E'
+
+    s.sets[s.miss_la % s.nsets][s.miss_la] = [state, bytearray(data)]
+    s.finish()
+
+  # The line is in: give the bus back, and go on with the request
+  def finish(s):
+    s.phase    = None
+    s.mem_req  = None
+    s.supplied = None
+    s.bus.release(s.id)
+    if not s.access():
+      s.phase = 'wait'
+      s.bus.request(s.id)
+
+  # Victim being written back, as (line address, data)
+  def inWriteback(s):
+    if s.phase == 'wb' and s.mem_req is not None:
+      return s.mem_req['addr'] // s.line_size, s.mem_req['data']
+    return None, None
+
+  # Functional accesses (through the bus)
+  #   (a victim on its way to memory is still ours)
+  def peek(s, addr, size, data):
+    wb_la, wb_data = s.inWriteback()
+    for la in range(addr // s.line_size, (addr + size - 1) // s.line_size + 1):
+      line = s.find(la)
+      if   line is not None and line[0] == 'M': src = line[1]
+      elif la == wb_la                        : src = wb_data
+      else                                    : continue
+      base = la * s.line_size
+      for j in range(max(addr, base), min(addr + size, base + s.line_size)):
+        data[j - addr] = src[j - base]
+
+  def poke(s, addr, data, size, mask=None):
+    wb_la, wb_data = s.inWriteback()
+    for la in range(addr // s.line_size, (addr + size - 1) // s.line_size + 1):
+      line = s.find(la)
+      if   line is not None: dst = line[1]
+      elif la == wb_la     : dst = wb_data
+      else                 : continue
+      base = la * s.line_size
+      for j in range(max(addr, base), min(addr + size, base + s.line_size)):
+        if mask is None or mask[j - addr]:
+          dst[j - base] = data[j - addr]
+
+  # Statistics
+  def getStats(s):
+    stats = {}
+    stats['accesses'  ] = s.num_accesses
+    stats['misses'    ] = s.num_misses
+    stats['upgrades'  ] = s.num_upgrades
+    stats['writebacks'] = s.num_writebacks
+    stats['invalidations'] = s.num_invals
+    stats['supplied'  ] = s.num_supplied
+    stats['sc'        ] = s.num_sc
+    stats['sc_fails'  ] = s.num_sc_fails
+    return stats
+
+  def linetrace(s):
+    return '{: <4}'.format(s.phase or '')
+
+  def linetraceHeader(s):
+    return '{: <4}'.format('L1D')
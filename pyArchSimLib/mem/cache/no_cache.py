@@ -41,3 +41,6 @@ class NoCache():
   # Nothing happens
   def linetrace(s):
     return ''
+
+  def linetraceHeader(s):
+    return ''
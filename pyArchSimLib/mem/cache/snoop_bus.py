@@ -0,0 +1,171 @@
+# snoop_bus.py
+# --------------------------------------------------------------------
+#   Snooping bus keeping private caches coherent (MSI or MESI).
+#
+#   A cache that misses, or has to write a line it only shares, asks
+#   for the bus; the bus is granted to one cache at a time, in
+#   round-robin order, and held until its line is in (atomic bus). On
+#   the grant, the other caches snoop the transaction right away:
+#
+#     - BusRd   (read miss)  : a modified copy is supplied to the
+#                              requester and flushed to memory; all
+#                              copies become shared.
+#     - BusRdX  (write miss) : a modified copy is supplied to the
+#                              requester; all copies are invalidated.
+#     - BusUpgr (write to a shared line): all other copies are
+#                              invalidated.
+#
+#   A transaction takes `latency` cycles on the bus; lines that no other
+#   cache supplies are then read from memory by the requester, through
+#   its memory port. With MESI, a line read while no other cache has it
+#   is exclusive, and can be written without a transaction.
+#
+#   The bus also gives the syscalls a view of memory that includes the
+#   modified lines of the caches (see read() and write()).
+
+class SnoopBus():
+  # Names accepted by the constructor
+  protocols = ('msi', 'mesi')
+  kinds     = ('BusRd', 'BusRdX', 'BusUpgr')
+
+  def __init__(s, protocol='mesi', latency=1):
+    if protocol not in s.protocols:
+      raise ValueError('unknown coherence protocol "{}" (expected one of: {})'.format(
+                       protocol, ', '.join(s.protocols)))
+    if latency < 1:
+      raise ValueError('a bus transaction takes at least one cycle')
+
+    s.protocol = protocol
+    s.latency  = latency
+
+    # Caches on the bus, which of them wait for it, and which one has it
+    s.caches  = []
+    s.waiting = []
+    s.holder  = None
+
+    # Next cache in round-robin order
+    s.next = 0
+
+    # Memory calls
+    s.MemReadFunct  = None
+    s.MemWriteFunct = None
+
+    # Statistics
+    s.num_trans     = {kind: 0 for kind in s.kinds}
+    s.num_invals    = 0 # copies invalidated by other caches
+    s.num_c2c       = 0 # lines supplied by another cache
+    s.num_flushes   = 0 # modified lines written back on a BusRd
+    s.num_busy      = 0 # cycles the bus was held
+    s.num_waits     = 0 # cycles caches waited for the bus
+
+  # Connections
+  def setMemReadFunct(s, MemReadFunct):
+    s.MemReadFunct  = MemReadFunct
+  def setMemWriteFunct(s, MemWriteFunct):
+    s.MemWriteFunct = MemWriteFunct
+
+  # Returns the ID of a new cache on the bus
+  def attach(s, cache):
+    s.caches .append(cache)
+    s.waiting.append(False)
+    return len(s.caches) - 1
+
+  # Arbitration
+  def request(s, i):
+    s.waiting[i] = True
+
+  def release(s, i):
+    assert (s.holder == i)
+    s.holder = None
+
+  # The other caches snoop a transaction of cache `i` for line `la`;
+  # returns whether any of them had a copy, and the modified copy, if
+  # one of them had it
+  def snoop(s, i, la, kind):
+    s.num_trans[kind] += 1
+
+    shared = False
+    data   = None
+    for j, cache in enumerate(s.caches):
+      if j == i:
+        continue
+      had, dirty = cache.snoop(la, kind)
+      if had:
+        shared = True
+        if kind != 'BusRd':
+          s.num_invals += 1
+      if dirty is not None:
+        data = dirty
+
+    if data is not None:
+      s.num_c2c += 1
+      if kind == 'BusRd':
+        line_size = s.caches[i].line_size
+        s.MemWriteFunct(la * line_size, data, line_size)
+        s.num_flushes += 1
+
+    return shared, data
+
+  def tick(s):
+    # Grant the bus (a cache may give it back right away)
+    n = len(s.caches)
+    while s.holder is None and any(s.waiting):
+      for k in range(n):
+        i = (s.next + k) % n
+        if s.waiting[i]:
+          break
+
+      s.waiting[i] = False
+      s.holder     = i
+      s.next       = (i + 1) % n
+      s.caches[i].grant()
+
+    if s.holder is not None:
+      s.num_busy += 1
+    s.num_waits += sum(s.waiting)
+
+  # Functional accesses (e.g., by syscalls), which see the lines of
+  # the caches
+  def read(s, addr, size):
+    data = bytearray(s.MemReadFunct(addr, size))
+    for cache in s.caches:
+      cache.peek(addr, size, data)
+    return bytes(data)
+
+  def write(s, addr, data, size, mask=None):
+    s.MemWriteFunct(addr, data, size, mask)
+    for cache in s.caches:
+      cache.poke(addr, data, size, mask)
+
+  # Statistics
+  def getStats(s):
+    stats = {}
+    for kind in s.kinds:
+      stats[kind] = s.num_trans[kind]
+    stats['invalidations'] = s.num_invals
+    stats['c2c'          ] = s.num_c2c
+    stats['flushes'      ] = s.num_flushes
+    stats['busy'         ] = s.num_busy
+    stats['waits'        ] = s.num_waits
+    for i, cache in enumerate(s.caches):
+      stats['dcache{}'.format(i)] = cache.getStats()
+    return stats
+
+  def printStats(s):
+    cache = s.caches[0] if s.caches else None
+    print(' + Coherence ({}, snooping bus, {}-cycle transactions, {} B, {}-way dcaches with {} B lines):'.format(
+          s.protocol.upper(), s.latency, cache.size if cache else 0,
+          cache.assoc if cache else 0, cache.line_size if cache else 0))
+    print('     {: <6} {: >10} {: >10} {: >8} {: >10} {: >10} {: >10} {: >10}'.format(
+          'dcache', 'accesses', 'misses', 'upgrades', 'writebacks', 'invalid.', 'supplied', 'sc fails'))
+    for i, cache in enumerate(s.caches):
+      print('     {: <6} {: >10} {: >10} {: >8} {: >10} {: >10} {: >10} {: >10}'.format(
+            i, cache.num_accesses, cache.num_misses, cache.num_upgrades, cache.num_writebacks,
+            cache.num_invals, cache.num_supplied, cache.num_sc_fails))
+    print('     - Bus Transactions = {} (BusRd = {}, BusRdX = {}, BusUpgr = {})'.format(
+          sum(s.num_trans.values()), s.num_trans['BusRd'], s.num_trans['BusRdX'], s.num_trans['BusUpgr']))
+    print('     - Invalidations = {}'.format(s.num_invals))
+    print('     - Cache-to-Cache Transfers = {} ({} flushed to memory)'.format(s.num_c2c, s.num_flushes))
+    print('     - Bus Busy Cycles = {}'.format(s.num_busy))
+    print('     - Cycles Waited for the Bus = {}'.format(s.num_waits))
+    print('')
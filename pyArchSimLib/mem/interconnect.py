@@ -0,0 +1,340 @@
+# interconnect.py
+# --------------------------------------------------------------------
+#   Crossbar between any number of requesters (e.g., the icaches and
+#   dcaches of the cores) and the ports of a memory, or its banks.
+#
+#   Every requester queues up to `queue_size` requests. Every cycle,
+#   the requesters at the head of the arbitration order get a port for
+#   their oldest request: requesters with a higher priority (see
+#   `priorities`) come first, and among them the order is round-robin
+#   ("rr") or lowest-numbered first ("fixed"). A request goes to any
+#   free port, or, with `interleave`, to the bank (port) holding its
+#   address, `interleave` bytes per bank in turn; every bank is then
+#   arbitrated on its own (with its own round-robin order), and a
+#   request whose bank is busy waits (a bank conflict). A requester has
+#   one request in flight at a time, so responses come back in order.
+#
+#   Every port is reached over a link that takes `latency` cycles each
+#   way and carries `width` bytes per cycle (any number by default): a
+#   request with data (a write) or a response with data (a read) holds
+#   the link for as many cycles as its bytes need. A port is held from
+#   the grant until its response got on the link back; responses wait
+#   at the port while that link is busy.
+#
+#   With no latency and unlimited width (the defaults), requests reach
+#   the ports as they are granted, and responses are taken straight
+#   from the ports; a response that was not taken right away is moved
+#   to a response buffer, so the port is not held (e.g., by a fetch
+#   waiting for decode to make room).
+#
+#   Requesters see the interface of a multi-ported memory, with their
+#   number as the port.
+
+from collections import deque
+
+class Crossbar():
+  # Names accepted by the constructor
+  policies = ('rr', 'fixed')
+
+  def __init__(s, nreqs, nports, policy='rr', latency=0, width=None, queue_size=1,
+               interleave=None, priorities=None):
+    if nports < 1:
+      raise ValueError('the memory needs at least one port')
+    if policy not in s.policies:
+      raise ValueError('unknown arbitration policy "{}" (expected one of: {})'.format(
+                       policy, ', '.join(s.policies)))
+    if latency < 0:
+      raise ValueError('the link latency cannot be negative')
+    if width is not None and width < 1:
+      raise ValueError('a link carries at least one byte per cycle')
+    if queue_size < 1:
+      raise ValueError('every requester queues at least one request')
+    if interleave is not None and (interleave < 1 or interleave & (interleave - 1)):
+      raise ValueError('the bank interleaving must be a power of two')
+    if priorities is not None and len(priorities) != nreqs:
+      raise ValueError('{} priorities for {} requesters'.format(len(priorities), nreqs))
+
+    s.nreqs      = nreqs
+    s.nports     = nports
+    s.policy     = policy
+    s.latency    = latency
+    s.width      = width
+    s.queue_size = queue_size
+    s.interleave = interleave
+    s.priorities = priorities
+
+    # Queued requests and buffered response of every requester (with
+    # the cycle it gets there)
+    s.queue    = [deque() for _ in range(nreqs)]
+    s.resp_buf = [None for _ in range(nreqs)]
+
+    # Port granted to every requester (and the request), and requester
+    # of every port
+    s.port_of  = [None for _ in range(nreqs )]
+    s.granted  = [None for _ in range(nreqs )]
+    s.owner    = [None for _ in range(nports)]
+
+    # Request on its way to every port (with the cycle it gets there),
+    # and the cycles the links are free again
+    s.in_link   = [None for _ in range(nports)]
+    s.req_free  = [0    for _ in range(nports)]
+    s.resp_free = [0    for _ in range(nports)]
+
+    # Ports whose requester left (e.g., its core exited); their
+    # responses are thrown away
+    s.dropped  = [False for _ in range(nports)]
+
+    # Next requester in round-robin order (for every bank)
+    s.next  = [0 for _ in range(nports if interleave is not None else 1)]
+    s.cycle = 0
+
+    # Memory interface
+    s.MemCanReq   = None
+    s.MemSendReq  = None
+    s.MemHasResp  = None
+    s.MemRecvResp = None
+    s.MemPeekResp = None # only needed by peekResp()
+
+    # Statistics
+    s.num_grants     = [0 for _ in range(nreqs)]
+    s.num_waits      = [0 for _ in range(nreqs)]  # cycles requests waited for a port
+    s.num_queued     = 0                          # requests queued, summed over the cycles
+    s.port_grants    = [0 for _ in range(nports)]
+    s.port_busy      = [0 for _ in range(nports)] # cycles the port was held
+    s.port_conflicts = [0 for _ in range(nports)] # requests that found their bank busy
+    s.port_blocked   = [0 for _ in range(nports)] # cycles responses waited for the link
+    s.port_bytes     = [0 for _ in range(nports)] # bytes carried by the link, both ways
+
+  # Connections
+  def setMemCanReq(s, MemCanReq):
+    s.MemCanReq   = MemCanReq
+  def setMemSendReq(s, MemSendReq):
+    s.MemSendReq  = MemSendReq
+  def setMemHasResp(s, MemHasResp):
+    s.MemHasResp  = MemHasResp
+  def setMemRecvResp(s, MemRecvResp):
+    s.MemRecvResp = MemRecvResp
+  def setMemPeekResp(s, MemPeekResp):
+    s.MemPeekResp = MemPeekResp
+
+  # Bytes of data a request (or its response) carries
+  @staticmethod
+  def payload(msg, resp):
+    write = msg['op'] == 1 or msg['op'] == 3
+    return msg['size'] if write != resp else 0
+
+  # Cycles a message holds its link
+  def transfer(s, nbytes):
+    if s.width is None or nbytes <= s.width:
+      return 1
+    return (nbytes + s.width - 1) // s.width
+
+  # Cycles a message takes over its link, beyond those of a direct
+  # connection
+  def delay(s, hold):
+    return s.latency + hold - 1
+
+  # Port of a request, if it has to be a given one
+  def bank(s, req):
+    if s.interleave is None:
+      return None
+    return (req['addr'] // s.interleave) % s.nports
+
+  # Interface
+  def canReq(s, i):
+    return len(s.queue[i]) < s.queue_size
+
+  def sendReq(s, i, req):
+    assert (len(s.queue[i]) < s.queue_size)
+    s.queue[i].append(req)
+
+  # A response that takes no longer than over a direct connection is
+  # taken straight from the port (requesters look during the cycle
+  # before the crossbar ticks)
+  def direct(s, i):
+    port = s.port_of[i]
+    return port is not None and s.cycle + 1 >= s.resp_free[port] and \
+           s.delay(s.transfer(s.payload(s.granted[i], True))) == 0 and s.MemHasResp(port)
+
+  def hasResp(s, i):
+    if s.resp_buf[i] is not None:
+      return s.resp_buf[i][0] <= s.cycle
+    return s.direct(i)
+
+  def recvResp(s, i):
+    if s.resp_buf[i] is not None:
+      resp = s.resp_buf[i][1]
+      s.resp_buf[i] = None
+      return resp
+
+    port = s.port_of[i]
+    s.port_of[i   ] = None
+    s.granted[i   ] = None
+    s.owner  [port] = None
+    resp = s.MemRecvResp(port)
+    s.port_bytes[port] += s.payload(resp, True)
+    return resp
+
+  # The response hasResp() reports, left where it is
+  def peekResp(s, i):
+    if s.resp_buf[i] is not None:
+      return s.resp_buf[i][1]
+    return s.MemPeekResp(s.port_of[i])
+
+  # Drops the queued requests of a requester, and the response to the
+  # one it has in flight
+  def release(s, i):
+    s.queue   [i].clear()
+    s.resp_buf[i] = None
+
+    port = s.port_of[i]
+    if port is not None:
+      s.port_of[i   ] = None
+      s.granted[i   ] = None
+      s.dropped[port] = True
+
+  def tick(s):
+    s.cycle += 1
+
+    # Ports held during the cycle
+    busy = [s.owner[port] is not None for port in range(s.nports)]
+
+    # Take the responses from the ports, onto the links back
+    for port in range(s.nports):
+      i = s.owner[port]
+      if i is None:
+        continue
+      if s.in_link[port] is not None or not s.MemHasResp(port):
+        continue
+      if s.cycle < s.resp_free[port]:
+        s.port_blocked[port] += 1
+        continue
+
+      resp  = s.MemRecvResp(port)
+      nbyte = s.payload(resp, True)
+      hold  = s.transfer(nbyte)
+
+      s.owner     [port]  = None
+      s.resp_free [port]  = s.cycle + hold
+      s.port_bytes[port] += nbyte
+
+      # (it was there for the requester since the last cycle)
+      if s.dropped[port]:
+        s.dropped[port] = False
+      else:
+        s.resp_buf[i] = (s.cycle + s.delay(hold) - 1, resp)
+        s.port_of [i] = None
+        s.granted [i] = None
+
+    # Requests getting to their ports
+    for port in range(s.nports):
+      if s.in_link[port] is not None and s.in_link[port][0] <= s.cycle:
+        s.MemSendReq(port, s.in_link[port][1])
+        s.in_link[port] = None
+
+    # Arbitration
+    ready = [len(s.queue[i]) > 0 and s.port_of[i] is None and s.resp_buf[i] is None
+             for i in range(s.nreqs)]
+
+    if s.interleave is None:
+      port = 0
+      for i in s.order(0):
+        if not ready[i]:
+          continue
+        # Next free port
+        while port < s.nports and not s.isFree(port):
+          port += 1
+        if port == s.nports:
+          break
+        s.grant(i, port)
+        busy[port] = True
+    else:
+      for bank in range(s.nports):
+        reqs = [i for i in s.order(bank) if ready[i] and s.bank(s.queue[i][0]) == bank]
+        if reqs and s.isFree(bank):
+          i = reqs.pop(0)
+          s.grant(i, bank)
+          ready[i  ] = False
+          busy[bank] = True
+        s.port_conflicts[bank] += len(reqs)
+
+    for port in range(s.nports):
+      s.port_busy[port] += busy[port]
+
+    for i in range(s.nreqs):
+      if s.queue[i]:
+        s.num_waits[i] += 1
+        s.num_queued   += len(s.queue[i])
+
+  # Requesters in arbitration order (for a bank)
+  def order(s, bank):
+    start = s.next[bank] if s.policy == 'rr' else 0
+    order = [(start + k) % s.nreqs for k in range(s.nreqs)]
+    if s.priorities is not None:
+      order.sort(key=lambda i: -s.priorities[i])
+    return order
+
+  # Grants a port to the oldest request of a requester
+  def grant(s, i, port):
+    req = s.queue[i].popleft()
+    s.port_of[i   ] = port
+    s.granted[i   ] = req
+    s.owner  [port] = i
+
+    nbyte = s.payload(req, False)
+    hold  = s.transfer(nbyte)
+    s.req_free  [port]  = s.cycle + hold
+    s.port_bytes[port] += nbyte
+
+    if s.delay(hold) > 0:
+      s.in_link[port] = (s.cycle + s.delay(hold), req)
+    else:
+      s.MemSendReq(port, req)
+
+    s.num_grants [i   ] += 1
+    s.port_grants[port] += 1
+
+    if s.policy == 'rr':
+      s.next[port if s.interleave is not None else 0] = (i + 1) % s.nreqs
+
+  # Whether a port can be granted
+  def isFree(s, port):
+    return s.owner[port] is None and s.cycle >= s.req_free[port] and s.MemCanReq(port)
+
+  # Statistics
+  def getStats(s):
+    stats = {}
+    stats['grants'   ] = sum(s.num_grants)
+    stats['waits'    ] = sum(s.num_waits )
+    stats['conflicts'] = sum(s.port_conflicts)
+    stats['avg_queue'] = s.num_queued / s.cycle if s.cycle > 0 else 0.0
+    for i in range(s.nreqs):
+      stats['req{}_grants'.format(i)] = s.num_grants[i]
+      stats['req{}_waits' .format(i)] = s.num_waits [i]
+    for port in range(s.nports):
+      stats['port{}_grants'   .format(port)] = s.port_grants   [port]
+      stats['port{}_busy'     .format(port)] = s.port_busy     [port]
+      stats['port{}_conflicts'.format(port)] = s.port_conflicts[port]
+      stats['port{}_blocked'  .format(port)] = s.port_blocked  [port]
+      stats['port{}_bytes'    .format(port)] = s.port_bytes    [port]
+    return stats
+
+  def printStats(s):
+    print(' + Interconnect (crossbar, {} requesters, {} {}, {}-cycle links, {}, {}-entry queues):'.format(
+          s.nreqs, s.nports, 'ports' if s.interleave is None else
+          'banks interleaved every {} B'.format(s.interleave), s.latency,
+          '{} B/cycle'.format(s.width) if s.width is not None else 'unlimited width', s.queue_size))
+    print('     {: <6} {: >10} {: >8} {: >10} {: >10} {: >12}'.format(
+          'port', 'grants', 'busy', 'conflicts', 'blocked', 'bytes'))
+    for port in range(s.nports):
+      print('     {: <6} {: >10} {: >7.2f}% {: >10} {: >10} {: >12}'.format(
+            port, s.port_grants[port], 100.0 * s.port_busy[port] / s.cycle if s.cycle > 0 else 0.0,
+            s.port_conflicts[port], s.port_blocked[port], s.port_bytes[port]))
+    grants = sum(s.num_grants)
+    print('     - Average Wait for a Port = {:.2f} cycles'.format(
+          s.num_queued / grants if grants > 0 else 0.0))
+    print('     - Average Queued Requests = {:.2f}'.format(s.num_queued / s.cycle if s.cycle > 0 else 0.0))
+    print('')
+
+  def linetrace(s):
+    return ''
@@ -1 +1,3 @@
 from .simple import SimpleMultiportedMemory
+from .shared import SharedPages
+from .shared import SharedMultiportedMemory
@@ -0,0 +1,133 @@
+# shared.py
+# --------------------------------------------------------------------
+# Main memory whose pages live in shared memory, so the groups of
+# cores of a parallel simulation (see ParallelSimulator), each in its
+# own host process, see the same memory.
+#
+# SharedPages holds the pages (allocated on first touch, from a fixed
+# pool), the page table, and the links of the load-linked of every
+# core. It is created once, before the host processes are started, and
+# every SharedMultiportedMemory on top of it sees the same contents:
+# the memory whose ports the groups share (in the parent process), and
+# the memory of every group (for the loader and the syscalls of its
+# cores, or, with groups that synchronize every quantum, with ports of
+# its own).
+#
+# Writes, load-linked and store-conditional hold a lock across the host
+# processes, so ll/sc stay atomic.
+
+import multiprocessing
+import random
+
+from multiprocessing import shared_memory
+
+from .simple import SimpleMultiportedMemory
+
+class SharedPages():
+  page_size = 1 << 12 #4kB
+  num_slots = 1 << 20 # pages of a 32-bit address space
+
+  def __init__(s, num_pages=16384, num_links=64):
+    s.num_pages = num_pages
+    s.num_links = num_links
+
+    # Layout: pages in use, page table, links, then the pages
+    table_off = 8
+    links_off = table_off + 4 * s.num_slots
+    pages_off = links_off + 8 * num_links
+
+    s.shm = shared_memory.SharedMemory(create=True, size=pages_off + num_pages * s.page_size)
+
+    buf     = s.shm.buf
+    s.used  = buf[0        :table_off].cast('q')
+    s.table = buf[table_off:links_off].cast('i') # page + 1, 0 if none
+    s.links = buf[links_off:pages_off].cast('q') # address + 1, 0 if none
+    s.pages = buf[pages_off:]
+
+    s.lock = multiprocessing.get_context('fork').Lock()
+
+    # Pages handed out by this process
+    s.frames = []
+
+  # Page `page_addr`, allocated (with random contents) on first touch
+  def frame(s, page_addr):
+    slot = s.table[page_addr]
+    if slot == 0:
+      with s.lock:
+        slot = s.table[page_addr]
+        if slot == 0:
+          if s.used[0] == s.num_pages:
+            raise MemoryError('out of shared memory pages ({} pages of {} B)'.format(
+                              s.num_pages, s.page_size))
+          s.used[0] += 1
+          slot = s.used[0]
+          s.pages[(slot - 1) * s.page_size:slot * s.page_size] = random.randbytes(s.page_size)
+          s.table[page_addr] = slot
+
+    frame = s.pages[(slot - 1) * s.page_size:slot * s.page_size]
+    s.frames.append(frame)
+    return frame
+
+  # Frees the shared memory (by the process that created it, once the
+  # others are done); the pages handed out can no longer be used
+  def close(s):
+    if s.shm is None:
+      return
+
+    for view in s.frames + [s.used, s.table, s.links, s.pages]:
+      view.release()
+    s.shm.close()
+    s.shm.unlink()
+    s.shm = None
+
+class SharedMultiportedMemory(SimpleMultiportedMemory):
+  def __init__(s, nports, delay=0, pages=None):
+    super().__init__(nports, delay)
+
+    s.pages = pages
+
+  def allocate_physical_page(s, page_addr):
+    assert (page_addr not in s.pmem)
+
+    s.pmem[page_addr] = s.pages.frame(page_addr)
+
+  # Binaries are copied into the shared pages
+  def load(s, addr, data):
+    view = memoryview(data).cast('B')
+    s.write(addr, view, len(view))
+
+  # The shared pages stay behind (e.g., when the memory is sent back to
+  # the parent process)
+  def __getstate__(s):
+    state = s.__dict__.copy()
+    state['pmem' ] = {}
+    state['pages'] = None
+    return state
+
+  def processRequest(s, i):
+    if (s.req_buf[i] is None) or (s.req_buf[i]['delay'] != 0) or (s.resp_buf[i] is not None):
+      return
+
+    if s.req_buf[i]['req']['op'] == 0:
+      super().processRequest(i)
+    else:
+      with s.pages.lock:
+        super().processRequest(i)
+
+  # Links (one per core, shared by all the processes)
+  def getLink(s, src):
+    if src is None:
+      return None
+    link = s.pages.links[src]
+    return link - 1 if link else None
+
+  def setLink(s, src, addr):
+    if src is not None:
+      s.pages.links[src] = addr + 1 if addr is not None else 0
+
+  def breakLinks(s, addr, size):
+    links = s.pages.links
+    for src in range(s.pages.num_links):
+      link = links[src]
+      if link and link - 1 < addr + size and addr < link + 3:
+        links[src] = 0
@@ -2,6 +2,13 @@
 # --------------------------------------------------------------------
 # Simple multi-ported main memory model with constant access latency.
 #
+# Besides reads (op 0) and writes (op 1), it takes the load-linked
+# (op 2) and store-conditional (op 3) of the cores, for systems without
+# coherent caches: a load-linked links its address to the core that
+# sent it (`src`), any write to the linked bytes breaks the link, and a
+# store-conditional only writes if the link of its core is still there.
+# The response to a store-conditional holds 1 (written) or 0 as a word.
+#
 # Author\ Khalid Al-Hawaj
 # Date  \ 4 May 2025
 
@@ -11,6 +18,9 @@ class SimpleMultiportedMemory():
   def __init__(s, nports, delay = 0):
     s.pmem = {}
     s.page_size = 1 << 12 #4kB
+
+    # Pages still mapped to the buffer they were loaded from (see load())
+    s.borrowed = set()
     s.nports = nports
 
     s.req_buf  = [None for _ in range(nports)]
@@ -18,38 +28,101 @@ class SimpleMultiportedMemory():
 
     s.delay    = [delay for _ in range(nports)]
 
+    # Linked address of every core
+    s.links = {}
+
+    # Statistics
+    s.num_reads    = [0 for _ in range(nports)]
+    s.num_writes   = [0 for _ in range(nports)]
+    s.num_sc_fails = 0
+
   def allocate_physical_page(s, page_addr):
     assert (page_addr not in s.pmem)
 
-    s.pmem[page_addr] = []
-    for i in range(s.page_size):
-      s.pmem[page_addr].append(random.randint(0, 256))
+    s.pmem[page_addr] = bytearray(random.randbytes(s.page_size))
 
   def write(s, addr, data, size, mask=None):
-    # Check whether the page is allocated
-    page_addr = int(addr / s.page_size)
-    page_offset = addr % s.page_size
-    if page_addr not in s.pmem:
-      s.allocate_physical_page(page_addr)
-
-    # Perform the write
-    for i in range(size):
-      if mask is None or mask[i] == True:
-        s.pmem[page_addr][page_offset + i] = data[i]
+    # Perform the write, one page at a time
+    i = 0
+    while i < size:
+      page_addr   = (addr + i) // s.page_size
+      page_offset = (addr + i) %  s.page_size
+      n = min(size - i, s.page_size - page_offset)
+
+      # Check whether the page is allocated
+      if page_addr not in s.pmem:
+        s.allocate_physical_page(page_addr)
+      elif page_addr in s.borrowed:
+        s.pmem[page_addr] = bytearray(s.pmem[page_addr])
+        s.borrowed.discard(page_addr)
+      page = s.pmem[page_addr]
+
+      if mask is None:
+        page[page_offset:page_offset + n] = bytes(data[i:i + n])
+      else:
+        for j in range(n):
+          if mask[i + j] == True:
+            page[page_offset + j] = data[i + j]
+
+      i += n
 
   def read(s, addr, size):
-    # Check whether the page is allocated
-    page_addr = int(addr / s.page_size)
-    page_offset = addr % s.page_size
-    if page_addr not in s.pmem:
-      s.allocate_physical_page(page_addr)
-
-    # Perform the read
-    data = [0 for _ in range(size)]
-    for i in range(size):
-      data[i] = s.pmem[page_addr][page_offset + i]
-
-    return data
+    page_addr   = addr // s.page_size
+    page_offset = addr %  s.page_size
+
+    # Common case: the access falls within a single page
+    if page_offset + size <= s.page_size:
+      if page_addr not in s.pmem:
+        s.allocate_physical_page(page_addr)
+      return bytes(s.pmem[page_addr][page_offset:page_offset + size])
+
+    # Perform the read, one page at a time
+    data = bytearray()
+    i = 0
+    while i < size:
+      page_addr   = (addr + i) // s.page_size
+      page_offset = (addr + i) %  s.page_size
+      n = min(size - i, s.page_size - page_offset)
+
+      if page_addr not in s.pmem:
+        s.allocate_physical_page(page_addr)
+      data += s.pmem[page_addr][page_offset:page_offset + n]
+
+      i += n
+
+    return bytes(data)
+
+  # Bulk loading of a binary (e.g., by the system loader). Pages that
+  # are fully covered by the buffer are mapped to it (read-only) rather
+  # than copied, and only copied on their first write; the buffer (e.g.,
+  # the sections of an ELF loaded into several systems) is never
+  # written.
+  def load(s, addr, data):
+    view = memoryview(data).cast('B')
+    size = len(view)
+
+    i = 0
+    while i < size:
+      page_addr   = (addr + i) // s.page_size
+      page_offset = (addr + i) %  s.page_size
+      n = min(size - i, s.page_size - page_offset)
+
+      if n == s.page_size:
+        s.pmem[page_addr] = view[i:i + n].toreadonly()
+        s.borrowed.add(page_addr)
+      else:
+        s.write(addr + i, view[i:i + n], n)
+
+      i += n
+
+  # Mapped pages cannot be pickled (e.g., into a checkpoint)
+  def __getstate__(s):
+    state = s.__dict__.copy()
+    state['pmem'] = {}
+    for page_addr, page in s.pmem.items():
+      state['pmem'][page_addr] = page if isinstance(page, bytearray) else bytearray(page)
+    state['borrowed'] = set()
+    return state
 
   # Interface
   def canReq(s, i):
@@ -81,6 +154,10 @@ class SimpleMultiportedMemory():
     s.resp_buf[i] = None
     return resp
 
+  # The response of a port, left there
+  def peekResp(s, i):
+    return s.resp_buf[i]
+
   def processRequest(s, i):
     if (s.req_buf[i] is not None) and (s.req_buf[i]['delay'] == 0):
       if (s.resp_buf[i] is None):
@@ -94,8 +171,26 @@ class SimpleMultiportedMemory():
 
         if   op == 0:
           data = s.read(addr, size)
+          s.num_reads [i] += 1
         elif op == 1:
           s.write(addr, data, size, mask)
+          s.breakLinks(addr, size)
+          s.num_writes[i] += 1
+        elif op == 2:
+          data = s.read(addr, size)
+          s.setLink(s.req_buf[i]['req'].get('src'), addr)
+          s.num_reads [i] += 1
+        elif op == 3:
+          src = s.req_buf[i]['req'].get('src')
+          if s.getLink(src) == addr:
+            s.write(addr, data, size, mask)
+            s.breakLinks(addr, size)
+            s.num_writes[i] += 1
+            data = [1, 0, 0, 0]
+          else:
+            s.setLink(src, None)
+            s.num_sc_fails += 1
+            data = [0, 0, 0, 0]
 
         resp = {}
         resp['op'  ] = op
@@ -108,6 +203,21 @@ class SimpleMultiportedMemory():
         s.req_buf [i] = None
         s.resp_buf[i] = resp
 
+  # Links
+  def getLink(s, src):
+    return s.links.get(src)
+
+  def setLink(s, src, addr):
+    if addr is None: s.links.pop(src, None)
+    else           : s.links[src] = addr
+
+  # A write to any of the linked bytes
+  def breakLinks(s, addr, size):
+    if s.links:
+      for src, link in list(s.links.items()):
+        if link < addr + size and addr < link + 4:
+          del s.links[src]
+
   def tick(s):
     for i in range(s.nports):
       if s.req_buf[i] is not None:
@@ -118,5 +228,19 @@ class SimpleMultiportedMemory():
         if s.req_buf[i]['delay'] == 0:
           s.processRequest(i)
 
+  # Statistics
+  def getStats(s):
+    stats = {}
+    stats['reads' ] = sum(s.num_reads )
+    stats['writes'] = sum(s.num_writes)
+    stats['sc_fails'] = s.num_sc_fails # (without coherent caches)
+    for i in range(s.nports):
+      stats['port{}_reads' .format(i)] = s.num_reads [i]
+      stats['port{}_writes'.format(i)] = s.num_writes[i]
+    return stats
+
   def linetrace(s):
     return 'mem'
+
+  def linetraceHeader(s):
+    return 'Mem'
@@ -0,0 +1,248 @@
+# trace.py
+# --------------------------------------------------------------------
+#   Capture and replay of memory access traces.
+#
+#   A MemTracer records every request that the core sends to its
+#   memory ports (port 0 is the icache, port 1 the dcache) into a
+#   binary trace file. A MemTraceReplayer feeds a trace into any
+#   memory model with the usual request/response interface (a cache or
+#   a port of a main memory), without running the core, so memory
+#   models can be evaluated at replay speed.
+#
+#   A trace file is a small header followed by fixed-size records:
+#
+#     header : magic (4 bytes, b'PXMT'), version (u16), record size (u16)
+#     record : cycle (u64), port (u8), op (u8), size (u16), addr (u32)
+#
+#   All integers are little-endian.
+
+import collections
+import struct
+import time
+
+MAGIC   = b'PXMT'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHH')
+RECORD = struct.Struct('<QBBHI')
+
+#=========================================================================
+# Writing
+#=========================================================================
+class MemTraceWriter():
+  def __init__(s, filename, buf_size=1 << 16):
+    s.file     = open(filename, 'wb')
+    s.buf      = bytearray()
+    s.buf_size = buf_size
+
+    s.num_records = 0
+
+    s.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+
+  def record(s, cycle, port, op, addr, size):
+    s.buf += RECORD.pack(cycle, port, op, size, addr & 0xffffffff)
+    s.num_records += 1
+
+    if len(s.buf) >= s.buf_size:
+      s.flush()
+
+  def flush(s):
+    s.file.write(s.buf)
+    s.buf = bytearray()
+
+  def close(s):
+    s.flush()
+    s.file.close()
+
+#=========================================================================
+# Capture
+#=========================================================================
+class MemTracer():
+  def __init__(s, filename):
+    s.writer = MemTraceWriter(filename)
+    s.sim    = None
+    s.core   = None
+
+    # The original ports, put back when the tracer is closed
+    s.ports = None
+
+  def probeSystem(s, system):
+    # We only know about the default hierarchy for now.
+    s.core  = system.proc.core
+    s.ports = (s.core.iMemSendReq, s.core.dMemSendReq)
+
+    s.core.setIMemSendReq(s.trace(0, s.ports[0]))
+    s.core.setDMemSendReq(s.trace(1, s.ports[1]))
+
+  def trace(s, port, sendReq):
+    def tracedSendReq(req):
+      s.writer.record(s.sim.cycle, port, req['op'], req['addr'], req['size'])
+      return sendReq(req)
+    return tracedSendReq
+
+  # Requests are stamped with the cycle of the simulator
+  def begin(s, sim):
+    s.sim = sim
+
+  # The ports are restored, so the system can be pickled again (e.g.,
+  # into a checkpoint)
+  def close(s):
+    if s.ports is not None:
+      s.core.setIMemSendReq(s.ports[0])
+      s.core.setDMemSendReq(s.ports[1])
+      s.ports = None
+    s.writer.close()
+
+#=========================================================================
+# Reading
+#=========================================================================
+class MemTraceReader():
+  def __init__(s, filename, chunk_records=1 << 16):
+    s.filename   = filename
+    s.chunk_size = RECORD.size * chunk_records
+
+    with open(filename, 'rb') as file:
+      header = file.read(HEADER.size)
+
+    if len(header) < HEADER.size:
+      raise ValueError('"{}" is not a memory trace'.format(filename))
+
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+      raise ValueError('"{}" is not a memory trace (or has an unsupported version)'.format(filename))
+
+  # Yields (cycle, port, op, size, addr) tuples
+  def __iter__(s):
+    with open(s.filename, 'rb') as file:
+      file.seek(HEADER.size)
+      while True:
+        chunk = file.read(s.chunk_size)
+        if not chunk:
+          break
+        chunk = chunk[:len(chunk) - len(chunk) % RECORD.size]
+        yield from RECORD.iter_unpack(chunk)
+
+#=========================================================================
+# Replay
+#=========================================================================
+# Gives a port of a multiported memory the interface of a cache
+class MemPort():
+  def __init__(s, mem, port_id):
+    s.mem     = mem
+    s.port_id = port_id
+
+  def canReq(s):
+    return s.mem.canReq(s.port_id)
+  def sendReq(s, req):
+    return s.mem.sendReq(s.port_id, req)
+  def hasResp(s):
+    return s.mem.hasResp(s.port_id)
+  def recvResp(s):
+    return s.mem.recvResp(s.port_id)
+
+class MemTraceReplayer():
+  # With `timed`, a request is not sent before its recorded cycle (plus
+  # the delay accumulated so far); otherwise, requests are sent as soon
+  # as the ports take them.
+  def __init__(s, filename, timed=True):
+    s.reader = MemTraceReader(filename)
+    s.timed  = timed
+
+    # Statistics
+    s.num_cycle   = 0
+    s.num_reqs    = collections.Counter()
+    s.latency     = collections.Counter()
+    s.max_latency = collections.Counter()
+    s.slip        = 0
+    s.host_time   = 0.0
+
+  # `ports` are indexed by the port of the trace and have the
+  # canReq/sendReq/hasResp/recvResp interface of a cache; `components`
+  # are ticked every cycle.
+  def run(s, ports, components):
+    start = time.perf_counter()
+
+    records     = iter(s.reader)
+    pending     = next(records, None)
+    outstanding = [collections.deque() for _ in ports]
+
+    cycle = 0
+    slip  = 0
+
+    while pending is not None or any(outstanding):
+      # Responses
+      for i, port in enumerate(ports):
+        if outstanding[i] and port.hasResp():
+          port.recvResp()
+          latency = cycle - outstanding[i].popleft()
+          s.latency[i] += latency
+          if latency > s.max_latency[i]:
+            s.max_latency[i] = latency
+
+      # Requests, in the order of the trace
+      while pending is not None and (not s.timed or pending[0] + slip <= cycle):
+        _, i, op, size, addr = pending
+        port = ports[i]
+
+        if not port.canReq():
+          # Everything after this request is delayed as well
+          if s.timed: slip += 1
+          break
+
+        req = {}
+        req['op'  ] = op
+        req['addr'] = addr
+        req['data'] = bytes(size) if op == 1 else None
+        req['size'] = size
+        req['mask'] = None
+        req['tag' ] = None
+
+        port.sendReq(req)
+        outstanding[i].append(cycle)
+        s.num_reqs[(i, op)] += 1
+
+        pending = next(records, None)
+
+      for component in components:
+        component.tick()
+
+      cycle += 1
+
+    s.num_cycle = cycle
+    s.slip      = slip
+    s.host_time = time.perf_counter() - start
+
+    return cycle
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def getStats(s):
+    stats = {}
+    stats['cycles'] = s.num_cycle
+    stats['reqs'  ] = sum(s.num_reqs.values())
+    stats['slip'  ] = s.slip
+    for i in sorted({i for i, _ in s.num_reqs}):
+      reqs = s.num_reqs[(i, 0)] + s.num_reqs[(i, 1)]
+      stats['port{}_reads'      .format(i)] = s.num_reqs[(i, 0)]
+      stats['port{}_writes'     .format(i)] = s.num_reqs[(i, 1)]
+      stats['port{}_avg_latency'.format(i)] = s.latency[i] / reqs if reqs > 0 else 0.0
+      stats['port{}_max_latency'.format(i)] = s.max_latency[i]
+    return stats
+
+  def printStats(s):
+    stats = s.getStats()
+
+    print('')
+    print(' + Memory Trace Replay:')
+    print('     - Number of Cycles = {}'.format(stats['cycles']))
+    print('     - Number of Requests = {}'.format(stats['reqs']))
+    if s.timed:
+      print('     - Cycles Delayed by Busy Ports = {}'.format(stats['slip']))
+    for i in sorted({i for i, _ in s.num_reqs}):
+      print('     - Port {}: reads = {}, writes = {}, avg. latency = {:.2f}, max. latency = {}'.format(
+            i, stats['port{}_reads'.format(i)], stats['port{}_writes'.format(i)],
+            stats['port{}_avg_latency'.format(i)], stats['port{}_max_latency'.format(i)]))
+    if s.host_time > 0:
+      print('     - Host Time = {:.3f} s ({:.0f} requests/s)'.format(s.host_time, stats['reqs'] / s.host_time))
+    print('')
@@ -0,0 +1,7 @@
+from .branch_predictor import BranchPredictor
+from .btb              import BranchTargetBuffer
+from .btb              import ReturnAddressStack
+from .direction        import StaticPredictor
+from .direction        import BimodalPredictor
+from .direction        import GSharePredictor
+from .direction        import TournamentPredictor
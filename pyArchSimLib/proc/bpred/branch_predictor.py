@@ -0,0 +1,178 @@
+# branch_predictor.py
+# --------------------------------------------------------------------
+#   Branch prediction for the fetch stage.
+#
+#   The fetch stage asks for the next PC of every fetched instruction.
+#   On a BTB hit, conditional branches follow the direction predictor,
+#   jumps and calls go to their last target (calls also push their
+#   return address), and returns pop the RAS. Everything else falls
+#   through to PC + 4.
+#
+#   The global history is updated speculatively with the predicted
+#   directions. Each prediction comes with a checkpoint of the history
+#   and the RAS, which the core hands back when the instruction is
+#   resolved: the tables are trained with it, and, on a misprediction,
+#   the history and the RAS are repaired from it.
+#
+#   Without a BTB (the "none" predictor), fetch always predicts
+#   PC + 4, as the core did before predictors were added; control flow
+#   is still counted, so the cost of not predicting is reported.
+
+from .btb       import COND, CALL, RETURN
+from .btb       import BranchTargetBuffer
+from .btb       import ReturnAddressStack
+from .direction import StaticPredictor
+from .direction import BimodalPredictor
+from .direction import GSharePredictor
+from .direction import TournamentPredictor
+
+class BranchPredictor():
+  # Names of the kinds of control flow, indexed by kind
+  kinds = (None, 'cond', 'jump', 'call', 'return')
+
+  # Names accepted by make()
+  names = ('none', 'nt', 'taken', 'btfn', 'bimodal', 'gshare', 'tournament')
+
+  def __init__(s, direction=None, btb_entries=0, ras_entries=0):
+    s.direction = direction
+    s.btb       = BranchTargetBuffer(btb_entries) if btb_entries > 0 else None
+    s.ras       = ReturnAddressStack(ras_entries) if ras_entries > 0 else None
+
+    # Global history of the conditional branches (newest in bit 0)
+    s.ghr = 0
+
+    # Statistics, indexed by kind
+    s.num_branches    = [0] * len(s.kinds)
+    s.num_mispredicts = [0] * len(s.kinds)
+    s.num_btb_misses  = 0
+
+  @staticmethod
+  def make(name, entries=1024, history_bits=10, btb_entries=256, ras_entries=16):
+    if   name == 'none'      : return BranchPredictor()
+    elif name in StaticPredictor.modes:
+      direction = StaticPredictor(name)
+    elif name == 'bimodal'   : direction = BimodalPredictor   (entries)
+    elif name == 'gshare'    : direction = GSharePredictor    (entries, history_bits)
+    elif name == 'tournament': direction = TournamentPredictor(entries, history_bits)
+    else:
+      raise ValueError('unknown branch predictor "{}"'.format(name))
+    return BranchPredictor(direction, btb_entries, ras_entries)
+
+  #=====================================================================
+  # Prediction
+  #=====================================================================
+  # Returns the predicted next PC and the checkpoint to hand back
+  def predict(s, pc):
+    if s.btb is None:
+      return pc + 4, None
+
+    kind, target = s.btb.lookup(pc)
+
+    hist = s.ghr
+    ckpt = (kind, hist, s.ras.checkpoint() if s.ras is not None else None)
+
+    if   kind == 0:
+      return pc + 4, ckpt
+    elif kind == COND:
+      taken = s.direction.predict(pc, target, hist)
+      s.ghr = ((hist << 1) | taken) & 0xffffffff
+      return (target if taken else pc + 4), ckpt
+    elif kind == CALL:
+      if s.ras is not None: s.ras.push(pc + 4)
+    elif kind == RETURN:
+      if s.ras is not None:
+        addr = s.ras.pop()
+        if addr != 0: return addr, ckpt
+
+    return target, ckpt
+
+  #=====================================================================
+  # Training
+  #=====================================================================
+  # Called once a control-flow instruction is resolved, with the next
+  # PC that was predicted for it and the actual one. A core that trains
+  # at commit repairs the speculative state itself, when the
+  # misprediction is detected (see repair())
+  def train(s, pc, pred_npc, npc, kind, taken, ckpt, repair=True):
+    mispredicted = pred_npc != npc
+
+    s.num_branches[kind] += 1
+    if mispredicted: s.num_mispredicts[kind] += 1
+
+    if ckpt is None:
+      return
+
+    pred_kind, hist, _ = ckpt
+
+    if pred_kind == 0: s.num_btb_misses += 1
+
+    if kind == COND:
+      s.direction.update(pc, npc, hist, taken)
+
+    # Only taken branches are worth a BTB entry
+    if taken:
+      s.btb.update(pc, npc, kind)
+
+    if repair and mispredicted:
+      s.repair(pc, kind, taken, ckpt)
+
+  # Repairs the speculative state after a misprediction, as if the
+  # instruction had been predicted correctly
+  def repair(s, pc, kind, taken, ckpt):
+    if ckpt is None:
+      return
+
+    _, hist, ras_ckpt = ckpt
+
+    s.ghr = hist
+    if kind == COND:
+      s.ghr = ((hist << 1) | taken) & 0xffffffff
+
+    if s.ras is not None:
+      s.ras.restore(ras_ckpt)
+      if   kind == CALL  : s.ras.push(pc + 4)
+      elif kind == RETURN: s.ras.pop()
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def describe(s):
+    if s.btb is None:
+      return 'none (always PC + 4)'
+    desc = '{}; BTB {} entries'.format(s.direction.describe(), len(s.btb))
+    if s.ras is not None:
+      desc += '; RAS {} entries'.format(len(s.ras))
+    return desc
+
+  def getStats(s):
+    stats = {}
+    stats['branches'   ] = sum(s.num_branches)
+    stats['mispredicts'] = sum(s.num_mispredicts)
+    for kind, name in enumerate(s.kinds):
+      if name is None: continue
+      stats[name                 ] = s.num_branches   [kind]
+      stats[name + '_mispredicts'] = s.num_mispredicts[kind]
+    stats['btb_misses' ] = s.num_btb_misses
+    return stats
+
+  # MPKI is per thousand of `num_insts` (the committed instructions)
+  def printStats(s, num_insts):
+    def accuracy(branches, mispredicts):
+      return 100.0 * (branches - mispredicts) / branches if branches > 0 else 0.0
+
+    branches    = sum(s.num_branches)
+    mispredicts = sum(s.num_mispredicts)
+
+    print(' + Branch Prediction ({}):'.format(s.describe()))
+    print('     - Control-Flow Instructions = {}'.format(branches))
+    print('     - Mispredictions = {}'.format(mispredicts))
+    print('     - Accuracy = {:.2f}%'.format(accuracy(branches, mispredicts)))
+    print('     - MPKI = {:.3f}'.format(1000.0 * mispredicts / num_insts if num_insts > 0 else 0.0))
+    for kind, name in enumerate(s.kinds):
+      if name is None or s.num_branches[kind] == 0: continue
+      print('     - {: <8} {: >10} executed, {: >8} mispredicted ({:.2f}% accuracy)'.format(
+            name + ':', s.num_branches[kind], s.num_mispredicts[kind],
+            accuracy(s.num_branches[kind], s.num_mispredicts[kind])))
+    if s.btb is not None:
+      print('     - BTB Misses = {}'.format(s.num_btb_misses))
+    print('')
@@ -0,0 +1,82 @@
+# btb.py
+# --------------------------------------------------------------------
+#   Branch target buffer and return-address stack.
+#
+#   The BTB tells the fetch stage, from the PC alone, that an
+#   instruction is a control-flow one, of which kind, and where it went
+#   the last time it was taken. It is direct-mapped and tagged with the
+#   whole PC, so it never aliases.
+#
+#   The RAS predicts the targets of returns. It is a circular stack, so
+#   overflowing it overwrites the oldest return addresses, and it is
+#   updated speculatively at fetch: a checkpoint (the top index and the
+#   top entry) is taken with every prediction to repair it after a
+#   misprediction.
+
+from array import array
+
+# Kinds of control-flow instructions (0 is a BTB miss)
+COND   = 1
+JUMP   = 2
+CALL   = 3
+RETURN = 4
+
+#=========================================================================
+# Branch Target Buffer
+#=========================================================================
+class BranchTargetBuffer():
+  def __init__(s, entries=256):
+    if entries <= 0 or entries & (entries - 1):
+      raise ValueError('the number of BTB entries must be a power of two')
+
+    s.mask    = entries - 1
+    s.tags    = array('I', [0xffffffff]) * entries
+    s.targets = array('I', [0]) * entries
+    s.kinds   = array('B', [0]) * entries
+
+  # Returns the (kind, target) of the PC, or (0, 0) if it misses
+  def lookup(s, pc):
+    idx = (pc >> 2) & s.mask
+    if s.tags[idx] != pc:
+      return 0, 0
+    return s.kinds[idx], s.targets[idx]
+
+  def update(s, pc, target, kind):
+    idx = (pc >> 2) & s.mask
+    s.tags   [idx] = pc
+    s.targets[idx] = target & 0xffffffff
+    s.kinds  [idx] = kind
+
+  def __len__(s):
+    return len(s.tags)
+
+#=========================================================================
+# Return-Address Stack
+#=========================================================================
+class ReturnAddressStack():
+  def __init__(s, entries=16):
+    if entries <= 0:
+      raise ValueError('the RAS needs at least one entry')
+
+    s.stack = array('I', [0]) * entries
+    s.tos   = 0
+
+  def push(s, addr):
+    s.tos = (s.tos + 1) % len(s.stack)
+    s.stack[s.tos] = addr & 0xffffffff
+
+  # Returns 0 if nothing was pushed there
+  def pop(s):
+    addr  = s.stack[s.tos]
+    s.tos = (s.tos - 1) % len(s.stack)
+    return addr
+
+  def checkpoint(s):
+    return s.tos, s.stack[s.tos]
+
+  def restore(s, ckpt):
+    s.tos = ckpt[0]
+    s.stack[s.tos] = ckpt[1]
+
+  def __len__(s):
+    return len(s.stack)
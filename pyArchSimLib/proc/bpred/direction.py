@@ -0,0 +1,121 @@
+# direction.py
+# --------------------------------------------------------------------
+#   Direction predictors for conditional branches.
+#
+#   A direction predictor guesses whether a conditional branch is
+#   taken, from its PC, its (taken) target and the global history of
+#   branch outcomes that the front end hands over. The same history is
+#   handed over again when the branch is resolved, so the tables are
+#   trained at the entries that made the prediction.
+#
+#   The tables hold 2-bit saturating counters in compact arrays of
+#   bytes (0-1: not taken, 2-3: taken).
+
+from array import array
+
+def makeCounters(entries, init=1):
+  if entries <= 0 or entries & (entries - 1):
+    raise ValueError('the number of predictor entries must be a power of two')
+  return array('B', [init]) * entries
+
+def updateCounter(counters, idx, taken):
+  counter = counters[idx]
+  if taken:
+    if counter < 3: counters[idx] = counter + 1
+  else:
+    if counter > 0: counters[idx] = counter - 1
+
+#=========================================================================
+# Static
+#=========================================================================
+class StaticPredictor():
+  # nt: never taken, taken: always taken, btfn: backward taken, forward
+  # not taken
+  modes = ('nt', 'taken', 'btfn')
+
+  def __init__(s, mode='nt'):
+    if mode not in s.modes:
+      raise ValueError('unknown static prediction "{}"'.format(mode))
+    s.mode = mode
+
+  def predict(s, pc, target, hist):
+    if s.mode == 'btfn':
+      return target <= pc
+    return s.mode == 'taken'
+
+  def update(s, pc, target, hist, taken):
+    pass
+
+  def describe(s):
+    return {'nt': 'static not-taken', 'taken': 'static taken', 'btfn': 'static BTFN'}[s.mode]
+
+#=========================================================================
+# Bimodal
+#=========================================================================
+class BimodalPredictor():
+  def __init__(s, entries=1024):
+    s.counters = makeCounters(entries)
+    s.mask     = entries - 1
+
+  def predict(s, pc, target, hist):
+    return s.counters[(pc >> 2) & s.mask] >= 2
+
+  def update(s, pc, target, hist, taken):
+    updateCounter(s.counters, (pc >> 2) & s.mask, taken)
+
+  def describe(s):
+    return 'bimodal, {} entries'.format(len(s.counters))
+
+#=========================================================================
+# GShare
+#=========================================================================
+class GSharePredictor():
+  def __init__(s, entries=1024, history_bits=10):
+    s.counters  = makeCounters(entries)
+    s.mask      = entries - 1
+    s.hist_bits = history_bits
+    s.hist_mask = (1 << history_bits) - 1
+
+  def index(s, pc, hist):
+    return ((pc >> 2) ^ (hist & s.hist_mask)) & s.mask
+
+  def predict(s, pc, target, hist):
+    return s.counters[s.index(pc, hist)] >= 2
+
+  def update(s, pc, target, hist, taken):
+    updateCounter(s.counters, s.index(pc, hist), taken)
+
+  def describe(s):
+    return 'gshare, {} entries, {}-bit history'.format(len(s.counters), s.hist_bits)
+
+#=========================================================================
+# Tournament
+#=========================================================================
+# A bimodal and a gshare predictor, with a table of 2-bit choosers
+# (indexed by the PC) that learns which of the two to trust for every
+# branch (0-1: bimodal, 2-3: gshare).
+class TournamentPredictor():
+  def __init__(s, entries=1024, history_bits=10):
+    s.local    = BimodalPredictor(entries)
+    s.glob     = GSharePredictor (entries, history_bits)
+    s.choosers = makeCounters(entries, 2)
+    s.mask     = entries - 1
+
+  def predict(s, pc, target, hist):
+    if s.choosers[(pc >> 2) & s.mask] >= 2:
+      return s.glob.predict(pc, target, hist)
+    return s.local.predict(pc, target, hist)
+
+  def update(s, pc, target, hist, taken):
+    local_ok = s.local.predict(pc, target, hist) == taken
+    glob_ok  = s.glob .predict(pc, target, hist) == taken
+
+    # Choosers only learn when the two disagree
+    if local_ok != glob_ok:
+      updateCounter(s.choosers, (pc >> 2) & s.mask, glob_ok)
+
+    s.local.update(pc, target, hist, taken)
+    s.glob .update(pc, target, hist, taken)
+
+  def describe(s):
+    return 'tournament, {} entries, {}-bit history'.format(len(s.choosers), s.glob.hist_bits)
@@ -1 +1,7 @@
 from .five_stage_core import FiveStageInorderCore
+from .superscalar_core import SuperscalarInorderCore
+from .ooo_core import OutOfOrderCore
+from .inst_mix import InstMix
+from .func_units import FunctionalUnit
+from .store_buffer import StoreBuffer
+from .fetch_queue import FetchQueue
@@ -0,0 +1,98 @@
+# fetch_queue.py
+# --------------------------------------------------------------------
+#   Fetch queue of a decoupled front end.
+#
+#   Without a queue, fetch only sends a request once decode took the
+#   previous instruction, so every decode stall also stalls fetch, and
+#   every fetch bubble reaches decode. With a queue, fetch keeps
+#   following the predicted path while decode stalls, one fetch block
+#   per request, as long as the queue has room: a block is up to
+#   `block` instructions within an aligned block of as many words (an
+#   icache line), up to the first predicted-taken instruction.
+#
+#   The queue only keeps the fetched instructions (the slots of the
+#   core, with their instruction words); the core sends the requests
+#   and takes the instructions in order (see fetchAhead() and recvFetch()
+#   in the five-stage core). On a squash the whole queue is flushed, and
+#   the response of a block fetched before it is dropped.
+
+from collections import deque
+
+class FetchQueue():
+  def __init__(s, entries, block=1):
+    if entries < 1:
+      raise ValueError('the fetch queue needs at least one entry')
+    if block < 1:
+      raise ValueError('the fetch block needs at least one instruction')
+    if block > entries:
+      raise ValueError('the fetch block ({}) cannot be larger than the fetch queue ({})'.format(block, entries))
+
+    s.entries = entries
+    s.block   = block
+
+    # Fetched instructions, oldest first
+    s.slots = deque()
+
+    # Slots of the block waiting for its imem response
+    s.inflight = None
+
+    # Statistics
+    s.num_blocks  = 0
+    s.num_fetched = 0
+    s.num_flushed = 0
+    s.num_full    = 0 # cycles fetch waited for room in the queue
+    s.occupancy   = 0 # sum of the instructions queued, per cycle
+
+  def __len__(s):
+    return len(s.slots)
+
+  def isEmpty(s):
+    return not s.slots
+
+  def isDrained(s):
+    return not s.slots and s.inflight is None
+
+  # Instructions that still fit, once the outstanding block is in
+  def room(s):
+    inflight = len(s.inflight) if s.inflight is not None else 0
+    return s.entries - len(s.slots) - inflight
+
+  # A block was sent to the imem
+  def send(s, group):
+    s.inflight     = group
+    s.num_blocks  += 1
+    s.num_fetched += len(group)
+
+  def push(s, slot):
+    s.slots.append(slot)
+
+  def pop(s):
+    return s.slots.popleft()
+
+  # Drops the queued instructions; returns how many there were (the
+  # outstanding block is dropped once its response is back)
+  def flush(s):
+    n = len(s.slots)
+    s.slots.clear()
+    s.num_flushed += n
+    return n
+
+  def getStats(s):
+    stats = {}
+    stats['blocks'   ] = s.num_blocks
+    stats['fetched'  ] = s.num_fetched
+    stats['flushed'  ] = s.num_flushed
+    stats['full'     ] = s.num_full
+    stats['occupancy'] = s.occupancy
+    return stats
+
+  # Averages are per simulated cycle
+  def printStats(s, cycles, stall_stats):
+    print(' + Fetch Queue ({} entries, {}-instruction fetch blocks):'.format(s.entries, s.block))
+    print('     - Blocks Fetched = {}'.format(s.num_blocks))
+    print('     - Instructions per Block = {:.3f}'.format(s.num_fetched / s.num_blocks if s.num_blocks > 0 else 0.0))
+    print('     - Instructions Flushed = {}'.format(s.num_flushed))
+    print('     - Average Occupancy = {:.3f}'.format(s.occupancy / cycles if cycles > 0 else 0.0))
+    print('     - Cycles Fetch Waited for Room = {}'.format(s.num_full))
+    print('     - Cycles Decode Waited for Fetch = {}'.format(stall_stats['d_imem']))
+    print('')
@@ -9,6 +9,14 @@ import random
 
 from pyArchSimLib.arch.isa import mips32
 
+from .inst_mix     import InstMix
+from .func_units   import FunctionalUnit
+from .store_buffer import StoreBuffer, SB_HIT, SB_PARTIAL
+from .fetch_queue  import FetchQueue
+
+from pyArchSimLib.proc.bpred     import BranchPredictor
+from pyArchSimLib.proc.bpred.btb import COND, JUMP, CALL, RETURN
+
 class FiveStageInorderCore():
   def __init__(s, entry_point = 0x0400_0000):
     # Cycle Count
@@ -17,6 +25,24 @@ class FiveStageInorderCore():
     # This processor can only do MIPS32 for now.
     s.arch = mips32.arch()
 
+    # Precompiled ISA tables
+    tbl = mips32.tables()
+    s.isa_mnemonic   = tbl['mnemonic'        ]
+    s.isa_type       = tbl['type'            ]
+    s.isa_rmask      = tbl['rmask'           ]
+    s.isa_wmask      = tbl['wmask'           ]
+    s.isa_is_mem     = tbl['is_mem'          ]
+    s.isa_mem_sz     = tbl['mem_sz'          ]
+    s.isa_mem_sext   = tbl['mem_sext'        ]
+    s.isa_is_atomic  = tbl['is_atomic'       ]
+    s.isa_exec       = tbl['exec'            ]
+    s.isa_decode     = tbl['decode'          ]
+    s.isa_decode_ext = tbl['decode_ext'      ]
+    s.isa_ext_shift  = tbl['decode_ext_shift']
+
+    # Execute handlers, indexed by the ISA's handler index
+    s.exec_tbl = [getattr(s, 'exec_' + name) for name in tbl['exec_names']]
+
     # With every squash, we increment the epoch
     # hawajkm: this works only because of in-order
     #          execution
@@ -24,6 +50,9 @@ class FiveStageInorderCore():
     s.squash    = False
     s.squash_pc = 0x00000000
 
+    # Sequence number of the next fetched instruction
+    s.seq = 0
+
     # Pipeline Registers
     s.f2d = None
     s.d2x = None
@@ -53,6 +82,29 @@ class FiveStageInorderCore():
     # Forwarding Network
     s.forwarding_network = {}
 
+    # Branch prediction (none by default: fetch predicts PC + 4)
+    s.bp = BranchPredictor()
+
+    # Multi-cycle functional units, indexed by the ISA's handler index
+    # (None for single-cycle operations)
+    s.fus        = {name: FunctionalUnit(name) for name in FunctionalUnit.classes}
+    s.fu_of_exec = None
+    s.buildFuTable()
+
+    # First cycle in which the result of a multi-cycle operation can be
+    # read, per register, and the latest of them
+    s.reg_ready     = [0 for _ in range(32)]
+    s.fu_busy_until = 0
+
+    # Store buffer (none by default: stores are written from execute)
+    s.sb = None
+
+    # Loads and unbuffered stores waiting for a dmem response
+    s.dmem_pending = 0
+
+    # Fetch queue (none by default: fetch waits for decode)
+    s.fq = None
+
     # Memory calls
     s.MemReadFunct  = None
     s.MemWriteFunct = None
@@ -76,6 +128,30 @@ class FiveStageInorderCore():
     s.roi       = False
     s.inst_c    = False
 
+    # Position in a multicore system (see the core ID and core count
+    # syscalls)
+    s.core_id   = 0
+    s.num_cores = 1
+
+    # Statistics
+    s.stall_stats = {}
+    s.stall_stats['f_imem'   ] = 0 # imem port cannot take a request
+    s.stall_stats['d_imem'   ] = 0 # waiting for an imem response
+    s.stall_stats['d_raw'    ] = 0 # data hazard
+    s.stall_stats['d_syscall'] = 0 # draining the pipeline for a syscall
+    s.stall_stats['d_blocked'] = 0 # blocked behind an in-flight syscall
+    s.stall_stats['d_fu'     ] = 0 # waiting for a multi-cycle result
+    s.stall_stats['x_dmem'   ] = 0 # dmem port cannot take a request
+    s.stall_stats['x_fu'     ] = 0 # functional unit busy
+    s.stall_stats['x_sb_full'] = 0 # store buffer full
+    s.stall_stats['x_sb_part'] = 0 # load partially overlapping a buffered store
+    s.stall_stats['m_dmem'   ] = 0 # waiting for a dmem response
+    s.stall_stats['squash'   ] = 0 # squashed instructions
+
+    # Dynamic instruction mix of the whole run and of the ROI
+    s.inst_mix     = InstMix()
+    s.roi_inst_mix = InstMix()
+
   def getExitStatus(s):
     return s.exit, s.exit_code
 
@@ -85,6 +161,45 @@ class FiveStageInorderCore():
   def instCompletionFlag(s):
     return s.inst_c
 
+  # Statistics
+  def getStats(s):
+    stats = {}
+    stats['stalls' ] = dict(s.stall_stats)
+    stats['mix'    ] = s.inst_mix    .getStats()
+    stats['roi_mix'] = s.roi_inst_mix.getStats()
+    stats['bp'     ] = s.bp          .getStats()
+    stats['fu'     ] = {name: fu.getStats() for name, fu in s.fus.items()}
+    if s.sb is not None:
+      stats['sb'   ] = s.sb.getStats()
+    if s.fq is not None:
+      stats['fq'   ] = s.fq.getStats()
+    return stats
+
+  # Configure branch prediction
+  def setBranchPredictor(s, bp):
+    s.bp = bp
+
+  # Configure the functional units
+  def setFunctionalUnit(s, name, latency=None, ii=None):
+    s.fus[name] = FunctionalUnit(name, latency, ii)
+    s.buildFuTable()
+
+  # Configure the store buffer (0 entries to write stores from execute)
+  def setStoreBuffer(s, entries):
+    s.sb = StoreBuffer(entries) if entries > 0 else None
+
+  # Configure the fetch queue (0 entries for fetch to wait for decode),
+  # and the instructions of a fetch block
+  def setFetchQueue(s, entries, block=None):
+    s.fq = FetchQueue(entries, 1 if block is None else block) if entries > 0 else None
+
+  def buildFuTable(s):
+    exec_names   = mips32.tables()['exec_names']
+    s.fu_of_exec = [None] * len(exec_names)
+    for name, fu in s.fus.items():
+      for exec_name in FunctionalUnit.classes[name][0]:
+        s.fu_of_exec[exec_names.index(exec_name)] = fu
+
   # Configure memory calls
   def setMemReadFunct(s, MemReadFunct):
     s.MemReadFunct  = MemReadFunct
@@ -117,14 +232,122 @@ class FiveStageInorderCore():
     s.squash    = True
     s.squash_pc = npc
 
-  def train_bp(s, pc, npc, br_type, outcome):
-    pass
+  # Kind of a control-flow instruction, for the branch predictor
+  def branchKind(s, dinst, br_type):
+    iid = dinst['iid']
+    if   br_type == 1                                     : return COND
+    elif s.isa_wmask[iid] & mips32.REG_RA                 : return CALL
+    elif s.isa_type[iid] == 'jump_r' and dinst['rs'] == 31: return RETURN
+    else                                                  : return JUMP
+
+  # Trains the branch predictor with a resolved control-flow instruction
+  # (and repairs its speculative state on a misprediction)
+  def train_bp(s, dinst, npc, br_type, outcome):
+    kind = s.branchKind(dinst, br_type)
+    s.bp.train(dinst['pc'], dinst['npc'], npc, kind, outcome, dinst['bp'])
+
+  # Fetch restarts at the target of a squash
+  def redirectFetch(s):
+    s.epoch  = s.epoch + 1
+    s.pc     = s.squash_pc
+    s.squash = False
+
+    if s.fq is not None:
+      s.stall_stats['squash'] += s.fq.flush()
 
   # Stages are implemented as functions
   #=====================================================================
   # Fetch Stage
   #=====================================================================
+  # Predicts the instructions from the PC on, up to `max_insts`, the end
+  # of the aligned fetch block of `block_size` bytes, or the first
+  # predicted-taken one, and fetches them with one request; returns
+  # their slots
+  def fetchGroup(s, max_insts, block_size):
+    block_end = (s.pc // block_size + 1) * block_size
+
+    group = []
+    pc    = s.pc
+    while pc < block_end and len(group) < max_insts:
+      npc, bp_ckpt = s.bp.predict(pc)
+
+      slot = {}
+      slot['seq'] = s.seq
+      slot['pc' ] = pc
+      slot['npc'] = npc
+      slot['bp' ] = bp_ckpt
+      group.append(slot)
+
+      s.seq += 1
+
+      if npc != pc + 4:
+        break
+      pc = npc
+
+    # Memory request
+    req = {}
+    req['op'  ] = 0
+    req['addr'] = s.pc
+    req['data'] = None
+    req['size'] = 4 * len(group)
+    req['mask'] = None
+    req['tag' ] = s.epoch
+
+    s.iMemSendReq(req)
+
+    s.pc = npc
+
+    return group
+
+  # With a fetch queue, fetch sends a block whenever the previous one
+  # is back and the queue has room for a whole block
+  def fetchAhead(s):
+    s.fq.occupancy += len(s.fq)
+
+    if s.fq.inflight is not None:
+      return 'S <<<'
+
+    # (no block is predicted on the wrong path before a redirect)
+    if s.squash:
+      return '-'
+
+    if s.fq.room() < s.fq.block:
+      s.fq.num_full += 1
+      return 'S full'
+
+    if not s.iMemCanReq():
+      s.stall_stats['f_imem'] += 1
+      return 'S_imem'
+
+    pc = s.pc
+    s.fq.send(s.fetchGroup(s.fq.block, 4 * s.fq.block))
+
+    return '{:#010x}+{}'.format(pc, len(s.fq.inflight))
+
+  # Moves the block fetched ahead into the queue once its response is
+  # back, unless a squash came after it was fetched
+  def recvFetch(s):
+    if s.fq.inflight is not None and s.iMemHasResp():
+      resp  = s.iMemRecvResp()
+      group = s.fq.inflight
+      s.fq.inflight = None
+
+      assert (resp['addr'] == group[0]['pc'])
+
+      if resp['tag'] < s.epoch or s.squash:
+        s.fq.num_flushed        += len(group)
+        s.stall_stats['squash'] += len(group)
+      else:
+        data = resp['data']
+        for i, slot in enumerate(group):
+          slot['data'] = data[4*i:4*i+4]
+          slot['tag' ] = resp['tag']
+          s.fq.push(slot)
+
   def f(s):
+    if s.fq is not None:
+      return '{: <12}'.format(s.fetchAhead())
+
     lt_buf = ''
 
     if s.f2d is None:
@@ -132,7 +355,7 @@ class FiveStageInorderCore():
       if s.iMemCanReq():
         # Next PC
         ppc = s.pc
-        npc = s.pc + 4
+        npc, bp_ckpt = s.bp.predict(s.pc)
 
         # Memory request
         req = {}
@@ -147,8 +370,12 @@ class FiveStageInorderCore():
 
         # Pipeline register
         s.f2d = {}
+        s.f2d['seq'     ] = s.seq
         s.f2d['pc'      ] = s.pc
         s.f2d['npc'     ] = npc
+        s.f2d['bp'      ] = bp_ckpt
+
+        s.seq += 1
 
         # Advance PC
         s.pc = npc
@@ -164,6 +391,7 @@ class FiveStageInorderCore():
 
         lt_buf = '{: <10}'.format(ppc_str)
       else:
+        s.stall_stats['f_imem'] += 1
         lt_buf = '{: <10}'.format('S_imem')
     else:
       lt_buf = '{: <10}'.format('S <<<')
@@ -176,8 +404,11 @@ class FiveStageInorderCore():
   ### Aux methods and functions
   def makeDinst(s):
     dinst = {}
+    dinst['seq'     ] = 0
     dinst['inst'    ] = 0
+    dinst['iid'     ] = 0
     dinst['mnemonic'] = 'undef'
+    dinst['exec'    ] = 0
     dinst['squashed'] = False
     dinst['rs'      ] = 0
     dinst['rs_data' ] = 0xdeadbeef
@@ -187,8 +418,12 @@ class FiveStageInorderCore():
     dinst['imm16'   ] = 0
     dinst['imm26'   ] = 0
     dinst['isMem'   ] = False
+    dinst['ea'      ] = 0
+    dinst['mem_req' ] = False
+    dinst['taken'   ] = False
     dinst['pc'      ] = 0
     dinst['npc'     ] = 0
+    dinst['bp'      ] = None
     dinst['dep'     ] = {}
     dinst['dep'     ]['R'] = []
     dinst['dep'     ]['W'] = []
@@ -216,91 +451,33 @@ class FiveStageInorderCore():
 
     return dinst
 
+  # Decodes an instruction into its ID in the ISA tables (0 if the
+  # instruction is undefined)
   def decodeDinst(s, inst):
-    mnemonic = 'undef'
-    isMem    = False
-
-    # Fields
-    opcode = (inst >> 26) & 0x0000003f
-    rs     = (inst >> 21) & 0x0000001f
-    rt     = (inst >> 16) & 0x0000001f
-    cond   = (inst >> 16) & 0x0000001f
-    rd     = (inst >> 11) & 0x0000001f
-    shamt  = (inst >>  6) & 0x0000001f
-    funct  = (inst >>  0) & 0x0000003f
-    imm16  = (inst >>  0) & 0x0000ffff
-    imm26  = (inst >>  0) & 0x03ffffff
-
-    if opcode == 0x0:
-      if   funct == 0x00: mnemonic = 'sll'
-      elif funct == 0x02: mnemonic = 'srl'
-      elif funct == 0x03: mnemonic = 'sra'
-      elif funct == 0x04: mnemonic = 'sllv'
-      elif funct == 0x06: mnemonic = 'srlv'
-      elif funct == 0x07: mnemonic = 'srav'
-      elif funct == 0x08: mnemonic = 'jr'
-      elif funct == 0x0c: mnemonic = 'syscall'
-      elif funct == 0x18:
-        if   shamt == 0x02: mnemonic = 'mul'
-        elif shamt == 0x03: mnemonic = 'muh'
-      elif funct == 0x19:
-        if   shamt == 0x02: mnemonic = 'mulu'
-        elif shamt == 0x03: mnemonic = 'muhu'
-      elif funct == 0x1a:
-        if   shamt == 0x02: mnemonic = 'div'
-        elif shamt == 0x03: mnemonic = 'mod'
-      elif funct == 0x1b:
-        if   shamt == 0x02: mnemonic = 'divu'
-        elif shamt == 0x03: mnemonic = 'modu'
-      elif funct == 0x20: mnemonic = 'add'
-      elif funct == 0x21: mnemonic = 'addu'
-      elif funct == 0x22: mnemonic = 'sub'
-      elif funct == 0x23: mnemonic = 'subu'
-      elif funct == 0x24: mnemonic = 'and'
-      elif funct == 0x25: mnemonic = 'or'
-      elif funct == 0x26: mnemonic = 'xor'
-      elif funct == 0x27: mnemonic = 'nor'
-    elif opcode == 0x01:
-      if   cond == 0x00: mnemonic = 'bltz'
-      elif cond == 0x01: mnemonic = 'bgez'
-    elif opcode == 0x02: mnemonic = 'j'
-    elif opcode == 0x03: mnemonic = 'jal'
-    elif opcode == 0x04: mnemonic = 'beq'
-    elif opcode == 0x05: mnemonic = 'bne'
-    elif opcode == 0x06: mnemonic = 'blez'
-    elif opcode == 0x07: mnemonic = 'bgtz'
-    elif opcode == 0x08: mnemonic = 'addi'
-    elif opcode == 0x09: mnemonic = 'addiu'
-    elif opcode == 0x0c: mnemonic = 'andi'
-    elif opcode == 0x0d: mnemonic = 'ori'
-    elif opcode == 0x0e: mnemonic = 'xori'
-    elif opcode == 0x0f: mnemonic = 'lui'
-    elif opcode == 0x20: mnemonic = 'lb'
-    elif opcode == 0x21: mnemonic = 'lh'
-    elif opcode == 0x23: mnemonic = 'lw'
-    elif opcode == 0x24: mnemonic = 'lbu'
-    elif opcode == 0x25: mnemonic = 'lhu'
-    elif opcode == 0x28: mnemonic = 'sb'
-    elif opcode == 0x29: mnemonic = 'sh'
-    elif opcode == 0x2b: mnemonic = 'sw'
-
-    # Memory
-    if   mnemonic == 'lb' : isMem = True
-    elif mnemonic == 'lbu': isMem = True
-    elif mnemonic == 'lh' : isMem = True
-    elif mnemonic == 'lhu': isMem = True
-    elif mnemonic == 'lw' : isMem = True
-    elif mnemonic == 'sb' : isMem = True
-    elif mnemonic == 'sh' : isMem = True
-    elif mnemonic == 'sw' : isMem = True
-
-    # Done
-    return mnemonic, isMem
+    iid = s.isa_decode[((inst >> 20) & 0xfc0) | (inst & 0x3f)]
+    if iid < 0:
+      k   = -iid - 1
+      iid = s.isa_decode_ext[(k << 5) | ((inst >> s.isa_ext_shift[k]) & 0x1f)]
+    return iid
 
   ### Decode stage itself
+  # With a fetch queue, decode takes the oldest fetched instruction, as
+  # if it was the imem response
+  def fillDecode(s):
+    s.recvFetch()
+
+    if s.f2d is None and not s.fq.isEmpty():
+      slot = s.fq.pop()
+
+      s.f2d    = slot
+      s.inst_D = {'op': 0, 'addr': slot['pc'], 'data': slot['data'],
+                  'size': 4, 'mask': None, 'tag': slot['tag']}
+
   def d(s):
     lt_buf = ''
 
+    if s.fq is not None: s.fillDecode()
+
     if s.f2d is not None and s.d2x is None:
       if (s.iMemHasResp() or (s.inst_D is not None)) and not s.block_D:
         # Fill the buffer if it is empty
@@ -341,6 +518,7 @@ class FiveStageInorderCore():
 
         dinst = s.makeDinst()
 
+        dinst['seq'  ] = s.f2d['seq']
         dinst['inst' ] = inst
         dinst['rs'   ] = rs
         dinst['rt'   ] = rt
@@ -350,13 +528,17 @@ class FiveStageInorderCore():
         dinst['imm26'] = imm26
         dinst['pc'   ] = pc
         dinst['npc'  ] = npc
+        dinst['bp'   ] = s.f2d['bp']
 
         # Decode
-        mnemonic, isMem = s.decodeDinst(inst)
+        iid      = s.decodeDinst(inst)
+        mnemonic = s.isa_mnemonic[iid]
 
         # Set the instruction
+        dinst['iid'     ] = iid
         dinst['mnemonic'] = mnemonic
-        dinst['isMem'   ] = isMem
+        dinst['isMem'   ] = s.isa_is_mem[iid]
+        dinst['exec'    ] = s.isa_exec[iid]
 
         if squashed:
           s.squashDinst(dinst)
@@ -370,7 +552,7 @@ class FiveStageInorderCore():
 
           lt_buf = '{: <8}'.format(dinst['mnemonic'])
         else:
-          validInst = dinst['mnemonic'] in s.arch['insts']
+          validInst = iid != 0
 
           # Register read, perhaps?
           reads_rs = False
@@ -380,22 +562,18 @@ class FiveStageInorderCore():
 
           if validInst:
             # Get dependencies
-            inst_def    = s.arch['insts'][dinst['mnemonic']]
-            inst_syntax = inst_def['syntax']
-
-            # hawajkm: we need to think about implicit operands.
-            if mnemonic == 'jal':
-              write_rd = True
-              rd       = 31 
+            rmask = s.isa_rmask[iid]
+            wmask = s.isa_wmask[iid]
 
-            operands = inst_syntax.split(',')
+            reads_rs = (rmask & mips32.REG_RS) != 0
+            reads_rt = (rmask & mips32.REG_RT) != 0
+            write_rd = (wmask & mips32.REG_RD) != 0 and rd != 0
+            write_rt = (wmask & mips32.REG_RT) != 0 and rt != 0
 
-            for op in operands:
-              if   op == 'd' and rd != 0: write_rd = True
-              elif op == 'T' and rt != 0: write_rt = True
-              elif op == 's'            : reads_rs = True
-              elif op == 't'            : reads_rt = True
-              elif op == 'm'            : reads_rs = True
+            # hawajkm: implicit operands
+            if wmask & mips32.REG_RA:
+              write_rd = True
+              rd       = 31
 
             if write_rd: dinst['dep']['W'].append(rd)
             if write_rt: dinst['dep']['W'].append(rt)
@@ -434,19 +612,37 @@ class FiveStageInorderCore():
 
           stall_D = (rs_src < 0) or (rt_src < 0)
 
+          # Results of multi-cycle operations still being computed cannot
+          # be read yet, nor overwritten by a result that would be ready
+          # before them (this one executes next cycle at the earliest)
+          stall_FU = False
+          if s.cycle_count < s.fu_busy_until:
+            now = s.cycle_count
+            fu  = s.fu_of_exec[s.isa_exec[iid]]
+            for reg_idx in dinst['dep']['R']:
+              if s.reg_ready[reg_idx] > now:
+                stall_FU = True
+            ready = now + 1 + (fu.latency if fu is not None else 1)
+            for reg_idx in dinst['dep']['W']:
+              if s.reg_ready[reg_idx] > ready:
+                stall_FU = True
+
           # Stall due to syscall
           stall_Syscall = False
-          if mnemonic == 'syscall':
+          if s.isa_type[iid] == 'syscall':
             num_writers = 0
             for writers in s.ready_list:
               num_writers += writers
-            if num_writers > 0:
+            if num_writers > 0 or s.cycle_count < s.fu_busy_until:
+              stall_Syscall = True
+            if s.sb is not None and not s.sb.isEmpty():
               stall_Syscall = True
 
           # Perform reads
           if   stall_Syscall:
+            s.stall_stats['d_syscall'] += 1
             lt_buf = '{: <8}'.format('S |>>')
-          elif not stall_D:
+          elif not stall_D and not stall_FU:
             if reads_rs:
               if   rs_src == 0: dinst['rs_data'] = s.rf[rs]
               elif rs_src == 1: dinst['rs_data'] = mInst['wb_data']
@@ -468,23 +664,18 @@ class FiveStageInorderCore():
             br_type = 0 # Not control-flow
 
             # Jumps
-            if   dinst['mnemonic'] == 'j'  :
-              high_bits = pc & 0xf0000000
-              npc = high_bits | (imm26 << 2)
-              br_type = 2
-              outcome = 1
-            elif dinst['mnemonic'] == 'jal':
+            if s.isa_type[iid] == 'jump':
               high_bits = pc & 0xf0000000
               npc = high_bits | (imm26 << 2)
               br_type = 2
               outcome = 1
 
             # Block decoding once a syscall is encountered
-            if mnemonic == 'syscall': s.block_D = True
+            if s.isa_type[iid] == 'syscall': s.block_D = True
 
             # Training BP
             if br_type != 0:
-              s.train_bp(pc, npc, br_type, outcome)
+              s.train_bp(dinst, npc, br_type, outcome)
 
             # Initiate squash
             if pred_npc != npc:
@@ -498,14 +689,24 @@ class FiveStageInorderCore():
 
             # linetracing
             lt_buf = '{: <8}'.format(dinst['mnemonic'])
-          else:
+          elif stall_D:
+            s.stall_stats['d_raw'] += 1
             lt_buf = '{: <8}'.format('S raw')
+          else:
+            s.stall_stats['d_fu'] += 1
+            lt_buf = '{: <8}'.format('S fu')
       elif (s.iMemHasResp() or (s.inst_D is not None)) and s.block_D:
+        s.stall_stats['d_blocked'] += 1
         lt_buf = '{: <8}'.format('S >>|')
       else:
+        s.stall_stats['d_imem'] += 1
         lt_buf = '{: <8}'.format('S mem')
     elif s.f2d is not None and s.d2x is not None:
       lt_buf = '{: <8}'.format('S <<<')
+    elif s.fq is not None and s.fq.inflight is not None and not s.squash:
+      # The queue ran dry
+      s.stall_stats['d_imem'] += 1
+      lt_buf = '{: <8}'.format('S mem')
     else:
       lt_buf = '{: <8}'.format(' ')
 
@@ -564,9 +765,40 @@ class FiveStageInorderCore():
   #=====================================================================
   # Execute Stage
   #=====================================================================
+  # Linetrace of the memory stalls in execute
+  mem_stall_lt = {'x_dmem': 'S mem', 'x_sb_full': 'S sb', 'x_sb_part': 'S sb~'}
+
+  # Returns the stall that keeps a load or store from executing, or None
+  def dmemStall(s, dinst):
+    if s.sb is None:
+      return None if s.dMemCanReq() else 'x_dmem'
+
+    # ll/sc go to the port once the store buffer drained
+    iid = dinst['iid']
+    if s.isa_is_atomic[iid]:
+      if not s.sb.isEmpty() or not s.dMemCanReq():
+        return 'x_dmem'
+      return None
+
+    if s.isa_type[iid] == 'store':
+      return 'x_sb_full' if s.sb.isFull() else None
+
+    # Loads hitting the store buffer do not need the port
+    ea     = dinst['rs_data'] + s.signed(s.sext(dinst['imm16']))
+    hit, _ = s.sb.lookup(ea, s.isa_mem_sz[iid])
+    if hit == SB_HIT    : return None
+    if hit == SB_PARTIAL: return 'x_sb_part'
+
+    if s.sb.inflight or not s.dMemCanReq():
+      return 'x_dmem'
+    return None
+
   def x(s):
     if   s.d2x is not None and s.x2m is     None:
       dinst = s.d2x
+      fu    = s.fu_of_exec[dinst['exec']]
+
+      mem_stall = s.dmemStall(dinst) if dinst['isMem'] else None
 
       if dinst['squashed']:
         # Go forward
@@ -575,30 +807,19 @@ class FiveStageInorderCore():
 
         return '{: <8}'.format('-')
 
+      # Structural hazard
+      elif fu is not None and not fu.canIssue(s.cycle_count):
+        fu.num_busy_stalls += 1
+        s.stall_stats['x_fu'] += 1
+        return '{: <8}'.format('S fu')
+
       # Check memory if needed
-      #                    memory stall condition
-      #                             |
-      #        /--------------------|--------------------\
-      #        vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
-      elif not (dinst['isMem'] and not s.dMemCanReq()):
-        # Read everything
-        inst     = dinst['inst'    ]
-        mnemonic = dinst['mnemonic']
-        squashed = dinst['squashed']
-        rs       = dinst['rs'      ]
-        rs_data  = dinst['rs_data' ]
-        rt       = dinst['rt'      ]
-        rt_data  = dinst['rt_data' ]
-        rd       = dinst['rd'      ]
-        shamt    = dinst['shamt'   ]
-        wb_data  = dinst['wb_data' ]
-        wb_en    = dinst['wb_en'   ]
-        imm16    = dinst['imm16'   ]
-        imm26    = dinst['imm26'   ]
-        isMem    = dinst['isMem'   ]
-        pc       = dinst['pc'      ]
-        pred_npc = dinst['npc'     ]
-        dep      = dinst['dep'     ]
+      #     memory stall condition
+      #              |
+      #       /------|------\
+      #       vvvvvvvvvvvvvvv
+      elif mem_stall is None:
+        pred_npc = dinst['npc']
 
         # The actual npc is initialized as the predicted one
         npc = pred_npc
@@ -607,392 +828,243 @@ class FiveStageInorderCore():
         outcome = 0 # Not taken
         br_type = 0 # Not control-flow
 
-        #================#
-        #      ALUs      #
-        #================#
-        if   mnemonic == 'add'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'addu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'sub'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 - op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'subu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 - op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'and'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 & op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'or'   :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 | op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'xor'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 ^ op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'nor'  :
-          op1 = rs_data
-          op2 = rt_data
-          opD = ~(op1 | op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        elif mnemonic == 'addi' :
-          op1 = rs_data
-          op2 = s.sext(imm16)
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'addiu':
-          op1 = rs_data
-          op2 = s.sext(imm16)
-          opD = op1 + op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'andi' :
-          op1 = rs_data
-          op2 = s.zext(imm16)
-          opD = op1 & op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'ori'  :
-          op1 = rs_data
-          op2 = s.zext(imm16)
-          opD = op1 | op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'xori' :
-          op1 = rs_data
-          op2 = s.zext(imm16)
-          opD = op1 ^ op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'lui' :
-          op1 = s.zext(imm16)
-          opD = op1 << 16
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        elif mnemonic == 'sll'  :
-          op1 = rs_data
-          op2 = shamt
-          opD = op1 << (op2 & 0x1f)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'srl'  :
-          op1 = rs_data
-          op2 = shamt
-          opD = op1 >> (op2 & 0x1f)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'sra'  :
-          op1 = rs_data
-          op2 = shamt
-          opD = op1 >> (op2 & 0x1f)
-          opD = s.sext(opD, 32 - op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'sllv' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 << (op2 & 0x1f)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'srlv' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 >> (op2 & 0x1f)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'srav' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 >> (op2 & 0x1f)
-          opD = s.sext(opD, 32 - op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        #================#
-        #  MUL/DIV/MOD   #
-        #================#
-        elif mnemonic == 'mul'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = op1 * op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'muh'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = (op1 * op2) / (2 ** 32)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'mulu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = op1 * op2
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'muhu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = (op1 * op2) / (2 ** 32)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        elif mnemonic == 'div'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = int(op1 / op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'mod'  :
-          op1 = s.signed(rs_data)
-          op2 = s.signed(rt_data)
-          opD = int(op1 % op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'divu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = int(op1 / op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-        elif mnemonic == 'modu' :
-          op1 = rs_data
-          op2 = rt_data
-          opD = int(op1 % op2)
-          wb_data = (opD) & 0xffffffff
-          wb_en = True
-
-        #================#
-        #     Memory     #
-        #================#
-        elif mnemonic == 'lb'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 1)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lh'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 2)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lw'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 4)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lbu'  :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 1)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'lhu'  :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-
-          mem_req = s.makeMemReadReq(ea, 2)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = True
-        elif mnemonic == 'sb'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-          data = rt_data
-
-          mem_req = s.makeMemWriteReq(ea, data, 1)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = False
-        elif mnemonic == 'sh'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-          data = rt_data
-
-          mem_req = s.makeMemWriteReq(ea, data, 2)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = False
-        elif mnemonic == 'sw'   :
-          op1 = rs_data
-          op2 = s.signed(s.sext(imm16))
-          ea  = op1 + op2
-          data = rt_data
-
-          mem_req = s.makeMemWriteReq(ea, data, 4)
-          s.dMemSendReq(mem_req)
-
-          wb_data = None
-          wb_en = False
-
-        #================#
-        #  Control Flow  #
-        #================#
-        elif mnemonic == 'beq'  :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = op1 == op2
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bne'  :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = op1 != op2
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bltz' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) < 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bgez' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) >= 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'blez' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) <= 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-        elif mnemonic == 'bgtz' :
-          op1 = rs_data
-          op2 = rt_data
-          tpc = pc + 4 + (s.signed(s.sext(imm16, 16)) << 2)
-          bcond = s.signed(op1) > 0
-          br_type = 1
-          outcome = 1 if bcond else 0
-          if bcond: npc = tpc
-
-        elif mnemonic == 'j'    : pass  # Nothing to do
-        elif mnemonic == 'jal'  :
-          wb_data = pc + 4
-          wb_en = True
-        elif mnemonic == 'jr'   :
-          op1 = rs_data
-          npc = op1
-          br_type = 2
-          outcome = 1
-
-        #================#
-        #    Syscall     #
-        #================#
-        elif mnemonic == 'syscall':
-          # hawajkm: due to its execution nature, syscall causes a
-          #          pipeline drain; thus, we don't have to worry about
-          #          any dependencies and we can just read the current
-          #          execution context as-is.
-
-          # Get all arguments
-          #arg0 = s.rf[4]
-          #arg1 = s.rf[5]
-          #arg2 = s.rf[6]
-          #arg3 = s.rf[7]
-
-          sc_code = s.rf[2]
-
-          #v0 = s.execute_sc(sc_code, arg0, arg1, arg2, arg3)
-          s.execute_sc(sc_code)
-
-        #================#
-        #   Undefined    #
-        #================#
-        elif mnemonic == 'undef':
-          print('')
-          print('  Error! Encountered an undefined instruction')
-          print('    - inst: {:#010x}'.format(dinst['inst']))
-          print('    - pc  : {:#010x}'.format(dinst['pc'  ]))
-          print('')
-          print('')
-          exit(-127)
+        # Execute
+        ctrl = s.exec_tbl[dinst['exec']](dinst)
+        if ctrl is not None:
+          npc, br_type, outcome = ctrl
+          dinst['taken'] = outcome == 1
+
+        # Multi-cycle operation
+        if fu is not None:
+          ready = fu.issue(s.cycle_count)
+          for reg_idx in dinst['dep']['W']:
+            s.reg_ready[reg_idx] = ready
+          if ready > s.fu_busy_until:
+            s.fu_busy_until = ready
 
         # Train BP
         if br_type != 0:
-          s.train_bp(pc, npc, br_type, outcome)
+          s.train_bp(dinst, npc, br_type, outcome)
 
         # Initiate a squash if actual npc is different
         # from predicted npc
         if pred_npc != npc:
           s.init_squash(npc)
 
-        # Modify the dinst
-        dinst['wb_data'] = wb_data
-        dinst['wb_en'  ] = wb_en
-
         # Go forward
         s.x2m = dinst
         s.d2x = None
 
         return '{: <8}'.format(dinst['mnemonic'])
       else:
-        return '{: <8}'.format('S mem')
+        s.stall_stats[mem_stall] += 1
+        return '{: <8}'.format(s.mem_stall_lt[mem_stall])
     elif s.d2x is not None and s.x2m is not None:
       return '{: <8}'.format('S <<<')
     else:
       return '{: <8}'.format(' ')
 
+  #=====================================================================
+  # Execute Handlers
+  #   One per entry of the ISA's `exec_names`. A handler sets the
+  #   writeback of the instruction; control-flow handlers return the
+  #   (npc, br_type, outcome) of the instruction.
+  #=====================================================================
+  def writeback(s, dinst, data):
+    dinst['wb_data'] = data & 0xffffffff
+    dinst['wb_en'  ] = True
+
+  #================#
+  #      ALUs      #
+  #================#
+  def exec_add(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] + dinst['rt_data'])
+  def exec_sub(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] - dinst['rt_data'])
+  def exec_and(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] & dinst['rt_data'])
+  def exec_or(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] | dinst['rt_data'])
+  def exec_xor(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] ^ dinst['rt_data'])
+  def exec_nor(s, dinst):
+    s.writeback(dinst, ~(dinst['rs_data'] | dinst['rt_data']))
+
+  def exec_addi(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] + s.sext(dinst['imm16']))
+  def exec_andi(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] & s.zext(dinst['imm16']))
+  def exec_ori(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] | s.zext(dinst['imm16']))
+  def exec_xori(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] ^ s.zext(dinst['imm16']))
+  def exec_lui(s, dinst):
+    s.writeback(dinst, s.zext(dinst['imm16']) << 16)
+
+  def exec_sll(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] << (dinst['shamt'] & 0x1f))
+  def exec_srl(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] >> (dinst['shamt'] & 0x1f))
+  def exec_sra(s, dinst):
+    shamt = dinst['shamt'] & 0x1f
+    s.writeback(dinst, s.sext(dinst['rs_data'] >> shamt, 32 - shamt))
+  def exec_sllv(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] << (dinst['rt_data'] & 0x1f))
+  def exec_srlv(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] >> (dinst['rt_data'] & 0x1f))
+  def exec_srav(s, dinst):
+    shamt = dinst['rt_data'] & 0x1f
+    s.writeback(dinst, s.sext(dinst['rs_data'] >> shamt, 32 - shamt))
+
+  #================#
+  #  MUL/DIV/MOD   #
+  #================#
+  def exec_mul(s, dinst):
+    s.writeback(dinst, s.signed(dinst['rs_data']) * s.signed(dinst['rt_data']))
+  def exec_muh(s, dinst):
+    s.writeback(dinst, (s.signed(dinst['rs_data']) * s.signed(dinst['rt_data'])) >> 32)
+  def exec_mulu(s, dinst):
+    s.writeback(dinst, dinst['rs_data'] * dinst['rt_data'])
+  def exec_muhu(s, dinst):
+    s.writeback(dinst, (dinst['rs_data'] * dinst['rt_data']) >> 32)
+
+  def exec_div(s, dinst):
+    s.writeback(dinst, int(s.signed(dinst['rs_data']) / s.signed(dinst['rt_data'])))
+  def exec_mod(s, dinst):
+    s.writeback(dinst, int(s.signed(dinst['rs_data']) % s.signed(dinst['rt_data'])))
+  def exec_divu(s, dinst):
+    s.writeback(dinst, int(dinst['rs_data'] / dinst['rt_data']))
+  def exec_modu(s, dinst):
+    s.writeback(dinst, int(dinst['rs_data'] % dinst['rt_data']))
+
+  #================#
+  #     Memory     #
+  #================#
+  def exec_load(s, dinst):
+    ea   = dinst['rs_data'] + s.signed(s.sext(dinst['imm16']))
+    size = s.isa_mem_sz[dinst['iid']]
+
+    dinst['ea'     ] = ea
+    dinst['wb_data'] = None
+    dinst['wb_en'  ] = True
+
+    # Forwarded from a buffered store
+    if s.sb is not None:
+      hit, data = s.sb.lookup(ea, size)
+      if hit == SB_HIT:
+        if s.isa_mem_sext[dinst['iid']]: data = s.sext(data, 8 * size)
+        dinst['wb_data'] = data
+        s.sb.num_forwarded += 1
+        return
+
+    mem_req = s.makeMemReadReq(ea, size)
+    s.dMemSendReq(mem_req)
+
+    dinst['mem_req'] = True
+    s.dmem_pending  += 1
+
+  def exec_store(s, dinst):
+    ea   = dinst['rs_data'] + s.signed(s.sext(dinst['imm16']))
+    size = s.isa_mem_sz[dinst['iid']]
+
+    dinst['ea'     ] = ea
+    dinst['wb_data'] = None
+    dinst['wb_en'  ] = False
+
+    if s.sb is not None:
+      s.sb.push(ea, dinst['rt_data'], size)
+      return
+
+    mem_req = s.makeMemWriteReq(ea, dinst['rt_data'], size)
+    s.dMemSendReq(mem_req)
+
+    dinst['mem_req'] = True
+    s.dmem_pending  += 1
+
+  # The ll and sc instructions are requests of their own (ops 2 and 3)
+  # that the memory system answers atomically; the response to an sc
+  # holds its result (1 or 0) as the loaded word.
+  def exec_ll(s, dinst):
+    ea = dinst['rs_data'] + s.signed(s.sext(dinst['imm16']))
+
+    dinst['ea'     ] = ea
+    dinst['wb_data'] = None
+    dinst['wb_en'  ] = True
+
+    mem_req = s.makeMemReadReq(ea, s.isa_mem_sz[dinst['iid']])
+    mem_req['op' ] = 2
+    mem_req['src'] = s.core_id
+    s.dMemSendReq(mem_req)
+
+    dinst['mem_req'] = True
+    s.dmem_pending  += 1
+
+  def exec_sc(s, dinst):
+    ea = dinst['rs_data'] + s.signed(s.sext(dinst['imm16']))
+
+    dinst['ea'     ] = ea
+    dinst['wb_data'] = None
+    dinst['wb_en'  ] = True
+
+    mem_req = s.makeMemWriteReq(ea, dinst['rt_data'], s.isa_mem_sz[dinst['iid']])
+    mem_req['op' ] = 3
+    mem_req['src'] = s.core_id
+    s.dMemSendReq(mem_req)
+
+    dinst['mem_req'] = True
+    s.dmem_pending  += 1
+
+  #================#
+  #  Control Flow  #
+  #================#
+  def resolveBranch(s, dinst, bcond):
+    if bcond:
+      tpc = dinst['pc'] + 4 + (s.signed(s.sext(dinst['imm16'], 16)) << 2)
+      return tpc, 1, 1
+    return dinst['pc'] + 4, 1, 0
+
+  def exec_beq(s, dinst):
+    return s.resolveBranch(dinst, dinst['rs_data'] == dinst['rt_data'])
+  def exec_bne(s, dinst):
+    return s.resolveBranch(dinst, dinst['rs_data'] != dinst['rt_data'])
+  def exec_bltz(s, dinst):
+    return s.resolveBranch(dinst, s.signed(dinst['rs_data']) <  0)
+  def exec_bgez(s, dinst):
+    return s.resolveBranch(dinst, s.signed(dinst['rs_data']) >= 0)
+  def exec_blez(s, dinst):
+    return s.resolveBranch(dinst, s.signed(dinst['rs_data']) <= 0)
+  def exec_bgtz(s, dinst):
+    return s.resolveBranch(dinst, s.signed(dinst['rs_data']) >  0)
+
+  def exec_j(s, dinst):
+    pass # Resolved in decode
+  def exec_jal(s, dinst):
+    s.writeback(dinst, dinst['pc'] + 4)
+  def exec_jr(s, dinst):
+    return dinst['rs_data'], 2, 1
+
+  #================#
+  #    Syscall     #
+  #================#
+  def exec_syscall(s, dinst):
+    # hawajkm: due to its execution nature, syscall causes a
+    #          pipeline drain; thus, we don't have to worry about
+    #          any dependencies and we can just read the current
+    #          execution context as-is.
+    s.execute_sc(s.rf[2])
+
+  #================#
+  #   Undefined    #
+  #================#
+  def exec_undef(s, dinst):
+    print('')
+    print('  Error! Encountered an undefined instruction')
+    print('    - inst: {:#010x}'.format(dinst['inst']))
+    print('    - pc  : {:#010x}'.format(dinst['pc'  ]))
+    print('')
+    print('')
+    exit(-127)
+
   #=====================================================================
   # Memory Stage
   #=====================================================================
@@ -1012,18 +1084,18 @@ class FiveStageInorderCore():
       #                            |
       #         /------------------|-----------------\
       #         vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
-      elif not (dinst['isMem'] and not s.dMemHasResp()):
+      elif not (dinst['mem_req'] and not s.dMemHasResp()):
         # Can process the instructions
         # If we have a memory instruction, we process the memory packet
-        if dinst['isMem']:
+        if dinst['mem_req']:
           mem_resp = s.dMemRecvResp()
+          s.dmem_pending -= 1
           if dinst['wb_en']:
             data = 0
             for i in range(mem_resp['size']):
               data = data | (mem_resp['data'][i] << (8 * i))
             # Extend?
-            if   dinst['mnemonic'] == 'lb': data = s.sext(data,  8)
-            elif dinst['mnemonic'] == 'lh': data = s.sext(data, 16)
+            if s.isa_mem_sext[dinst['iid']]: data = s.sext(data, 8 * mem_resp['size'])
             dinst['wb_data'] = data
 
         # Go forward
@@ -1032,6 +1104,7 @@ class FiveStageInorderCore():
 
         return '{: <8}'.format(dinst['mnemonic'])
       else:
+        s.stall_stats['m_dmem'] += 1
         return '{: <8}'.format('S dmem')
     elif s.x2m is not None and s.m2w is not None:
       return '{: <8}'.format('S <<<')
@@ -1048,6 +1121,7 @@ class FiveStageInorderCore():
       dinst = s.m2w
 
       if dinst['squashed']:
+        s.stall_stats['squash'] += 1
         lt_buf = '-'
       else:
         if dinst['mnemonic'] == 'syscall': s.block_D_s = False
@@ -1063,6 +1137,9 @@ class FiveStageInorderCore():
         # We completed an instruction
         s.inst_c = True
 
+        s.inst_mix.commit(dinst)
+        if s.roi: s.roi_inst_mix.commit(dinst)
+
       # Keep ticking...
       s.m2w = None
 
@@ -1099,6 +1176,12 @@ class FiveStageInorderCore():
       s.exit      = True
     elif sc_code == 88:
       s.roi = not s.roi
+    # The core ID and the number of cores are returned in $v0;
+    # the pipeline is drained, so nobody else writes it.
+    elif sc_code == 100:
+      s.rf[2] = s.core_id
+    elif sc_code == 101:
+      s.rf[2] = s.num_cores
     else:
       print('')
       print('  Error! Unknown requested system call.')
@@ -1108,10 +1191,97 @@ class FiveStageInorderCore():
 
       exit(-126)
 
+  #=====================================================================
+  # Functional Execution
+  #   Executes the instruction at the PC in one go, with no timing,
+  #   through the memory calls. This is used to fast-forward, and only
+  #   works while the pipeline is empty (e.g., before the first tick).
+  #   Returns the PC and the ID of the executed instruction.
+  #=====================================================================
+  def isDrained(s):
+    return (s.f2d is None and s.d2x is None and s.x2m is None and
+            s.m2w is None and s.inst_D is None and
+            (s.sb is None or s.sb.isEmpty()) and
+            (s.fq is None or s.fq.isDrained()))
+
+  def step(s):
+    pc   = s.pc
+    inst = int.from_bytes(s.MemReadFunct(pc, 4), 'little')
+    iid  = s.decodeDinst(inst)
+
+    rs    = (inst >> 21) & 0x1f
+    rt    = (inst >> 16) & 0x1f
+    imm16 = inst & 0xffff
+
+    npc = pc + 4
+
+    if s.isa_is_mem[iid]:
+      ea   = s.rf[rs] + s.signed(s.sext(imm16))
+      size = s.isa_mem_sz[iid]
+      if s.isa_type[iid] == 'load':
+        data = int.from_bytes(s.MemReadFunct(ea, size), 'little')
+        if s.isa_mem_sext[iid]: data = s.sext(data, 8 * size)
+        if rt != 0: s.rf[rt] = data
+      else:
+        s.MemWriteFunct(ea, (s.rf[rt] & ((1 << (8 * size)) - 1)).to_bytes(size, 'little'), size)
+        # (an sc always succeeds, with nobody else around)
+        if s.isa_wmask[iid] & mips32.REG_RT and rt != 0: s.rf[rt] = 1
+    else:
+      dinst = {}
+      dinst['inst'   ] = inst
+      dinst['iid'    ] = iid
+      dinst['rs_data'] = s.rf[rs]
+      dinst['rt_data'] = s.rf[rt]
+      dinst['shamt'  ] = (inst >> 6) & 0x1f
+      dinst['imm16'  ] = imm16
+      dinst['pc'     ] = pc
+      dinst['npc'    ] = npc
+      dinst['wb_en'  ] = False
+
+      ctrl = s.exec_tbl[s.isa_exec[iid]](dinst)
+      if   ctrl is not None:
+        npc = ctrl[0]
+      elif s.isa_type[iid] == 'jump':
+        npc = (pc & 0xf0000000) | ((inst & 0x03ffffff) << 2)
+
+      if dinst['wb_en']:
+        wmask = s.isa_wmask[iid]
+        if   wmask & mips32.REG_RA: dst = 31
+        elif wmask & mips32.REG_RD: dst = (inst >> 11) & 0x1f
+        else                      : dst = rt
+        if dst != 0: s.rf[dst] = dinst['wb_data']
+
+    s.pc = npc
+
+    return pc, iid
+
+  #=====================================================================
+  # Store Buffer
+  #   The oldest buffered store is written whenever the dmem port has
+  #   nothing else to do (loads go first), and leaves the buffer once
+  #   its response is back.
+  #=====================================================================
+  def retireStore(s):
+    if s.sb is not None and s.sb.inflight and s.dMemHasResp():
+      s.dMemRecvResp()
+      s.sb.pop()
+      s.sb.inflight = False
+
+  def drainStore(s):
+    if (s.sb is not None and not s.sb.isEmpty() and not s.sb.inflight and
+        s.dmem_pending == 0 and s.dMemCanReq()):
+      addr, data, size = s.sb.peek()
+      s.dMemSendReq(s.makeMemWriteReq(addr, data, size))
+      s.sb.inflight = True
+
   #=====================================================================
   # Tick
   #=====================================================================
   def tick(s):
+    s.cycle_count += 1
+
+    s.retireStore()
+
     # Reset
     s.inst_c = False
 
@@ -1148,11 +1318,11 @@ class FiveStageInorderCore():
     if s.block_D_s is not None:
       s.block_D = s.block_D_s
 
+    s.drainStore()
+
     # Handle a squash
     if s.squash:
-      s.epoch  = s.epoch + 1
-      s.pc     = s.squash_pc
-      s.squash = False
+      s.redirectFetch()
 
     # Linetrace
     s.lt_buf = ''
@@ -1162,3 +1332,12 @@ class FiveStageInorderCore():
 
   def linetrace(s):
     return s.lt_buf
+
+  # Titles and widths of the columns of the linetrace (fetching ahead
+  # shows the blocks in flight next to the pc)
+  def linetraceColumns(s):
+    fetch = 10 if s.fq is None else 12
+    return [('Fetch', fetch), ('Decode', 8), ('Execute', 8), ('Memory', 8), ('Complete', 8)]
+
+  def linetraceHeader(s):
+    return ' | '.join('{: <{}}'.format(title, width) for title, width in s.linetraceColumns())
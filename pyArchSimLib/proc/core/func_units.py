@@ -0,0 +1,76 @@
+# func_units.py
+# --------------------------------------------------------------------
+#   Multi-cycle functional units.
+#
+#   Every unit has a latency (the cycles from the start of an operation
+#   until its result can be forwarded, 1 being a plain ALU) and an
+#   initiation interval (the cycles until the unit takes the next
+#   operation): a pipelined multiplier takes one operation per cycle,
+#   while an iterative divider is busy for the whole operation.
+#
+#   A unit only keeps the timing; the operation itself is still carried
+#   out by the execute handler of the core.
+
+class FunctionalUnit():
+  # Execute handlers served by each unit, and its default latency and
+  # initiation interval
+  classes = {
+    'mul': (('mul', 'muh', 'mulu', 'muhu'),  3,  1), # pipelined multiplier
+    'div': (('div', 'mod', 'divu', 'modu'), 12, 12), # iterative divider
+  }
+
+  def __init__(s, name, latency=None, ii=None):
+    _, def_latency, def_ii = s.classes[name]
+
+    # An iterative unit stays iterative with another latency
+    if ii is None:
+      ii = def_ii if def_ii < def_latency or latency is None else latency
+
+    s.name    = name
+    s.latency = def_latency if latency is None else latency
+    s.ii      = ii
+
+    if s.latency < 1 or s.ii < 1:
+      raise ValueError('the latency and the initiation interval of "{}" must be at least 1'.format(name))
+
+    # First cycle the unit takes another operation
+    s.next_issue = 0
+
+    # Statistics
+    s.num_ops         = 0
+    s.num_busy_stalls = 0 # cycles an operation waited for the unit
+    s.num_busy_cycles = 0 # cycles the unit was occupied
+
+  def canIssue(s, cycle):
+    return cycle >= s.next_issue
+
+  # Starts an operation in `cycle`; returns the first cycle in which its
+  # result can be read
+  def issue(s, cycle):
+    s.next_issue       = cycle + s.ii
+    s.num_ops         += 1
+    s.num_busy_cycles += s.ii
+    return cycle + s.latency
+
+  def getStats(s):
+    stats = {}
+    stats['ops'        ] = s.num_ops
+    stats['busy_stalls'] = s.num_busy_stalls
+    stats['busy_cycles'] = s.num_busy_cycles
+    return stats
+
+  # Parses "NAME=LATENCY[:II]"
+  @staticmethod
+  def parse(spec):
+    try:
+      name, timing = spec.split('=')
+      if ':' in timing:
+        latency, ii = (int(x) for x in timing.split(':'))
+      else:
+        latency, ii = int(timing), None
+    except ValueError:
+      raise ValueError('"{}" is not NAME=LATENCY[:II]'.format(spec))
+    if name not in FunctionalUnit.classes:
+      raise ValueError('unknown functional unit "{}" (expected one of: {})'.format(
+                       name, ', '.join(FunctionalUnit.classes)))
+    return name, latency, ii
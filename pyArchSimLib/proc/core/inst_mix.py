@@ -0,0 +1,149 @@
+# inst_mix.py
+# --------------------------------------------------------------------
+#   Dynamic instruction mix of the committed instructions.
+#
+#   Counters are kept in fixed-size lists indexed by the instruction ID
+#   of the ISA tables (or by the register number), so counting a
+#   committed instruction is a few list increments. Classes, mnemonics
+#   and register names are only looked up when reporting.
+
+from pyArchSimLib.arch.isa import mips32
+
+class InstMix():
+  classes = ('alu', 'muldiv', 'load', 'store', 'branch_taken', 'branch_not_taken',
+             'jump', 'syscall')
+
+  # Execute handlers of the multiplies and divides
+  muldiv_execs = ('mul', 'muh', 'mulu', 'muhu', 'div', 'mod', 'divu', 'modu')
+
+  mem_sizes = ((1, 'byte'), (2, 'half'), (4, 'word'))
+
+  def __init__(s):
+    tbl = mips32.tables()
+    num_iids = len(tbl['mnemonic'])
+
+    s.isa_mem_sz = tbl['mem_sz']
+
+    # Per instruction ID
+    s.insts = [0] * num_iids
+    s.taken = [0] * num_iids
+
+    # Per register
+    s.reg_reads  = [0] * 32
+    s.reg_writes = [0] * 32
+
+    # Memory accesses, per size (in bytes) and per offset in the word
+    s.mem_size   = [0] * 5
+    s.mem_offset = [0] * 4
+    s.misaligned = 0
+
+  def commit(s, dinst):
+    iid = dinst['iid']
+
+    s.insts[iid] += 1
+    if dinst['taken']: s.taken[iid] += 1
+
+    for reg_idx in dinst['dep']['R']: s.reg_reads [reg_idx] += 1
+    for reg_idx in dinst['dep']['W']: s.reg_writes[reg_idx] += 1
+
+    if dinst['isMem']:
+      ea   = dinst['ea']
+      size = s.isa_mem_sz[iid]
+      s.mem_size  [size  ] += 1
+      s.mem_offset[ea & 3] += 1
+      if ea & (size - 1): s.misaligned += 1
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def classOf(s, tbl, iid):
+    kind = tbl['type'][iid]
+    if kind == 'alu':
+      return 'muldiv' if tbl['exec_names'][tbl['exec'][iid]] in s.muldiv_execs else 'alu'
+    if kind == 'jump_r':
+      return 'jump'
+    return kind
+
+  def getClasses(s):
+    tbl = mips32.tables()
+
+    classes = {name: 0 for name in s.classes}
+    for iid, count in enumerate(s.insts):
+      if count == 0: continue
+      name = s.classOf(tbl, iid)
+      if name == 'branch':
+        classes['branch_taken'    ] += s.taken[iid]
+        classes['branch_not_taken'] += count - s.taken[iid]
+      elif name in classes:
+        classes[name] += count
+    return classes
+
+  def getMnemonics(s):
+    mnemonics = mips32.tables()['mnemonic']
+    return {mnemonics[iid]: count for iid, count in enumerate(s.insts) if count > 0}
+
+  def getMem(s):
+    mem = {}
+    for size, name in s.mem_sizes:
+      mem[name] = s.mem_size[size]
+    for offset in range(4):
+      mem['offset{}'.format(offset)] = s.mem_offset[offset]
+    mem['misaligned'] = s.misaligned
+    return mem
+
+  # Registers by their ABI names
+  def getRegNames(s):
+    names = ['${}'.format(i) for i in range(32)]
+    for name, idx in reversed(list(mips32.arch()['regs'].items())):
+      if not name[1:].isdigit():
+        names[idx] = name
+    return names
+
+  def getStats(s):
+    stats = {}
+    stats['classes'] = s.getClasses()
+    stats['mem'    ] = s.getMem()
+    return stats
+
+  # Side by side, the instruction mix of the whole run and of the ROI
+  @staticmethod
+  def printStats(mix, roi_mix=None):
+    mixes = [mix] if roi_mix is None or sum(roi_mix.insts) == 0 else [mix, roi_mix]
+
+    def printTable(title, rows):
+      totals = [sum(row[i] for _, row in rows) for i in range(len(mixes))]
+      print('     - {}:'.format(title))
+      header = '         {: <18}'.format('')
+      for label in ('whole run', 'ROI')[:len(mixes)]:
+        header += ' {: >18}'.format(label)
+      print(header)
+      for name, row in rows:
+        if not any(row): continue
+        line = '         {: <18}'.format(name)
+        for count, total in zip(row, totals):
+          share = 100.0 * count / total if total > 0 else 0.0
+          line += ' {: >10} {: >6.2f}%'.format(count, share)
+        print(line)
+      print('')
+
+    print(' + Instruction Mix:')
+    print('')
+
+    classes = [m.getClasses() for m in mixes]
+    printTable('Classes', [(name, [c[name] for c in classes]) for name in InstMix.classes])
+
+    mnemonics = [m.getMnemonics() for m in mixes]
+    names     = sorted(mnemonics[0], key=lambda name: -mnemonics[0][name])
+    printTable('Mnemonics', [(name, [m.get(name, 0) for m in mnemonics]) for name in names])
+
+    mems = [m.getMem() for m in mixes]
+    printTable('Memory Access Sizes', [(name, [m[name] for m in mems]) for _, name in InstMix.mem_sizes])
+    printTable('Memory Access Offsets (in a word)',
+               [('offset{}'.format(i), [m['offset{}'.format(i)] for m in mems]) for i in range(4)])
+    print('     - Misaligned Memory Accesses{} = {}'.format(
+          ' (whole run / ROI)' if len(mixes) > 1 else '', ' / '.join(str(m['misaligned']) for m in mems)))
+    print('')
+
+    reg_names = mix.getRegNames()
+    printTable('Register Reads',  [(reg_names[i], [m.reg_reads [i] for m in mixes]) for i in range(32)])
+    printTable('Register Writes', [(reg_names[i], [m.reg_writes[i] for m in mixes]) for i in range(32)])
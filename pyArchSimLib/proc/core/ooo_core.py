@@ -0,0 +1,611 @@
+# ooo_core.py
+# --------------------------------------------------------------------
+#   Out-of-order core.
+#
+#   Instructions are fetched and decoded in order (with the fetch stage
+#   and the instruction buffer of the superscalar core), executed out
+#   of order as soon as their operands are ready, and committed in
+#   order:
+#
+#     F : fetches up to `width` instructions within an aligned block
+#     D : renames up to `width` instructions into the ROB, the issue
+#         queue and, for loads and stores, the LSQ
+#     X : issues up to `width` ready instructions, oldest first, and
+#         executes them; results are broadcast to the waiting
+#         instructions once the latency of their unit has elapsed
+#     M : sends one load or committed store to the dcache port, or
+#         forwards the data of an older store to a load
+#     W : commits up to `width` done instructions, in order, into the
+#         architectural register file
+#
+#   Registers are renamed to ROB entries: the rename table holds, per
+#   architectural register, the ROB index of its youngest in-flight
+#   writer (-1 if the value is in the register file). Instructions
+#   capture the values of their operands, when they are renamed (if the
+#   writer is done) or when the writer broadcasts its result, so the
+#   ROB entry of a writer can be reused as soon as it commits.
+#
+#   Loads and stores compute their address when they issue. A load
+#   accesses memory once the addresses of all the older stores are
+#   known (conservative disambiguation): its data comes from the
+#   youngest older store to the same bytes if there is one, or from the
+#   dcache otherwise, and it waits for a store that only partially
+#   overlaps it to be written. Stores are written after they commit,
+#   in order.
+#
+#   A mispredicted branch (or jump register) squashes every younger
+#   instruction as soon as it executes, and the rename table is rebuilt
+#   from the older ones left in the ROB. Jumps are still resolved in D.
+#   The branch predictor is trained at commit. Syscalls (and undefined
+#   instructions) do not issue: they run when they commit, once the
+#   older stores are written, and nothing younger is renamed before.
+#
+#   The ROB and the LSQ are circular buffers and the issue queue is an
+#   array of slots; every queue has a fixed number of entries.
+
+from array    import array
+from operator import itemgetter
+
+from .superscalar_core import SuperscalarInorderCore
+
+# States of a load or store in the LSQ
+LSQ_WAIT  = 0 # the address (and data, for stores) is not known yet
+LSQ_READY = 1 # ready to access memory
+LSQ_SENT  = 2 # sent to the dcache
+LSQ_DONE  = 3 # the load has its data, or the store was written
+
+class OutOfOrderCore(SuperscalarInorderCore):
+  def __init__(s, entry_point = 0x0400_0000, width = 2, rob_size = 64,
+               iq_size = 32, lsq_size = 16):
+    super().__init__(entry_point, width)
+
+    if rob_size < 1 or iq_size < 1 or lsq_size < 1:
+      raise ValueError('the ROB, the issue queue and the LSQ need at least one entry each')
+
+    s.rob_size = rob_size
+    s.iq_size  = iq_size
+    s.lsq_size = lsq_size
+
+    # Reorder buffer
+    s.rob       = [None] * rob_size
+    s.rob_head  = 0
+    s.rob_count = 0
+
+    # Rename table: the ROB index of the youngest in-flight writer of
+    # every register, or -1
+    s.rat = array('i', [-1]) * 32
+
+    # Issue queue, and the instructions in it with all their operands
+    s.iq       = [None] * iq_size
+    s.iq_free  = list(range(iq_size - 1, -1, -1))
+    s.iq_ready = []
+
+    # Load/store queue
+    s.lsq       = [None] * lsq_size
+    s.lsq_head  = 0
+    s.lsq_count = 0
+
+    # The load or store whose dcache request is outstanding
+    s.dmem_inst = None
+
+    # Instructions to broadcast, by the cycle their result is ready
+    s.events = {}
+
+    # Statistics
+    s.pair_stats  = {} # no pairing rules
+    s.stall_stats['rob_full'  ] = 0 # rename: no free ROB entry
+    s.stall_stats['iq_full'   ] = 0 # rename: no free issue queue slot
+    s.stall_stats['lsq_full'  ] = 0 # rename: no free LSQ entry
+    s.stall_stats['ld_addr'   ] = 0 # load waiting for the addresses of older stores
+    s.stall_stats['ld_overlap'] = 0 # load waiting for a partially overlapping store
+    s.stall_stats['w_stores'  ] = 0 # syscall waiting for the older stores
+
+    s.num_loads      = 0
+    s.num_forwarded  = 0
+    s.num_recoveries = 0
+    s.rob_occupancy  = 0
+    s.iq_occupancy   = 0
+    s.lsq_occupancy  = 0
+
+  # Stores already wait in the LSQ until they are written.
+  def setStoreBuffer(s, entries):
+    if entries > 0:
+      raise ValueError('the out-of-order core has no store buffer (stores wait in its LSQ)')
+
+  def getStats(s):
+    stats = super().getStats()
+    stats['ooo'] = {}
+    stats['ooo']['loads'        ] = s.num_loads
+    stats['ooo']['forwarded'    ] = s.num_forwarded
+    stats['ooo']['recoveries'   ] = s.num_recoveries
+    stats['ooo']['rob_occupancy'] = s.rob_occupancy
+    stats['ooo']['iq_occupancy' ] = s.iq_occupancy
+    stats['ooo']['lsq_occupancy'] = s.lsq_occupancy
+    return stats
+
+  def printStats(s):
+    cycles = sum(s.issue_hist)
+    issued = sum(n * count for n, count in enumerate(s.issue_hist))
+
+    def avg(total):
+      return total / cycles if cycles > 0 else 0.0
+
+    print(' + Out-of-Order ({}-wide; ROB {}, IQ {}, LSQ {} entries):'.format(
+          s.width, s.rob_size, s.iq_size, s.lsq_size))
+    print('     - Average Instructions Issued per Cycle = {:.3f}'.format(avg(issued)))
+    for n, count in enumerate(s.issue_hist):
+      print('     - Cycles Issuing {} = {: >10} {: >7.2f}%'.format(n, count, 100.0 * avg(count)))
+    print('     - Average Occupancy: ROB {:.2f}, IQ {:.2f}, LSQ {:.2f}'.format(
+          avg(s.rob_occupancy), avg(s.iq_occupancy), avg(s.lsq_occupancy)))
+    print('     - Rename Stalls: ROB full {}, IQ full {}, LSQ full {}'.format(
+          s.stall_stats['rob_full'], s.stall_stats['iq_full'], s.stall_stats['lsq_full']))
+    print('     - Loads = {} ({} forwarded from stores)'.format(s.num_loads, s.num_forwarded))
+    print('     - Load Stalls: unknown store address {}, partial overlap {}'.format(
+          s.stall_stats['ld_addr'], s.stall_stats['ld_overlap']))
+    print('     - Mispredict Recoveries = {} ({} instructions squashed)'.format(
+          s.num_recoveries, s.stall_stats['squash']))
+    print('')
+
+  #=====================================================================
+  # Rename Stage
+  #=====================================================================
+  def rename(s, dinst, serial):
+    idx = (s.rob_head + s.rob_count) % s.rob_size
+
+    s.rob[idx]   = dinst
+    s.rob_count += 1
+
+    dinst['rob_idx'  ] = idx
+    dinst['done'     ] = serial
+    dinst['consumers'] = []
+    dinst['pending'  ] = 0
+    dinst['iq_slot'  ] = -1
+    dinst['br'       ] = None
+
+    # Operands
+    for reg_idx in set(dinst['dep']['R']):
+      writer = s.rat[reg_idx]
+      if writer < 0:
+        data = s.rf[reg_idx]
+      elif s.rob[writer]['done']:
+        data = s.rob[writer]['wb_data']
+      else:
+        s.rob[writer]['consumers'].append((dinst, reg_idx))
+        dinst['pending'] += 1
+        continue
+      if reg_idx == dinst['rs']: dinst['rs_data'] = data
+      if reg_idx == dinst['rt']: dinst['rt_data'] = data
+
+    for reg_idx in dinst['dep']['W']:
+      s.rat[reg_idx] = idx
+
+    if serial:
+      return
+
+    # Issue queue
+    slot = s.iq_free.pop()
+    s.iq[slot] = dinst
+    dinst['iq_slot'] = slot
+    if dinst['pending'] == 0:
+      s.iq_ready.append(dinst)
+
+    # Load/store queue
+    if dinst['isMem']:
+      s.lsq[(s.lsq_head + s.lsq_count) % s.lsq_size] = dinst
+      s.lsq_count += 1
+
+      dinst['is_load'  ] = s.isa_type[dinst['iid']] == 'load'
+      dinst['atomic'   ] = s.isa_is_atomic[dinst['iid']]
+      dinst['lsq_state'] = LSQ_WAIT
+      dinst['committed'] = False
+      dinst['size'     ] = s.isa_mem_sz[dinst['iid']]
+
+  def d(s):
+    width = 8 * s.width
+
+    s.fillBuffer()
+
+    # An older instruction was mispredicted
+    if s.squash:
+      s.stall_stats['squash'] += len(s.ibuf)
+      s.ibuf = []
+      return '{: <{}}'.format('-', width)
+
+    if not s.ibuf:
+      if s.fetchPending():
+        s.stall_stats['d_imem'] += 1
+        return '{: <{}}'.format('S mem', width)
+      return '{: <{}}'.format(' ', width)
+
+    if s.block_D:
+      s.stall_stats['d_blocked'] += 1
+      return '{: <{}}'.format('S >>|', width)
+
+    renamed = []
+    while s.ibuf and len(renamed) < s.width:
+      dinst  = s.ibuf[0]
+      iid    = dinst['iid']
+      serial = iid == 0 or s.isa_type[iid] == 'syscall'
+
+      stall = None
+      if   s.rob_count == s.rob_size                   : stall = 'rob_full'
+      elif not serial and not s.iq_free                : stall = 'iq_full'
+      elif dinst['isMem'] and s.lsq_count == s.lsq_size: stall = 'lsq_full'
+
+      if stall is not None:
+        if not renamed:
+          s.stall_stats[stall] += 1
+          return '{: <{}}'.format('S ' + stall.split('_')[0], width)
+        break
+
+      del s.ibuf[0]
+      s.rename(dinst, serial)
+      renamed.append(dinst)
+
+      # Nothing is renamed after a syscall until it commits
+      if serial:
+        s.block_D = True
+        break
+
+      # Jumps are resolved here
+      if s.isa_type[iid] == 'jump':
+        npc  = (dinst['pc'] & 0xf0000000) | (dinst['imm26'] << 2)
+        kind = s.branchKind(dinst, 2)
+        dinst['br'   ] = (npc, kind, 1)
+        dinst['taken'] = True
+        if dinst['npc'] != npc:
+          s.bp.repair(dinst['pc'], kind, 1, dinst['bp'])
+          s.init_squash(npc)
+          s.stall_stats['squash'] += len(s.ibuf)
+          s.ibuf = []
+          break
+
+    return '{: <{}}'.format(','.join(dinst['mnemonic'] for dinst in renamed), width)
+
+  #=====================================================================
+  # Issue/Execute Stage
+  #=====================================================================
+  # Squashes every instruction younger than `dinst`
+  def squashYounger(s, dinst):
+    idx = dinst['rob_idx']
+
+    while True:
+      tail = (s.rob_head + s.rob_count - 1) % s.rob_size
+      if tail == idx:
+        break
+
+      young = s.rob[tail]
+      young['squashed'] = True
+
+      if young['iq_slot'] >= 0:
+        s.iq[young['iq_slot']] = None
+        s.iq_free.append(young['iq_slot'])
+
+      # Loads and stores are in the LSQ in program order, too
+      if young['isMem']:
+        s.lsq_count -= 1
+        s.lsq[(s.lsq_head + s.lsq_count) % s.lsq_size] = None
+
+      s.rob[tail]  = None
+      s.rob_count -= 1
+      s.stall_stats['squash'] += 1
+
+    # Rebuild the rename table from the instructions left
+    for reg_idx in range(32):
+      s.rat[reg_idx] = -1
+    for i in range(s.rob_count):
+      idx = (s.rob_head + i) % s.rob_size
+      for reg_idx in s.rob[idx]['dep']['W']:
+        s.rat[reg_idx] = idx
+
+    # A squashed syscall no longer blocks renaming
+    s.block_D = False
+
+    s.num_recoveries += 1
+
+  def execute(s, dinst, now):
+    s.iq[dinst['iq_slot']] = None
+    s.iq_free.append(dinst['iq_slot'])
+    dinst['iq_slot'] = -1
+
+    # Loads and stores only compute their address here
+    if dinst['isMem']:
+      dinst['ea'] = dinst['rs_data'] + s.signed(s.sext(dinst['imm16']))
+      dinst['lsq_state'] = LSQ_READY
+      if dinst['is_load'] or dinst['atomic']:
+        dinst['wb_en'  ] = True
+        dinst['st_data'] = dinst['rt_data']
+      else:
+        dinst['st_data'] = dinst['rt_data']
+        s.events.setdefault(now + 1, []).append(dinst)
+      return
+
+    fu = s.fu_of_exec[dinst['exec']]
+
+    try:
+      ctrl = s.exec_tbl[dinst['exec']](dinst)
+    except ZeroDivisionError:
+      # Only possible on a wrong path (or in a buggy program);
+      # the result is unpredictable in MIPS32 anyway.
+      s.writeback(dinst, 0)
+      ctrl = None
+
+    ready = fu.issue(now) if fu is not None else now + 1
+    s.events.setdefault(ready, []).append(dinst)
+
+    if ctrl is not None:
+      npc, br_type, outcome = ctrl
+      kind = s.branchKind(dinst, br_type)
+
+      dinst['br'   ] = (npc, kind, outcome)
+      dinst['taken'] = outcome == 1
+
+      if dinst['npc'] != npc:
+        s.bp.repair(dinst['pc'], kind, outcome, dinst['bp'])
+        s.squashYounger(dinst)
+        s.init_squash(npc)
+
+  def x(s):
+    now   = s.cycle_count
+    width = 8 * s.width
+
+    # Oldest first
+    ready = s.iq_ready
+    ready.sort(key=itemgetter('seq'))
+
+    issued = []
+    left   = []
+    for dinst in ready:
+      if dinst['squashed']:
+        continue
+      if len(issued) == s.width:
+        left.append(dinst)
+        continue
+
+      fu = s.fu_of_exec[dinst['exec']]
+      if fu is not None and not fu.canIssue(now):
+        fu.num_busy_stalls += 1
+        left.append(dinst)
+        continue
+
+      s.execute(dinst, now)
+      issued.append(dinst)
+
+    s.iq_ready = left
+    s.issue_hist[len(issued)] += 1
+
+    return '{: <{}}'.format(','.join(dinst['mnemonic'] for dinst in issued), width)
+
+  #=====================================================================
+  # Writeback (Broadcast)
+  #=====================================================================
+  def complete(s, dinst):
+    dinst['done'] = True
+
+    for consumer, reg_idx in dinst['consumers']:
+      if consumer['squashed']:
+        continue
+      if reg_idx == consumer['rs']: consumer['rs_data'] = dinst['wb_data']
+      if reg_idx == consumer['rt']: consumer['rt_data'] = dinst['wb_data']
+      consumer['pending'] -= 1
+      if consumer['pending'] == 0:
+        s.iq_ready.append(consumer)
+
+    dinst['consumers'] = None
+
+  def broadcast(s):
+    done = s.events.pop(s.cycle_count, None)
+    if done is not None:
+      for dinst in done:
+        if not dinst['squashed']:
+          s.complete(dinst)
+
+  #=====================================================================
+  # Memory Stage
+  #=====================================================================
+  # Loads a value out of the bytes of a response, or of a store
+  def loadValue(s, dinst, data):
+    if s.isa_mem_sext[dinst['iid']]: data = s.sext(data, 8 * dinst['size'])
+    return data
+
+  def m(s):
+    # Response
+    if s.dmem_inst is not None and s.dMemHasResp():
+      resp  = s.dMemRecvResp()
+      dinst = s.dmem_inst
+
+      s.dmem_inst = None
+
+      dinst['lsq_state'] = LSQ_DONE
+      if (dinst['is_load'] or dinst['atomic']) and not dinst['squashed']:
+        dinst['wb_data'] = s.loadValue(dinst, int.from_bytes(bytes(resp['data']), 'little'))
+        s.complete(dinst)
+
+    # Committed loads and written stores leave the LSQ
+    while s.lsq_count > 0:
+      dinst = s.lsq[s.lsq_head]
+      if not dinst['committed'] or (not dinst['is_load'] and dinst['lsq_state'] != LSQ_DONE):
+        break
+      s.lsq[s.lsq_head] = None
+      s.lsq_head   = (s.lsq_head + 1) % s.lsq_size
+      s.lsq_count -= 1
+
+    # Loads go first: the oldest one that can get its data
+    stores    = []
+    unknown   = False
+    lt_buf    = ' '
+    port_free = s.dmem_inst is None and s.dMemCanReq()
+
+    for i in range(s.lsq_count):
+      dinst = s.lsq[(s.lsq_head + i) % s.lsq_size]
+      state = dinst['lsq_state']
+
+      # ll and sc go to the port once they are the oldest instruction
+      # and the older stores are written; nothing younger passes them
+      if dinst['atomic']:
+        if (state == LSQ_READY and port_free and s.rob[s.rob_head] is dinst and
+            all(store['lsq_state'] == LSQ_DONE for store in stores)):
+          if dinst['is_load']:
+            mem_req = s.makeMemReadReq(dinst['ea'], dinst['size'])
+            mem_req['op'] = 2
+          else:
+            mem_req = s.makeMemWriteReq(dinst['ea'], dinst['st_data'], dinst['size'])
+            mem_req['op'] = 3
+          mem_req['src'] = s.core_id
+          s.dMemSendReq(mem_req)
+          s.dmem_inst = dinst
+          dinst['lsq_state'] = LSQ_SENT
+
+          if dinst['is_load']: s.num_loads += 1
+          return '{: <8}'.format(dinst['mnemonic'])
+        break
+
+      if not dinst['is_load']:
+        if state == LSQ_WAIT: unknown = True
+        stores.append(dinst)
+        continue
+
+      if state != LSQ_READY:
+        continue
+
+      if unknown:
+        s.stall_stats['ld_addr'] += 1
+        break
+
+      # The youngest older store to any of its bytes
+      ea   = dinst['ea']
+      size = dinst['size']
+      for store in reversed(stores):
+        if store['ea'] < ea + size and ea < store['ea'] + store['size']:
+          break
+      else:
+        store = None
+
+      if store is not None:
+        if store['ea'] <= ea and ea + size <= store['ea'] + store['size']:
+          data = store['st_data'] >> (8 * (ea - store['ea']))
+          dinst['wb_data'  ] = s.loadValue(dinst, data & ((1 << (8 * size)) - 1))
+          dinst['lsq_state'] = LSQ_DONE
+          s.complete(dinst)
+
+          s.num_loads     += 1
+          s.num_forwarded += 1
+          return '{: <8}'.format(dinst['mnemonic'] + '<')
+
+        s.stall_stats['ld_overlap'] += 1
+        continue
+
+      if port_free:
+        s.dMemSendReq(s.makeMemReadReq(ea, size))
+        s.dmem_inst = dinst
+        dinst['lsq_state'] = LSQ_SENT
+
+        s.num_loads += 1
+        return '{: <8}'.format(dinst['mnemonic'])
+
+    # Then, the oldest committed store
+    if port_free:
+      for store in stores:
+        if store['lsq_state'] == LSQ_READY:
+          if store['committed']:
+            s.dMemSendReq(s.makeMemWriteReq(store['ea'], store['st_data'], store['size']))
+            s.dmem_inst = store
+            store['lsq_state'] = LSQ_SENT
+            lt_buf = store['mnemonic']
+          break
+
+    return '{: <8}'.format(lt_buf)
+
+  #=====================================================================
+  # Commit Stage
+  #=====================================================================
+  def storesPending(s):
+    for i in range(s.lsq_count):
+      dinst = s.lsq[(s.lsq_head + i) % s.lsq_size]
+      if not dinst['is_load'] and dinst['lsq_state'] != LSQ_DONE:
+        return True
+    return False
+
+  def w(s):
+    while s.inst_c < s.width and s.rob_count > 0:
+      dinst = s.rob[s.rob_head]
+      if not dinst['done']:
+        break
+
+      # Syscalls (and undefined instructions) run now
+      if dinst['iid'] == 0 or s.isa_type[dinst['iid']] == 'syscall':
+        if s.storesPending():
+          s.stall_stats['w_stores'] += 1
+          break
+        s.exec_tbl[dinst['exec']](dinst)
+        s.block_D_s = False
+
+        # As in the five-stage core, the exit syscall itself
+        # never completes.
+        if s.exit:
+          break
+
+      if dinst['wb_en']:
+        for reg_idx in dinst['dep']['W']:
+          s.rf[reg_idx] = dinst['wb_data']
+          if s.rat[reg_idx] == s.rob_head:
+            s.rat[reg_idx] = -1
+
+      if dinst['isMem']:
+        dinst['committed'] = True
+
+      if dinst['br'] is not None:
+        npc, kind, outcome = dinst['br']
+        s.bp.train(dinst['pc'], dinst['npc'], npc, kind, outcome, dinst['bp'], repair=False)
+
+      s.inst_mix.commit(dinst)
+      if s.roi: s.roi_inst_mix.commit(dinst)
+
+      s.rob[s.rob_head] = None
+      s.rob_head   = (s.rob_head + 1) % s.rob_size
+      s.rob_count -= 1
+      s.inst_c    += 1
+
+    return '{: <8}'.format('+{}'.format(s.inst_c) if s.inst_c else ' ')
+
+  #=====================================================================
+  # Tick
+  #=====================================================================
+  def isDrained(s):
+    return (s.f2d is None and not s.ibuf and s.rob_count == 0 and
+            s.lsq_count == 0 and s.dmem_inst is None and
+            (s.fq is None or s.fq.isDrained()))
+
+  def tick(s):
+    s.cycle_count += 1
+
+    # Reset
+    s.inst_c    = 0
+    s.block_D_s = None
+
+    # Tick backwards
+    lt_w = s.w()
+    s.broadcast()
+    lt_m = s.m()
+    lt_x = s.x()
+    lt_d = s.d()
+    lt_f = s.f()
+
+    # A committed syscall unblocks renaming in the next cycle
+    if s.block_D_s is not None:
+      s.block_D = s.block_D_s
+
+    # Handle a squash (its repair, in x() or d(), is the last update of
+    # the predictor: f() predicts nothing while a squash is pending)
+    if s.squash:
+      s.redirectFetch()
+
+    s.rob_occupancy += s.rob_count
+    s.iq_occupancy  += s.iq_size - len(s.iq_free)
+    s.lsq_occupancy += s.lsq_count
+
+    s.lt_buf = ' | '.join((lt_f, lt_d, lt_x, lt_m, lt_w))
+
+  def linetraceColumns(s):
+    width = 8 * s.width
+    return [('Fetch', 12), ('Rename', width), ('Issue', width), ('Memory', 8), ('Commit', 8)]
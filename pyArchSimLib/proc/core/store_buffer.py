@@ -0,0 +1,97 @@
+# store_buffer.py
+# --------------------------------------------------------------------
+#   Store buffer.
+#
+#   Executed stores wait here, oldest first, to be written to the
+#   dcache in the background, whenever the port is not used by a load.
+#   A load that reads bytes still in the buffer gets them from the
+#   youngest store to them: if that store covers the whole load, its
+#   data is forwarded, and otherwise the load has to wait until the
+#   store is written.
+#
+#   The buffer only keeps the stores; the core sends them to the port
+#   (see drainStore() in the five-stage core).
+
+# Results of a lookup
+SB_MISS    = 0 # no store to any of the bytes
+SB_HIT     = 1 # the youngest such store covers all of them
+SB_PARTIAL = 2 # it only covers some of them
+
+class StoreBuffer():
+  def __init__(s, entries):
+    if entries < 1:
+      raise ValueError('the store buffer needs at least one entry')
+
+    # Circular buffer of (address, data, size)
+    s.addrs = [0] * entries
+    s.data  = [0] * entries
+    s.sizes = [0] * entries
+    s.head  = 0
+    s.count = 0
+
+    # The oldest store was sent to the dcache
+    s.inflight = False
+
+    # Statistics
+    s.num_stores    = 0
+    s.num_forwarded = 0
+    s.num_drained   = 0
+
+  def __len__(s):
+    return len(s.addrs)
+
+  def isEmpty(s):
+    return s.count == 0
+
+  def isFull(s):
+    return s.count == len(s.addrs)
+
+  def push(s, addr, data, size):
+    idx = (s.head + s.count) % len(s.addrs)
+    s.addrs[idx] = addr
+    s.data [idx] = data
+    s.sizes[idx] = size
+    s.count += 1
+
+    s.num_stores += 1
+
+  # The oldest store, as (address, data, size)
+  def peek(s):
+    return s.addrs[s.head], s.data[s.head], s.sizes[s.head]
+
+  def pop(s):
+    s.head   = (s.head + 1) % len(s.addrs)
+    s.count -= 1
+
+    s.num_drained += 1
+
+  # Returns the result of looking up a load, and the forwarded data on
+  # a hit
+  def lookup(s, addr, size):
+    for i in range(s.count - 1, -1, -1):
+      idx     = (s.head + i) % len(s.addrs)
+      st_addr = s.addrs[idx]
+      st_size = s.sizes[idx]
+      if st_addr < addr + size and addr < st_addr + st_size:
+        if st_addr <= addr and addr + size <= st_addr + st_size:
+          data = s.data[idx] >> (8 * (addr - st_addr))
+          return SB_HIT, data & ((1 << (8 * size)) - 1)
+        return SB_PARTIAL, None
+    return SB_MISS, None
+
+  def getStats(s):
+    stats = {}
+    stats['stores'   ] = s.num_stores
+    stats['forwarded'] = s.num_forwarded
+    stats['drained'  ] = s.num_drained
+    return stats
+
+  # The stalls are counted by the core, in `stall_stats`
+  def printStats(s, stall_stats):
+    print(' + Store Buffer ({} entries):'.format(len(s)))
+    print('     - Stores Buffered = {}'.format(s.num_stores))
+    print('     - Loads Forwarded = {}'.format(s.num_forwarded))
+    print('     - Stalls on a Full Buffer = {}'.format(stall_stats['x_sb_full']))
+    print('     - Stalls on a Partially Overlapping Store = {}'.format(stall_stats['x_sb_part']))
+    print('     - Stalls on a Busy dmem Port = {}'.format(stall_stats['x_dmem']))
+    print('')
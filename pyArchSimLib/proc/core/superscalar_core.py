@@ -0,0 +1,492 @@
+# superscalar_core.py
+# --------------------------------------------------------------------
+#   N-wide in-order superscalar core.
+#
+#   The pipeline has the same five stages as the five-stage core, but
+#   every stage holds a group of up to `width` instructions that move
+#   together:
+#
+#     F : fetches up to `width` instructions with one request, within an
+#         aligned fetch block, and up to the first predicted-taken one
+#         (or, with a fetch queue, fetches ahead into the queue, one
+#         fetch block at a time; see fetch_queue.py)
+#     D : decodes into an instruction buffer, and issues the oldest
+#         instructions of the buffer, in order, as long as they can
+#         issue together (the pairing rules below)
+#     X : executes the group; M : waits for the memory access of the
+#         group (if any); W : commits the group
+#
+#   Operands are read in D, from the register file or forwarded from
+#   any pipe of the groups in M and W (as in the five-stage core, the
+#   group in X does not forward, nor do loads in M). An instruction
+#   cannot issue with an older instruction of the same group when:
+#
+#     - it reads or writes a register that the older one writes
+#     - both access memory (there is a single dcache port)
+#     - both use the same multi-cycle functional unit
+#     - the group would read more registers than there are read ports
+#     - the older one is a control-flow instruction, which ends a group
+#     - it is a syscall, which issues alone once the pipeline drained
+#
+#   The execute handlers, syscall emulation and functional execution
+#   are the ones of the five-stage core.
+
+from pyArchSimLib.arch.isa import mips32
+
+from .five_stage_core import FiveStageInorderCore
+
+class SuperscalarInorderCore(FiveStageInorderCore):
+  # Reasons for issuing fewer than `width` instructions while the
+  # buffer had more
+  pairing_rules = ('dep', 'mem', 'fu', 'ports', 'ctrl', 'syscall', 'hazard')
+
+  # Linetrace of the stalls of the oldest instruction
+  stall_lt = {'d_raw': 'S raw', 'd_fu': 'S fu', 'd_syscall': 'S |>>'}
+
+  def __init__(s, entry_point = 0x0400_0000, width = 2, rf_read_ports = None):
+    super().__init__(entry_point)
+
+    if width < 1:
+      raise ValueError('the issue width must be at least 1')
+
+    s.isa_is_branch = mips32.tables()['is_branch']
+
+    s.width         = width
+    s.rf_read_ports = 2 * width if rf_read_ports is None else rf_read_ports
+
+    # Pipeline registers hold lists of instructions, and decoded
+    # instructions wait in a buffer until they issue
+    s.ibuf = []
+
+    # Groups at the beginning of the cycle (for forwarding)
+    s.fwd_X = None
+    s.fwd_M = None
+    s.fwd_W = None
+
+    # Instructions completed in the current cycle
+    s.inst_c = 0
+
+    # Statistics
+    s.issue_hist = [0] * (width + 1)
+    s.pair_stats = {rule: 0 for rule in s.pairing_rules}
+
+  def getStats(s):
+    stats = super().getStats()
+    stats['issue'] = {'width{}'.format(i): n for i, n in enumerate(s.issue_hist)}
+    stats['issue'].update({'cut_' + rule: n for rule, n in s.pair_stats.items()})
+    return stats
+
+  def printStats(s):
+    cycles = sum(s.issue_hist)
+    issued = sum(n * count for n, count in enumerate(s.issue_hist))
+
+    print(' + Issue ({}-wide, {} register read ports):'.format(s.width, s.rf_read_ports))
+    print('     - Average Instructions Issued per Cycle = {:.3f}'.format(issued / cycles if cycles > 0 else 0.0))
+    for n, count in enumerate(s.issue_hist):
+      print('     - Cycles Issuing {} = {: >10} {: >7.2f}%'.format(n, count, 100.0 * count / cycles if cycles > 0 else 0.0))
+    print('     - Groups Cut Short by:')
+    for rule in s.pairing_rules:
+      print('         {: <8} {: >10}'.format(rule, s.pair_stats[rule]))
+    print('')
+
+  # Fetch blocks are `width` instructions, unless told otherwise
+  def setFetchQueue(s, entries, block=None):
+    super().setFetchQueue(entries, s.width if block is None else block)
+
+  #=====================================================================
+  # Fetch Stage
+  #=====================================================================
+  def f(s):
+    if s.fq is not None:
+      return '{: <12}'.format(s.fetchAhead())
+
+    # Fetch is redirected at the end of a cycle with a squash; fetching
+    # the wrong path would update the predictor after its repair
+    if s.squash:
+      return '{: <12}'.format('-')
+
+    if s.f2d is not None:
+      return '{: <12}'.format('S <<<')
+
+    if not s.iMemCanReq():
+      s.stall_stats['f_imem'] += 1
+      return '{: <12}'.format('S_imem')
+
+    pc    = s.pc
+    s.f2d = s.fetchGroup(s.width, 4 * s.width)
+
+    return '{: <12}'.format('{:#010x}+{}'.format(pc, len(s.f2d)))
+
+  # A fetched block has not reached the buffer yet
+  def fetchPending(s):
+    if s.fq is not None:
+      return s.fq.inflight is not None
+    return s.f2d is not None
+
+  #=====================================================================
+  # Decode Stage
+  #=====================================================================
+  def decodeSlot(s, slot, inst):
+    rs = (inst >> 21) & 0x1f
+    rt = (inst >> 16) & 0x1f
+    rd = (inst >> 11) & 0x1f
+
+    dinst = s.makeDinst()
+
+    dinst['seq'  ] = slot['seq']
+    dinst['inst' ] = inst
+    dinst['rs'   ] = rs
+    dinst['rt'   ] = rt
+    dinst['rd'   ] = rd
+    dinst['shamt'] = (inst >> 6) & 0x1f
+    dinst['imm16'] = inst & 0xffff
+    dinst['imm26'] = inst & 0x03ffffff
+    dinst['pc'   ] = slot['pc' ]
+    dinst['npc'  ] = slot['npc']
+    dinst['bp'   ] = slot['bp' ]
+
+    iid = s.decodeDinst(inst)
+
+    dinst['iid'     ] = iid
+    dinst['mnemonic'] = s.isa_mnemonic[iid]
+    dinst['isMem'   ] = s.isa_is_mem[iid]
+    dinst['exec'    ] = s.isa_exec[iid]
+
+    if iid != 0:
+      rmask = s.isa_rmask[iid]
+      wmask = s.isa_wmask[iid]
+
+      # Implicit operands
+      if   wmask & mips32.REG_RA             : dinst['dep']['W'].append(31)
+      elif wmask & mips32.REG_RD and rd != 0 : dinst['dep']['W'].append(rd)
+      if   wmask & mips32.REG_RT and rt != 0 : dinst['dep']['W'].append(rt)
+      if   rmask & mips32.REG_RS             : dinst['dep']['R'].append(rs)
+      if   rmask & mips32.REG_RT             : dinst['dep']['R'].append(rt)
+
+    return dinst
+
+  # Reads a register at issue; returns None if the value is not
+  # available yet
+  def readReg(s, reg_idx):
+    if s.fwd_X is not None:
+      for dinst in s.fwd_X:
+        if reg_idx in dinst['dep']['W']:
+          return None
+    if s.fwd_M is not None:
+      for dinst in reversed(s.fwd_M):
+        if reg_idx in dinst['dep']['W']:
+          return None if dinst['isMem'] else dinst['wb_data']
+    if s.fwd_W is not None:
+      for dinst in reversed(s.fwd_W):
+        if reg_idx in dinst['dep']['W']:
+          return dinst['wb_data']
+    return s.rf[reg_idx]
+
+  # Returns the stall kind that keeps an instruction from issuing, or
+  # None
+  def checkHazards(s, dinst):
+    now = s.cycle_count
+    iid = dinst['iid']
+
+    # Syscalls read the register file directly, once every older write
+    # is done
+    if s.isa_type[iid] == 'syscall':
+      for group in (s.fwd_X, s.fwd_M, s.fwd_W):
+        if group is not None and any(other['dep']['W'] for other in group):
+          return 'd_syscall'
+      if now < s.fu_busy_until:
+        return 'd_syscall'
+      if s.sb is not None and not s.sb.isEmpty():
+        return 'd_syscall'
+
+    if now < s.fu_busy_until:
+      fu    = s.fu_of_exec[dinst['exec']]
+      ready = now + 1 + (fu.latency if fu is not None else 1)
+      for reg_idx in dinst['dep']['R']:
+        if s.reg_ready[reg_idx] > now:
+          return 'd_fu'
+      for reg_idx in dinst['dep']['W']:
+        if s.reg_ready[reg_idx] > ready:
+          return 'd_fu'
+
+    for reg_idx in dinst['dep']['R']:
+      if s.readReg(reg_idx) is None:
+        return 'd_raw'
+
+    return None
+
+  # Returns the pairing rule that keeps an instruction from issuing
+  # with the (older) instructions of the group, or None
+  def checkPairing(s, dinst, group, written, num_reads):
+    iid = dinst['iid']
+
+    if s.isa_type[iid] == 'syscall' or s.isa_type[group[0]['iid']] == 'syscall':
+      return 'syscall'
+    if s.isa_is_branch[group[-1]['iid']]:
+      return 'ctrl'
+    for reg_idx in dinst['dep']['R'] + dinst['dep']['W']:
+      if reg_idx in written:
+        return 'dep'
+    if dinst['isMem'] and any(other['isMem'] for other in group):
+      return 'mem'
+    fu = s.fu_of_exec[dinst['exec']]
+    if fu is not None and any(s.fu_of_exec[other['exec']] is fu for other in group):
+      return 'fu'
+    if num_reads + len(dinst['dep']['R']) > s.rf_read_ports:
+      return 'ports'
+    return None
+
+  # Decodes the fetched group into the instruction buffer, once the
+  # buffer has room for it (with a fetch queue, the oldest fetched
+  # instructions, as long as the buffer has room)
+  # A response from before a squash always finds the buffer
+  # empty, since squashes empty it.
+  def fillBuffer(s):
+    if s.fq is not None:
+      s.recvFetch()
+      while not s.fq.isEmpty() and len(s.ibuf) < s.width:
+        slot = s.fq.pop()
+        s.ibuf.append(s.decodeSlot(slot, int.from_bytes(slot['data'], 'little')))
+      return
+
+    if s.f2d is not None and s.iMemHasResp() and (len(s.ibuf) < s.width or s.squash):
+      resp  = s.iMemRecvResp()
+      group = s.f2d
+      s.f2d = None
+
+      assert (resp['addr'] == group[0]['pc'])
+
+      if resp['tag'] < s.epoch or s.squash:
+        s.stall_stats['squash'] += len(group)
+      else:
+        data = resp['data']
+        for i, slot in enumerate(group):
+          inst = int.from_bytes(data[4*i:4*i+4], 'little')
+          s.ibuf.append(s.decodeSlot(slot, inst))
+
+  def d(s):
+    width = 8 * s.width
+
+    s.fillBuffer()
+
+    # An older instruction was mispredicted
+    if s.squash:
+      s.stall_stats['squash'] += len(s.ibuf)
+      s.ibuf = []
+      return '{: <{}}'.format('-', width)
+
+    if s.d2x is not None:
+      return '{: <{}}'.format('S <<<', width)
+
+    if not s.ibuf:
+      s.issue_hist[0] += 1
+      if s.fetchPending():
+        s.stall_stats['d_imem'] += 1
+        return '{: <{}}'.format('S mem', width)
+      return '{: <{}}'.format(' ', width)
+
+    if s.block_D:
+      s.stall_stats['d_blocked'] += 1
+      s.issue_hist[0] += 1
+      return '{: <{}}'.format('S >>|', width)
+
+    # Pick the group: the oldest instruction issues unless it has to
+    # stall, and younger ones join it as long as they can
+    group     = []
+    written   = set()
+    num_reads = 0
+
+    for dinst in s.ibuf[:s.width]:
+      if not group:
+        stall = s.checkHazards(dinst)
+        if stall is not None:
+          s.stall_stats[stall] += 1
+          s.issue_hist[0] += 1
+          return '{: <{}}'.format(s.stall_lt[stall], width)
+      else:
+        cut = s.checkPairing(dinst, group, written, num_reads)
+        if cut is None and s.checkHazards(dinst) is not None:
+          cut = 'hazard'
+        if cut is not None:
+          s.pair_stats[cut] += 1
+          break
+
+      group.append(dinst)
+      written.update(dinst['dep']['W'])
+      num_reads += len(dinst['dep']['R'])
+
+    del s.ibuf[:len(group)]
+
+    # Issue
+    for dinst in group:
+      iid = dinst['iid']
+
+      for reg_idx in dinst['dep']['R']:
+        data = s.readReg(reg_idx)
+        if reg_idx == dinst['rs']: dinst['rs_data'] = data
+        if reg_idx == dinst['rt']: dinst['rt_data'] = data
+
+      # Block decoding once a syscall is encountered
+      if s.isa_type[iid] == 'syscall': s.block_D = True
+
+      # Jumps are resolved here
+      if s.isa_type[iid] == 'jump':
+        npc = (dinst['pc'] & 0xf0000000) | (dinst['imm26'] << 2)
+        s.train_bp(dinst, npc, 2, 1)
+        if dinst['npc'] != npc:
+          s.init_squash(npc)
+          s.stall_stats['squash'] += len(s.ibuf)
+          s.ibuf = []
+
+    s.d2x = group
+    s.issue_hist[len(group)] += 1
+
+    return '{: <{}}'.format(','.join(dinst['mnemonic'] for dinst in group), width)
+
+  #=====================================================================
+  # Execute Stage
+  #=====================================================================
+  def x(s):
+    if s.d2x is None:
+      return '{: <{}}'.format(' ', 8 * s.width)
+    if s.x2m is not None:
+      return '{: <{}}'.format('S <<<', 8 * s.width)
+
+    group = s.d2x
+    now   = s.cycle_count
+
+    # Structural hazards
+    for dinst in group:
+      fu = s.fu_of_exec[dinst['exec']]
+      if fu is not None and not fu.canIssue(now):
+        fu.num_busy_stalls += 1
+        s.stall_stats['x_fu'] += 1
+        return '{: <{}}'.format('S fu', 8 * s.width)
+      if dinst['isMem']:
+        stall = s.dmemStall(dinst)
+        if stall is not None:
+          s.stall_stats[stall] += 1
+          return '{: <{}}'.format(s.mem_stall_lt[stall], 8 * s.width)
+
+    for dinst in group:
+      ctrl = s.exec_tbl[dinst['exec']](dinst)
+      if ctrl is not None:
+        npc, br_type, outcome = ctrl
+        dinst['taken'] = outcome == 1
+
+        # Control flow ends a group, so nothing younger is in it
+        s.train_bp(dinst, npc, br_type, outcome)
+        if dinst['npc'] != npc:
+          s.init_squash(npc)
+
+      fu = s.fu_of_exec[dinst['exec']]
+      if fu is not None:
+        ready = fu.issue(now)
+        for reg_idx in dinst['dep']['W']:
+          s.reg_ready[reg_idx] = ready
+        if ready > s.fu_busy_until:
+          s.fu_busy_until = ready
+
+    s.x2m = group
+    s.d2x = None
+
+    return '{: <{}}'.format(','.join(dinst['mnemonic'] for dinst in group), 8 * s.width)
+
+  #=====================================================================
+  # Memory Stage
+  #=====================================================================
+  def m(s):
+    if s.x2m is None:
+      return '{: <{}}'.format(' ', 8 * s.width)
+    if s.m2w is not None:
+      return '{: <{}}'.format('S <<<', 8 * s.width)
+
+    group = s.x2m
+
+    for dinst in group:
+      if dinst['mem_req']:
+        if not s.dMemHasResp():
+          s.stall_stats['m_dmem'] += 1
+          return '{: <{}}'.format('S dmem', 8 * s.width)
+
+        mem_resp = s.dMemRecvResp()
+        s.dmem_pending -= 1
+        if dinst['wb_en']:
+          data = 0
+          for i in range(mem_resp['size']):
+            data = data | (mem_resp['data'][i] << (8 * i))
+          if s.isa_mem_sext[dinst['iid']]: data = s.sext(data, 8 * mem_resp['size'])
+          dinst['wb_data'] = data
+
+    s.m2w = group
+    s.x2m = None
+
+    return '{: <{}}'.format(','.join(dinst['mnemonic'] for dinst in group), 8 * s.width)
+
+  #=====================================================================
+  # Writeback Stage
+  #=====================================================================
+  def w(s):
+    if s.m2w is None:
+      return '{: <{}}'.format(' ', 8 * s.width)
+
+    group = s.m2w
+
+    for dinst in group:
+      if dinst['mnemonic'] == 'syscall': s.block_D_s = False
+      if dinst['wb_en']:
+        for reg_idx in dinst['dep']['W']:
+          s.rf[reg_idx] = dinst['wb_data']
+
+      s.inst_mix.commit(dinst)
+      if s.roi: s.roi_inst_mix.commit(dinst)
+
+    s.inst_c = len(group)
+    s.m2w    = None
+
+    return '{: <{}}'.format(','.join(dinst['mnemonic'] for dinst in group), 8 * s.width)
+
+  #=====================================================================
+  # Tick
+  #=====================================================================
+  def isDrained(s):
+    return (s.f2d is None and not s.ibuf and s.d2x is None and
+            s.x2m is None and s.m2w is None and
+            (s.sb is None or s.sb.isEmpty()) and
+            (s.fq is None or s.fq.isDrained()))
+
+  def tick(s):
+    s.cycle_count += 1
+
+    s.retireStore()
+
+    # Reset
+    s.inst_c    = 0
+    s.block_D_s = None
+
+    s.fwd_X = s.d2x
+    s.fwd_M = s.x2m
+    s.fwd_W = s.m2w
+
+    # Tick backwards
+    lt_w = s.w()
+    lt_m = s.m()
+    lt_x = s.x()
+    lt_d = s.d()
+    lt_f = s.f()
+
+    # A syscall leaving the pipeline unblocks decode in the next cycle
+    if s.block_D_s is not None:
+      s.block_D = s.block_D_s
+
+    s.drainStore()
+
+    # Handle a squash
+    if s.squash:
+      s.redirectFetch()
+
+    s.lt_buf = ' | '.join((lt_f, lt_d, lt_x, lt_m, lt_w))
+
+  def linetraceColumns(s):
+    width = 8 * s.width
+    return [('Fetch', 12), ('Decode', width), ('Execute', width), ('Memory', width), ('Complete', width)]
@@ -11,13 +11,17 @@ from pyArchSimLib.proc.core import FiveStageInorderCore
 from pyArchSimLib.mem.cache import NoCache
 
 class FiveStageInorderProcessor():
-  def __init__(s):
+  # Any core with the interface of the five-stage core (e.g., the
+  # superscalar one) can be plugged in. The caches use the memory ports
+  # `port_base` (icache) and `port_base + 1` (dcache); another dcache
+  # (e.g., a coherent one) can be given, with its port.
+  def __init__(s, core=None, port_base=0, dcache=None):
     # Core
-    s.core = FiveStageInorderCore()
+    s.core = core if core is not None else FiveStageInorderCore()
 
     # Caches
-    s.icache = NoCache(0)
-    s.dcache = NoCache(1)
+    s.icache = NoCache(port_base)
+    s.dcache = dcache if dcache is not None else NoCache(port_base + 1)
 
     # Memory interface for syscalls
     s.MemReadFunct  = None
@@ -35,6 +39,10 @@ class FiveStageInorderProcessor():
     s.core.setDMemHasResp (s.dcache.hasResp )
     s.core.setDMemRecvResp(s.dcache.recvResp)
 
+  # Where execution starts
+  def setEntryPoint(s, pc):
+    s.core.pc = pc
+
   # Connections
   def setMemReadFunct(s, MemReadFunct):
     s.MemReadFunct  = MemReadFunct
@@ -72,6 +80,16 @@ class FiveStageInorderProcessor():
   def getExitStatus(s):
     return s.core.getExitStatus()
 
+  # Statistics
+  def getStats(s):
+    return s.core.getStats()
+
+  # Functional execution (fast-forwarding)
+  def isDrained(s):
+    return s.core.isDrained()
+  def step(s):
+    return s.core.step()
+
   # Tick
   def tick(s):
     s.core.tick()
@@ -88,3 +106,13 @@ class FiveStageInorderProcessor():
     if dcache_lt != '': lt_buf += ' | ' + dcache_lt
 
     return lt_buf
+
+  def linetraceHeader(s):
+    icache_hdr = s.icache.linetraceHeader()
+    dcache_hdr = s.dcache.linetraceHeader()
+
+    hdr_buf = s.core.linetraceHeader()
+    if icache_hdr != '': hdr_buf += ' | ' + icache_hdr
+    if dcache_hdr != '': hdr_buf += ' | ' + dcache_hdr
+
+    return hdr_buf
@@ -0,0 +1,3 @@
+from .simulator import Simulator
+from .parallel  import ParallelSimulator
+from .parallel  import CrossbarProxy
@@ -0,0 +1,442 @@
+# parallel.py
+# --------------------------------------------------------------------
+#   The simulation loop of a multicore system split into groups of
+#   cores, every group simulated by its own host process.
+#
+#   Every group is a MulticoreSystem of its own, whose memory is a
+#   SharedMultiportedMemory over the same SharedPages.
+#
+#   With a quantum of 1 (the default), the groups share one crossbar
+#   and one memory, which the parent process simulates: every cycle,
+#   every group ticks its cores, and sends what its caches did to the
+#   crossbar (through a CrossbarProxy) to the parent; the parent then
+#   ticks the crossbar and the memory, and sends every group what its
+#   caches will see in the next cycle. This is the same simulation as
+#   with a single host process, cycle for cycle.
+#
+#   With a larger quantum, every group has its own crossbar and memory
+#   ports, so the memory bandwidth grows with the number of groups, and
+#   the contention between the groups is not modeled. The processes
+#   simulate a quantum of cycles on their own, then wait for each
+#   other; a group may thus get up to a quantum ahead of the others,
+#   and when it sees what they wrote depends on how the host schedules
+#   the processes. This is faster, but only an approximation.
+#
+#   The ROI cycles are those in which a core of any group was in the
+#   ROI. With a shared crossbar, the ROI instructions are those
+#   completed in these cycles, as with a single process; otherwise,
+#   those of a group are the ones completed while one of its own cores
+#   was in the ROI.
+
+import multiprocessing
+import signal
+import threading
+import time
+import traceback
+
+from .simulator import Simulator
+
+# Stands for the crossbar shared by all the groups, in the process of a
+# group: it answers the caches of the group with what the crossbar
+# showed them at the end of the previous cycle, and records what they
+# did to it during the cycle.
+class CrossbarProxy():
+  def __init__(s, base, nreqs, queue_size=1):
+    s.base       = base # first requester (of the shared crossbar)
+    s.nreqs      = nreqs
+    s.queue_size = queue_size
+
+    # Requests queued, and response ready, of every requester
+    s.queued = [0    for _ in range(nreqs)]
+    s.resp   = [None for _ in range(nreqs)]
+
+    # What the requesters did during the cycle, in order
+    s.events = []
+
+    # Statistics (of the requesters on the shared crossbar)
+    s.num_grants = [0 for _ in range(nreqs)]
+    s.num_waits  = [0 for _ in range(nreqs)]
+
+  # Connections (the shared crossbar has the memory)
+  def setMemCanReq(s, MemCanReq):
+    pass
+  def setMemSendReq(s, MemSendReq):
+    pass
+  def setMemHasResp(s, MemHasResp):
+    pass
+  def setMemRecvResp(s, MemRecvResp):
+    pass
+
+  # Interface
+  def canReq(s, i):
+    return s.queued[i] < s.queue_size
+
+  def sendReq(s, i, req):
+    assert (s.queued[i] < s.queue_size)
+    s.queued[i] += 1
+    s.events.append((0, i, req))
+
+  def hasResp(s, i):
+    return s.resp[i] is not None
+
+  def recvResp(s, i):
+    resp = s.resp[i]
+    s.resp[i] = None
+    s.events.append((1, i, None))
+    return resp
+
+  def release(s, i):
+    s.queued[i] = 0
+    s.resp  [i] = None
+    s.events.append((2, i, None))
+
+  # What happened during the cycle
+  def flush(s):
+    events, s.events = s.events, []
+    return events
+
+  # Plays the events of a group on the shared crossbar
+  def play(s, xbar, events):
+    for event, i, req in events:
+      if   event == 0: xbar.sendReq (s.base + i, req)
+      elif event == 1: xbar.recvResp(s.base + i)
+      else           : xbar.release (s.base + i)
+
+  # What the requesters see of the shared crossbar, for the next cycle
+  def view(s, xbar):
+    view = []
+    for i in range(s.base, s.base + s.nreqs):
+      view.append((len(xbar.queue[i]), xbar.peekResp(i) if xbar.hasResp(i) else None))
+    return view
+
+  def update(s, view):
+    for i, (queued, resp) in enumerate(view):
+      s.queued[i] = queued
+      s.resp  [i] = resp
+
+  # (the crossbar is ticked by the parent process)
+  def tick(s):
+    pass
+
+  # Statistics, from the shared crossbar once the run is over
+  def collectStats(s, xbar):
+    s.num_grants = xbar.num_grants[s.base:s.base + s.nreqs]
+    s.num_waits  = xbar.num_waits [s.base:s.base + s.nreqs]
+
+  def getStats(s):
+    stats = {}
+    for i in range(s.nreqs):
+      stats['req{}_grants'.format(s.base + i)] = s.num_grants[i]
+      stats['req{}_waits' .format(s.base + i)] = s.num_waits [i]
+    return stats
+
+  def linetrace(s):
+    return ''
+
+class ParallelSimulator(Simulator):
+  # With a quantum of 1, `xbar` and `mem` are the crossbar and memory
+  # shared by the groups, whose systems go through a CrossbarProxy
+  def __init__(s, systems, pages, max_num_cycle=1000000, quantum=1, xbar=None, mem=None):
+    if quantum < 1:
+      raise ValueError('the quantum must be at least one cycle')
+    if (quantum == 1) != (xbar is not None and mem is not None):
+      raise ValueError('the groups share a crossbar and a memory if and only if the quantum is 1')
+
+    super().__init__(None, max_num_cycle)
+
+    s.systems = list(systems)
+    s.pages   = pages
+    s.quantum = quantum
+    s.xbar    = xbar
+    s.mem     = mem
+
+    if xbar is not None:
+      s.xbar.setMemCanReq  (s.mem.canReq  )
+      s.xbar.setMemSendReq (s.mem.sendReq )
+      s.xbar.setMemHasResp (s.mem.hasResp )
+      s.xbar.setMemRecvResp(s.mem.recvResp)
+      s.xbar.setMemPeekResp(s.mem.peekResp)
+
+    # Synchronization (set up by run())
+    s.barrier = None
+    s.status  = None
+    s.stop    = None
+
+    # Statistics
+    s.num_syncs = 0
+    s.host_time = 0.0
+
+  def isShared(s):
+    return s.xbar is not None
+
+  # The first SIGINT is passed on to the host processes
+  def handleSigint(s, signum, frame):
+    super().handleSigint(signum, frame)
+    s.stop.value = 1
+
+  #=====================================================================
+  # Simulation Loop
+  #=====================================================================
+  def run(s):
+    ctx = multiprocessing.get_context('fork')
+    n   = len(s.systems)
+
+    s.barrier = ctx.Barrier(n)
+    s.status  = ctx.RawArray('b', 2 * n)
+    s.stop    = ctx.RawValue('b', 0)
+
+    s.stop_requested = False
+
+    prev_handler = s.installSigint()
+    start = time.time()
+
+    procs = []
+    conns = []
+    for g in range(n):
+      parent_end, child_end = ctx.Pipe(duplex=s.isShared())
+      proc = ctx.Process(target=s.worker, args=(g, child_end))
+      proc.start()
+      child_end.close()
+      procs.append(proc)
+      conns.append(parent_end)
+
+    # (groups that failed while sharing the crossbar already sent why)
+    failures = {}
+    if s.isShared():
+      s.roi_num_cycle = 0
+      s.roi_num_insts = 0
+      s.end_reason    = s.arbitrate(conns, failures)
+
+    results = []
+    for g, conn in enumerate(conns):
+      if g in failures:
+        results.append(failures[g])
+        continue
+      try:
+        results.append(conn.recv())
+      except EOFError:
+        results.append({'error': 'the host process died'})
+    for proc in procs:
+      proc.join()
+
+    s.host_time = time.time() - start
+    s.restoreSigint(prev_handler)
+
+    for g, result in enumerate(results):
+      if 'error' in result:
+        raise RuntimeError('group {} of the parallel simulation failed: {}'.format(g, result['error']))
+
+    # The systems as the processes left them (sharing the pages again)
+    s.systems = [result['system'] for result in results]
+    for system in s.systems:
+      system.mem.pages = s.pages
+      if s.isShared():
+        system.xbar.collectStats(s.xbar)
+
+    if not s.isShared():
+      s.end_reason = results[0]['end_reason']
+    s.num_syncs     = results[0]['syncs']
+    s.cycle         = max(system.cycle for system in s.systems)
+    s.tot_num_cycle = s.cycle
+    s.tot_num_insts = sum(sum(system.num_insts) for system in s.systems)
+    if not s.isShared():
+      s.roi_num_insts = sum(result['roi_insts'] for result in results)
+      s.roi_num_cycle = s.unionLength([span for result in results for span in result['roi']])
+
+    s.exit_cond   = s.end_reason == 'exit'
+    s.exit_status = 0
+    for system in s.systems:
+      _, code = system.getExitStatus()
+      if s.exit_cond and code != 0:
+        s.exit_status = code
+        break
+
+    return s.exit_cond, s.exit_status
+
+  # Simulates the shared crossbar and memory, every cycle once every
+  # group is done with its cores; returns how the run ended, and the
+  # results of the groups that failed in `failures`
+  def arbitrate(s, conns, failures):
+    proxies = [system.xbar for system in s.systems]
+    cycle   = 0
+
+    while True:
+      done      = True
+      isROI     = False
+      completed = 0
+      for g, conn in enumerate(conns):
+        if g in failures:
+          continue
+        try:
+          msg = conn.recv()
+        except EOFError:
+          msg = {'error': 'the host process died'}
+        if not isinstance(msg, tuple):
+          failures[g] = msg
+          continue
+
+        events, group_done, group_roi, group_completed = msg
+        proxies[g].play(s.xbar, events)
+        done       = done and group_done
+        isROI      = isROI or group_roi
+        completed += group_completed
+
+      s.xbar.tick()
+      s.mem.tick()
+      cycle += 1
+
+      if isROI:
+        s.roi_num_cycle += 1
+        s.roi_num_insts += completed
+
+      if   failures                : end_reason = 'failed'
+      elif s.stop_requested        : end_reason = 'interrupted'
+      elif done                    : end_reason = 'exit'
+      elif cycle >= s.max_num_cycle: end_reason = 'timeout'
+      else                         : end_reason = None
+
+      for g, conn in enumerate(conns):
+        if g not in failures:
+          conn.send((proxies[g].view(s.xbar) if end_reason is None else None, end_reason))
+
+      if end_reason is not None:
+        return end_reason
+
+  # Cycles covered by a list of (start, end) spans
+  @staticmethod
+  def unionLength(spans):
+    length = 0
+    last   = 0
+    for start, end in sorted(spans):
+      start = max(start, last)
+      if end > start:
+        length += end - start
+        last    = end
+    return length
+
+  # Simulates group `g`, and sends back its system and statistics
+  def worker(s, g, conn):
+    # (interruptions are handled by the parent, see handleSigint())
+    s.restoreSigint(signal.SIG_IGN)
+
+    try:
+      result = s.simulate(g, conn)
+    except threading.BrokenBarrierError:
+      result = {'error': 'another group failed'}
+    except Exception:
+      if not s.isShared():
+        s.barrier.abort()
+      result = {'error': traceback.format_exc()}
+
+    conn.send(result)
+    conn.close()
+
+  def simulate(s, g, conn):
+    system = s.systems[g]
+    n      = len(s.systems)
+
+    cycle = 0
+    syncs = 0
+    done  = False
+
+    roi       = []
+    roi_start = None
+    roi_insts = 0
+
+    while True:
+      isROI     = False
+      completed = 0
+      if not done:
+        isROI = system.roiFlag()
+        if isROI and roi_start is None:
+          roi_start = cycle
+        elif not isROI and roi_start is not None:
+          roi.append((roi_start, cycle))
+          roi_start = None
+
+        system.tick()
+
+        completed = system.instCompletionFlag()
+        if isROI:
+          roi_insts += completed
+
+        done = system.getExitStatus()[0]
+
+      cycle += 1
+
+      if s.isShared():
+        # What the caches did goes to the shared crossbar, and what they
+        # will see comes back
+        conn.send((system.xbar.flush(), done, isROI, completed))
+        view, end_reason = conn.recv()
+        syncs += 1
+        if end_reason is not None:
+          break
+        system.xbar.update(view)
+        continue
+
+      if cycle % s.quantum != 0 and cycle < s.max_num_cycle:
+        continue
+
+      # Every group says whether it is done (group 0 also passes on
+      # interruptions); the status alternates between two halves, so a
+      # group going on to the next quantum does not overwrite what the
+      # others are still looking at
+      half = (syncs % 2) * n
+      s.status[half + g] = 1 if done else 0
+      if g == 0 and s.stop.value:
+        s.status[half] = 2
+
+      s.barrier.wait()
+      syncs += 1
+
+      status = s.status[half:half + n]
+      if   2 in status               : end_reason = 'interrupted'; break
+      elif all(status)               : end_reason = 'exit'       ; break
+      elif cycle >= s.max_num_cycle  : end_reason = 'timeout'    ; break
+
+    if roi_start is not None:
+      roi.append((roi_start, system.cycle))
+
+    result = {}
+    result['system'    ] = system
+    result['end_reason'] = end_reason
+    result['syncs'     ] = syncs
+    result['roi'       ] = roi
+    result['roi_insts' ] = roi_insts
+    return result
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def getStats(s):
+    stats = super().getStats()
+    stats['host_procs'] = len(s.systems)
+    stats['quantum'   ] = s.quantum
+    stats['syncs'     ] = s.num_syncs
+    stats['host_time' ] = s.host_time
+    return stats
+
+  def printStats(s):
+    super().printStats()
+
+    print(' + Parallel Simulation ({} host processes, {}):'.format(
+          len(s.systems), 'shared crossbar and memory' if s.isShared() else
+          'quantum of {} cycles, memory ports per group'.format(s.quantum)))
+    print('     - Synchronizations = {}'.format(s.num_syncs))
+    print('     - Host Time = {:.2f} s'.format(s.host_time))
+    print('     - Simulation Rate = {:.0f} cycles/s'.format(
+          s.tot_num_cycle / s.host_time if s.host_time > 0 else 0.0))
+    print('')
+
+    rows = [row for system in s.systems for row in system.coreStats()]
+    if s.isShared():
+      print(' + Cores ({}, in {} groups, sharing {} memory ports, {} arbitration):'.format(
+            len(rows), len(s.systems), s.xbar.nports, s.xbar.policy))
+      s.systems[0].printCoreStats(rows, s.cycle)
+      s.xbar.printStats()
+    else:
+      xbar = s.systems[0].xbar
+      print(' + Cores ({}, in {} groups, each with its own {} memory ports, {} arbitration):'.format(
+            len(rows), len(s.systems), xbar.nports, xbar.policy))
+      s.systems[0].printCoreStats(rows, s.cycle)
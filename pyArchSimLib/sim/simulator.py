@@ -0,0 +1,313 @@
+# simulator.py
+# --------------------------------------------------------------------
+#   The simulation loop driving a system, cycle by cycle.
+
+import pickle
+import signal
+
+class Simulator():
+  CHECKPOINT_VERSION = 1
+
+  def __init__(s, system, max_num_cycle=1000000, ltEnable=False, ltFile=None, hostProf=None,
+               intervalStats=None, guestProf=None, max_num_insts=None, memTrace=None,
+               pipeTrace=None):
+    s.system        = system
+    s.max_num_cycle = max_num_cycle
+    s.max_num_insts = max_num_insts
+
+    # Linetracing
+    s.ltEnable = ltEnable
+    s.ltFile   = ltFile
+
+    # Host profiling
+    s.hostProf = hostProf
+
+    # Interval statistics
+    s.intervalStats = intervalStats
+
+    # Guest profiling
+    s.guestProf = guestProf
+
+    # Memory tracing
+    s.memTrace = memTrace
+
+    # Pipeline tracing (for graphical viewers)
+    s.pipeTrace = pipeTrace
+
+    # Statistics
+    s.cycle         = 0
+
+    s.tot_num_cycle = 0
+    s.tot_num_insts = 0
+
+    s.roi_num_cycle = 0
+    s.roi_num_insts = 0
+
+    # Instructions executed functionally (fast-forwarded)
+    s.ff_num_insts  = 0
+
+    # Exit
+    s.exit_cond   = False
+    s.exit_status = 0
+
+    # How the last run ended: 'exit', 'timeout', 'inst_limit', or
+    # 'interrupted'
+    s.end_reason     = None
+    s.stop_requested = False
+
+  #=====================================================================
+  # Linetracing
+  #=====================================================================
+  def emit(s, line):
+    if   s.ltFile: s.ltFile.write(line)
+    else         : print(line, end='')
+
+  def printHeader(s):
+    # The columns follow the widths of the system's linetrace
+    mid = '| {: <9}| {}\n'.format('Cycle', s.system.linetraceHeader())
+    top = ''.join('+' if c == '|' else '-' for c in mid[:-1]) + '\n'
+    bot = top
+
+    s.emit(top)
+    s.emit(mid)
+    s.emit(bot)
+
+  #=====================================================================
+  # Interruption
+  #=====================================================================
+  # The first SIGINT asks the loop to stop at the end of the current
+  # cycle, so the system is left in a consistent state; a second one
+  # aborts right away.
+  def handleSigint(s, signum, frame):
+    if s.stop_requested:
+      raise KeyboardInterrupt
+    s.stop_requested = True
+
+  def installSigint(s):
+    try:
+      return signal.signal(signal.SIGINT, s.handleSigint)
+    except ValueError:
+      return None # Not the main thread
+
+  def restoreSigint(s, handler):
+    if handler is not None:
+      signal.signal(signal.SIGINT, handler)
+
+  def isComplete(s):
+    return s.end_reason == 'exit'
+
+  #=====================================================================
+  # Simulation Loop
+  #=====================================================================
+  def run(s):
+    system        = s.system
+    hostProf      = s.hostProf
+    intervalStats = s.intervalStats
+    guestProf     = s.guestProf
+    pipeTrace     = s.pipeTrace
+
+    prevROI = system.roiFlag()
+
+    start_cycles = s.tot_num_cycle
+    start_insts  = s.tot_num_insts
+
+    if s.ltEnable    : s.printHeader()
+    if hostProf      : hostProf.start()
+    if intervalStats : intervalStats.begin(s)
+    if s.memTrace    : s.memTrace.begin(s)
+
+    s.stop_requested = False
+    s.end_reason     = 'timeout'
+
+    prev_handler = s.installSigint()
+
+    while s.cycle < s.max_num_cycle:
+      # Check stats before ticking
+      # hawajkm: again, we need to eliminate combinational propagation.
+      #          my idea is to just double-buffer! Version 2.00 will
+      #          include signal-level double-buffering.
+
+      # If ROI
+      isROI = system.roiFlag()
+
+      if guestProf: guestProf.before()
+
+      if hostProf and hostProf.isSampleCycle(s.cycle):
+        linetrace = hostProf.sampleTick(system)
+      else:
+        system.tick()
+        linetrace = system.linetrace()
+
+      if guestProf: guestProf.after()
+      if pipeTrace: pipeTrace.after(s.cycle)
+
+      # Superscalar cores complete more than one instruction per cycle
+      num_completed = system.instCompletionFlag()
+
+      if isROI:
+        s.roi_num_cycle += 1
+        s.roi_num_insts += num_completed
+
+      s.tot_num_cycle += 1
+      s.tot_num_insts += num_completed
+
+      # Linetracing
+      if s.ltEnable:
+        s.emit('{: >10d} | {}\n'.format(s.cycle, linetrace))
+
+      # Interval statistics
+      if intervalStats:
+        currROI = system.roiFlag()
+        if currROI != prevROI:
+          intervalStats.snapshot(s, 'roi_begin' if currROI else 'roi_end')
+          prevROI = currROI
+        elif intervalStats.isSnapshotCycle(s.tot_num_cycle):
+          intervalStats.snapshot(s, 'interval')
+
+      # Exit Status
+      s.exit_cond, s.exit_status = system.getExitStatus()
+
+      if s.exit_cond:
+        s.end_reason = 'exit'
+        break
+
+      # Advance
+      s.cycle += 1
+
+      if s.max_num_insts is not None and s.tot_num_insts >= s.max_num_insts:
+        s.end_reason = 'inst_limit'
+        break
+
+      if s.stop_requested:
+        s.end_reason = 'interrupted'
+        break
+
+    s.restoreSigint(prev_handler)
+
+    if hostProf: hostProf.stop(s.tot_num_cycle - start_cycles, s.tot_num_insts - start_insts)
+
+    if intervalStats:
+      intervalStats.snapshot(s, 'end' if s.isComplete() else s.end_reason)
+      intervalStats.close()
+
+    if s.memTrace: s.memTrace.close()
+    if pipeTrace : pipeTrace .close()
+
+    return s.exit_cond, s.exit_status
+
+  #=====================================================================
+  # Fast-Forwarding
+  #=====================================================================
+  # Executes up to `num_insts` instructions (all of them if None) with
+  # no timing, and returns how many were executed. The instructions
+  # are counted separately from the simulated ones. `bbv` (if any) is
+  # given the PC and ID of every executed instruction.
+  def fastForward(s, num_insts=None, bbv=None):
+    system = s.system
+
+    assert system.isDrained(), 'Fast-forwarding requires an empty pipeline'
+
+    n = 0
+    while num_insts is None or n < num_insts:
+      pc, iid = system.step()
+      n += 1
+
+      if bbv: bbv.record(pc, iid)
+
+      s.exit_cond, s.exit_status = system.getExitStatus()
+      if s.exit_cond:
+        s.end_reason = 'exit'
+        break
+
+    s.ff_num_insts += n
+
+    return n
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def getStats(s):
+    stats = {}
+    stats['cycles'    ] = s.tot_num_cycle
+    stats['insts'     ] = s.tot_num_insts
+    stats['ipc'       ] = s.tot_num_insts / s.tot_num_cycle if s.tot_num_cycle > 0 else 0.0
+    stats['roi_cycles'] = s.roi_num_cycle
+    stats['roi_insts' ] = s.roi_num_insts
+    stats['roi_ipc'   ] = s.roi_num_insts / s.roi_num_cycle if s.roi_num_cycle > 0 else 0.0
+    stats['ff_insts'  ] = s.ff_num_insts
+    return stats
+
+  def ratio(s, num, den):
+    return '{:.2f}'.format(num / den) if den > 0 else 'n/a'
+
+  def printStats(s):
+    print('')
+    if   s.end_reason == 'timeout':
+      print(' + INCOMPLETE: reached the maximum number of cycles ({})'.format(s.max_num_cycle))
+      print('   The statistics below cover the execution so far.')
+      print('')
+    elif s.end_reason == 'interrupted':
+      print(' + INCOMPLETE: interrupted at cycle {}'.format(s.cycle))
+      print('   The statistics below cover the execution so far.')
+      print('')
+    elif s.end_reason == 'inst_limit':
+      print(' + Stopped after {} simulated instructions'.format(s.max_num_insts))
+      print('')
+    if s.ff_num_insts > 0:
+      print(' + Fast-Forwarded Instructions = {}'.format(s.ff_num_insts))
+      print('')
+    print(' + Overall Total Statistics:')
+    print('     - Total Number of Cycles = {}'.format(s.tot_num_cycle))
+    print('     - Total Number of Completed Instructions = {}'.format(s.tot_num_insts))
+    print('     - Average IPC = {}'.format(s.ratio(s.tot_num_insts, s.tot_num_cycle)))
+    print('     - Average CPI = {}'.format(s.ratio(s.tot_num_cycle, s.tot_num_insts)))
+    print('')
+    if s.roi_num_cycle > 0:
+      print(' + ROI Statistics:')
+      print('     - ROI Number of Cycles = {}'.format(s.roi_num_cycle))
+      print('     - ROI Number of Completed Instructions = {}'.format(s.roi_num_insts))
+      print('     - ROI Average IPC = {}'.format(s.ratio(s.roi_num_insts, s.roi_num_cycle)))
+      print('     - ROI Average CPI = {}'.format(s.ratio(s.roi_num_cycle, s.roi_num_insts)))
+      print('')
+    if s.hostProf:
+      s.hostProf.printStats()
+    if s.guestProf:
+      s.guestProf.printStats()
+
+  #=====================================================================
+  # Checkpointing
+  #=====================================================================
+  # Only the simulated state is saved; linetracing, profiling, interval
+  # statistics and memory/pipeline tracing are attached again by whoever
+  # resumes the run.
+  def saveCheckpoint(s, filename):
+    ckpt = {}
+    ckpt['version'      ] = Simulator.CHECKPOINT_VERSION
+    ckpt['system'       ] = s.system
+    ckpt['cycle'        ] = s.cycle
+    ckpt['tot_num_cycle'] = s.tot_num_cycle
+    ckpt['tot_num_insts'] = s.tot_num_insts
+    ckpt['roi_num_cycle'] = s.roi_num_cycle
+    ckpt['roi_num_insts'] = s.roi_num_insts
+    ckpt['ff_num_insts' ] = s.ff_num_insts
+
+    with open(filename, 'wb') as file:
+      pickle.dump(ckpt, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+  @staticmethod
+  def loadCheckpoint(filename):
+    with open(filename, 'rb') as file:
+      ckpt = pickle.load(file)
+
+    assert ckpt['version'] == Simulator.CHECKPOINT_VERSION
+
+    return ckpt
+
+  def restoreCheckpoint(s, ckpt):
+    s.system        = ckpt['system'       ]
+    s.cycle         = ckpt['cycle'        ]
+    s.tot_num_cycle = ckpt['tot_num_cycle']
+    s.tot_num_insts = ckpt['tot_num_insts']
+    s.roi_num_cycle = ckpt['roi_num_cycle']
+    s.roi_num_insts = ckpt['roi_num_insts']
+    s.ff_num_insts  = ckpt.get('ff_num_insts', 0)
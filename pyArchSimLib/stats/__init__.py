@@ -0,0 +1,6 @@
+from .host_profiler import HostProfiler
+from .interval_stats import IntervalStats
+from .guest_profiler import GuestProfiler
+from .simpoint import BbvCollector
+from .simpoint import SimPoint
+from .pipe_trace import PipeTracer
@@ -0,0 +1,282 @@
+# guest_profiler.py
+# --------------------------------------------------------------------
+#   Profiler for the simulated (i.e., guest) program.
+#
+#   Every simulated cycle is charged to the PC of the oldest live
+#   instruction in the pipeline, i.e., the one that either commits in
+#   that cycle or holds up the commit. Stall cycles are charged to the
+#   instruction waiting in the stalled stage. The PCs are symbolized
+#   with the nearest preceding label of the program's symbol table,
+#   and calls (jal) and returns (jr $ra) are followed to build the
+#   call stacks of the folded-stack output used by flamegraph tools.
+
+import bisect
+
+from pyArchSimLib.arch.isa import mips32
+
+class GuestProfiler():
+  # The pipeline register holding the instruction that a stall is
+  # charged to; None is the fetch PC.
+  stall_stages = {
+    'f_imem'   : None,
+    'd_imem'   : 'f2d',
+    'd_raw'    : 'f2d',
+    'd_syscall': 'f2d',
+    'd_blocked': 'f2d',
+    'd_fu'     : 'f2d',
+    'x_dmem'   : 'd2x',
+    'x_fu'     : 'd2x',
+    'x_sb_full': 'd2x',
+    'x_sb_part': 'd2x',
+    'm_dmem'   : 'x2m',
+    'squash'   : 'm2w',
+  }
+
+  # Pipeline registers captured before a tick, oldest first
+  stage_regs = ('m2w', 'x2m', 'd2x', 'f2d')
+
+  def __init__(s, top=10):
+    s.top = top
+
+    # Per-PC counters
+    s.cycles = {}
+    s.insts  = {}
+    s.stalls = {}
+
+    # Cycles per (call stack, PC)
+    s.stack_cycles = {}
+
+    # Call stack: a tuple of the entry PCs of the called functions
+    s.stack = ()
+
+    # Targets of taken control flow; they start basic blocks
+    s.leaders   = set()
+    s.last_pc   = None
+
+    s.core    = None
+    s.mem     = None
+    s.symbols = []
+
+    # State captured before a tick
+    s.pre_regs   = None
+    s.pre_pc     = None
+    s.pre_stalls = None
+
+    # ISA tables
+    tbl = mips32.tables()
+    s.isa_mnemonic  = tbl['mnemonic' ]
+    s.isa_type      = tbl['type'     ]
+    s.isa_wmask     = tbl['wmask'    ]
+    s.isa_is_branch = tbl['is_branch']
+
+  #=====================================================================
+  # Setup
+  #=====================================================================
+  def probeSystem(s, system):
+    # We only know about the default hierarchy for now.
+    s.core = system.proc.core
+    s.mem  = system.getMem()
+
+    s.stall_kinds = list(s.core.stall_stats)
+
+    # Symbols sorted by address; the first label of an address wins
+    sym_tbl = getattr(system, 'sym_tbl', {})
+    by_addr = {}
+    for name, addr in sym_tbl.items():
+      if addr not in by_addr:
+        by_addr[addr] = name
+    s.symbols = sorted(by_addr.items())
+    s.sym_addrs = [addr for addr, _ in s.symbols]
+
+  #=====================================================================
+  # Sampling
+  #=====================================================================
+  def before(s):
+    core = s.core
+
+    s.pre_regs   = (core.m2w, core.x2m, core.d2x, core.f2d)
+    s.pre_pc     = core.pc
+    s.pre_stalls = list(core.stall_stats.values())
+
+  def after(s):
+    core = s.core
+
+    m2w, x2m, d2x, f2d = s.pre_regs
+
+    # The cycle goes to the oldest live instruction
+    pc = None
+    for dinst in (m2w, x2m, d2x):
+      if dinst is not None and not dinst['squashed']:
+        pc = dinst['pc']
+        break
+    if pc is None:
+      pc = f2d['pc'] if f2d is not None else s.pre_pc
+
+    s.cycles[pc] = s.cycles.get(pc, 0) + 1
+
+    key = (s.stack, pc)
+    s.stack_cycles[key] = s.stack_cycles.get(key, 0) + 1
+
+    # Stalls go to the instruction in the stalled stage
+    pre_stalls = s.pre_stalls
+    for i, count in enumerate(core.stall_stats.values()):
+      if count != pre_stalls[i]:
+        s.addStall(i, count - pre_stalls[i], pc)
+
+    # Commits
+    if core.inst_c and m2w is not None and not m2w['squashed']:
+      s.commit(m2w)
+
+  def addStall(s, i, delta, pc):
+    kind = s.stall_kinds[i]
+    reg  = s.stall_stages[kind]
+
+    if reg is None:
+      stall_pc = s.pre_pc
+    else:
+      dinst    = s.pre_regs[s.stage_regs.index(reg)]
+      stall_pc = dinst['pc'] if dinst is not None else pc
+
+    stalls = s.stalls.setdefault(stall_pc, {})
+    stalls[kind] = stalls.get(kind, 0) + delta
+
+  def commit(s, dinst):
+    pc  = dinst['pc' ]
+    iid = dinst['iid']
+
+    s.insts[pc] = s.insts.get(pc, 0) + 1
+
+    if s.last_pc is not None and pc != s.last_pc + 4:
+      s.leaders.add(pc)
+    s.last_pc = pc
+
+    # Calls and returns
+    if s.isa_wmask[iid] & mips32.REG_RA:
+      target = (pc & 0xf0000000) | (dinst['imm26'] << 2)
+      s.stack = s.stack + (target,)
+    elif s.isa_type[iid] == 'jump_r' and dinst['rs'] == 31 and s.stack:
+      s.stack = s.stack[:-1]
+
+  #=====================================================================
+  # Symbolization
+  #=====================================================================
+  # Code before the first label is lumped together
+  def symbolize(s, pc):
+    idx = bisect.bisect_right(s.sym_addrs, pc) - 1
+    if idx < 0:
+      return '[unlabeled]', None
+    addr, name = s.symbols[idx]
+    return name, addr
+
+  def describe(s, pc):
+    name, addr = s.symbolize(pc)
+    if addr is None:
+      return '{:#010x}'.format(pc)
+    if addr == pc:
+      return name
+    return '{}+{:#x}'.format(name, pc - addr)
+
+  def decodeAt(s, pc):
+    data = s.mem.read(pc, 4)
+    inst = data[0] | (data[1] << 8) | (data[2] << 16) | (data[3] << 24)
+    return mips32.decode(inst)
+
+  #=====================================================================
+  # Aggregation
+  #=====================================================================
+  def getLabels(s):
+    labels = {}
+    for pc, cycles in s.cycles.items():
+      name, _ = s.symbolize(pc)
+      entry = labels.setdefault(name, [0, 0])
+      entry[0] += cycles
+      entry[1] += s.insts.get(pc, 0)
+    return labels
+
+  # Blocks of consecutive executed instructions, split at labels,
+  # targets of taken control flow, and after control-flow instructions
+  def getBlocks(s):
+    blocks = {}
+    sym_addrs = set(s.sym_addrs)
+
+    leader = None
+    prev   = None
+    for pc in sorted(s.cycles):
+      if (prev is None or pc != prev + 4 or pc in sym_addrs or pc in s.leaders or
+          s.isa_is_branch[s.decodeAt(prev)]):
+        leader = pc
+        blocks[leader] = [pc, 0, 0]
+
+      block = blocks[leader]
+      block[0]  = pc
+      block[1] += s.cycles[pc]
+      block[2] += s.insts.get(pc, 0)
+      prev = pc
+
+    return blocks
+
+  def getTotalCycles(s):
+    return sum(s.cycles.values())
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def cpi(s, cycles, insts):
+    return '{:.2f}'.format(cycles / insts) if insts > 0 else 'n/a'
+
+  def printStats(s):
+    total = s.getTotalCycles()
+    if total == 0:
+      return
+
+    def share(cycles):
+      return 100.0 * cycles / total
+
+    print(' + Guest Profile:')
+    print('     - Attributed Cycles = {}'.format(total))
+    print('')
+
+    labels = sorted(s.getLabels().items(), key=lambda x: -x[1][0])
+    print('     - Hottest Labels:')
+    print('         {: <24} {: >10} {: >7} {: >10} {: >6}'.format('label', 'cycles', '%', 'insts', 'CPI'))
+    for name, (cycles, insts) in labels[:s.top]:
+      print('         {: <24} {: >10} {: >6.2f}% {: >10} {: >6}'.format(
+            name, cycles, share(cycles), insts, s.cpi(cycles, insts)))
+    print('')
+
+    blocks = sorted(s.getBlocks().items(), key=lambda x: -x[1][1])
+    print('     - Hottest Basic Blocks:')
+    print('         {: <24} {: <10} {: <10} {: >10} {: >7} {: >10} {: >6}'.format(
+          'block', 'start', 'end', 'cycles', '%', 'insts', 'CPI'))
+    for leader, (last, cycles, insts) in blocks[:s.top]:
+      print('         {: <24} {:#010x} {:#010x} {: >10} {: >6.2f}% {: >10} {: >6}'.format(
+            s.describe(leader), leader, last, cycles, share(cycles), insts, s.cpi(cycles, insts)))
+    print('')
+
+    pcs = sorted(s.cycles.items(), key=lambda x: -x[1])
+    print('     - Hottest Instructions:')
+    print('         {: <10} {: <24} {: <8} {: >10} {: >7} {: >10} {: >6}  {}'.format(
+          'pc', 'location', 'inst', 'cycles', '%', 'insts', 'CPI', 'stalls'))
+    for pc, cycles in pcs[:s.top]:
+      insts  = s.insts.get(pc, 0)
+      stalls = sorted(s.stalls.get(pc, {}).items(), key=lambda x: -x[1])
+      stalls = ', '.join('{}={}'.format(kind, count) for kind, count in stalls)
+      print('         {:#010x} {: <24} {: <8} {: >10} {: >6.2f}% {: >10} {: >6}  {}'.format(
+            pc, s.describe(pc), s.isa_mnemonic[s.decodeAt(pc)], cycles, share(cycles),
+            insts, s.cpi(cycles, insts), stalls))
+    print('')
+
+  # One line per call stack and label: "frame;frame;label cycles"
+  def writeFolded(s, filename):
+    folded = {}
+    for (stack, pc), cycles in s.stack_cycles.items():
+      frames = [s.symbolize(addr)[0] for addr in stack]
+      leaf   = s.symbolize(pc)[0]
+      if not frames or frames[-1] != leaf:
+        frames.append(leaf)
+      key = ';'.join(frames)
+      folded[key] = folded.get(key, 0) + cycles
+
+    with open(filename, 'w') as file:
+      for key, cycles in sorted(folded.items()):
+        file.write('{} {}\n'.format(key, cycles))
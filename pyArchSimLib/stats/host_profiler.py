@@ -0,0 +1,137 @@
+# host_profiler.py
+# --------------------------------------------------------------------
+#   Sampling profiler for the simulator itself (i.e., the host side).
+#
+#   Every `interval` cycles, one cycle is executed with timing probes
+#   installed around the tick() of each registered component. All the
+#   other cycles run the untouched code, so the overhead stays small.
+
+import time
+
+class HostProfiler():
+  def __init__(s, interval=1000):
+    s.interval = max(1, interval)
+
+    # Probes: [name, obj, attr, wrapper, accumulated_ns]
+    s.probes = []
+
+    # Sampled cycles
+    s.sampled_cycles = 0
+    s.sampled_ns     = 0
+    s.lt_ns          = 0
+
+    # Whole run
+    s.start_ns = 0
+    s.stop_ns  = 0
+    s.cycles   = 0
+    s.insts    = 0
+
+  #=====================================================================
+  # Probes
+  #=====================================================================
+  def makeWrapper(s, probe, method):
+    perf_counter_ns = time.perf_counter_ns
+
+    def wrapper(*args, **kwargs):
+      t0  = perf_counter_ns()
+      ret = method(*args, **kwargs)
+      probe[4] += perf_counter_ns() - t0
+      return ret
+
+    return wrapper
+
+  def addProbe(s, name, obj, attr):
+    if obj is None or not hasattr(obj, attr):
+      return
+
+    probe = [name, obj, attr, None, 0]
+    probe[3] = s.makeWrapper(probe, getattr(obj, attr))
+    s.probes.append(probe)
+
+  def probeSystem(s, system):
+    # We only know about the default hierarchy; other models
+    # can register their own probes through addProbe().
+    proc = getattr(system, 'proc', None)
+    core = getattr(proc  , 'core', None)
+
+    for stage in ['f', 'd', 'x', 'm', 'w']:
+      s.addProbe('core.{}'.format(stage), core, stage)
+
+    s.addProbe('icache', getattr(proc, 'icache', None), 'tick')
+    s.addProbe('dcache', getattr(proc, 'dcache', None), 'tick')
+    s.addProbe('memory', getattr(system, 'mem' , None), 'tick')
+
+  # Probes are installed as instance attributes, which shadow the class
+  # methods only for the duration of a sampled cycle.
+  def arm(s):
+    for probe in s.probes:
+      setattr(probe[1], probe[2], probe[3])
+
+  def disarm(s):
+    for probe in s.probes:
+      delattr(probe[1], probe[2])
+
+  #=====================================================================
+  # Sampling
+  #=====================================================================
+  def start(s):
+    s.start_ns = time.perf_counter_ns()
+
+  def stop(s, cycles, insts):
+    s.stop_ns = time.perf_counter_ns()
+    s.cycles  = cycles
+    s.insts   = insts
+
+  def isSampleCycle(s, cycle):
+    return (cycle % s.interval) == 0
+
+  def sampleTick(s, system):
+    s.arm()
+
+    t0 = time.perf_counter_ns()
+    system.tick()
+    t1 = time.perf_counter_ns()
+    linetrace = system.linetrace()
+    t2 = time.perf_counter_ns()
+
+    s.disarm()
+
+    s.sampled_cycles += 1
+    s.sampled_ns     += t2 - t0
+    s.lt_ns          += t2 - t1
+
+    return linetrace
+
+  #=====================================================================
+  # Reporting
+  #=====================================================================
+  def getShares(s):
+    shares = []
+    if s.sampled_ns == 0:
+      return shares
+
+    accounted = s.lt_ns
+    for probe in s.probes:
+      shares.append((probe[0], probe[4] / s.sampled_ns))
+      accounted += probe[4]
+
+    shares.append(('linetrace', s.lt_ns / s.sampled_ns))
+    shares.append(('other'    , max(0, s.sampled_ns - accounted) / s.sampled_ns))
+
+    return shares
+
+  def printStats(s):
+    wall_s = (s.stop_ns - s.start_ns) / 1e9
+
+    cps  = (s.cycles / wall_s)        if wall_s > 0 else 0.0
+    kips = (s.insts  / wall_s) / 1000 if wall_s > 0 else 0.0
+
+    print(' + Host Profile:')
+    print('     - Host Wall Time = {:.3f} s'.format(wall_s))
+    print('     - Simulated Cycles per Host Second = {:.0f}'.format(cps))
+    print('     - Committed KIPS = {:.2f}'.format(kips))
+    print('     - Sampled Cycles = {} (1 every {} cycles)'.format(s.sampled_cycles, s.interval))
+    print('     - Share of Sampled Wall Time:')
+    for name, share in s.getShares():
+      print('         {: <10} = {:6.2f}%'.format(name, share * 100))
+    print('')
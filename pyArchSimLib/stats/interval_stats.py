@@ -0,0 +1,116 @@
+# interval_stats.py
+# --------------------------------------------------------------------
+#   Periodic snapshots of the statistics of a running simulation.
+#
+#   A snapshot is taken every `interval` cycles, at every ROI boundary
+#   and at the end of the run. Each snapshot holds the counters of the
+#   interval since the previous snapshot alongside the cumulative
+#   counters, and it is appended to a JSON-lines or a CSV file right
+#   away, so a long run can be followed (e.g., with `tail -f`) while
+#   it is still going.
+
+import csv
+import json
+import time
+
+class IntervalStats():
+  def __init__(s, filename, interval, fmt=None, append=False):
+    s.interval = max(1, interval)
+
+    # Format
+    if fmt is None:
+      fmt = 'csv' if filename.endswith('.csv') else 'jsonl'
+    s.fmt = fmt
+
+    # Streaming output
+    s.file       = open(filename, 'a' if append else 'w', newline='')
+    s.csv_writer = None
+    s.has_header = append and s.file.tell() > 0
+
+    # Previous snapshot
+    s.prev_cycles = 0
+    s.prev_insts  = 0
+    s.prev_stats  = {}
+
+    s.start_time   = time.perf_counter()
+    s.start_cycles = 0
+    s.num_snaps    = 0
+
+  #=====================================================================
+  # Helpers
+  #=====================================================================
+  def flatten(s, stats, prefix=''):
+    flat = {}
+    for key, value in stats.items():
+      if isinstance(value, dict):
+        flat.update(s.flatten(value, prefix + key + '.'))
+      else:
+        flat[prefix + key] = value
+    return flat
+
+  # Start from the current counters; matters when resuming a run.
+  def begin(s, sim):
+    s.prev_cycles = sim.tot_num_cycle
+    s.prev_insts  = sim.tot_num_insts
+    s.prev_stats  = s.flatten(sim.system.getStats()) if hasattr(sim.system, 'getStats') else {}
+
+    s.start_time   = time.perf_counter()
+    s.start_cycles = sim.tot_num_cycle
+
+  def isSnapshotCycle(s, cycle):
+    return (cycle % s.interval) == 0
+
+  #=====================================================================
+  # Snapshots
+  #=====================================================================
+  def snapshot(s, sim, reason):
+    cycles = sim.tot_num_cycle
+    insts  = sim.tot_num_insts
+    elapsed = time.perf_counter() - s.start_time
+
+    # The end of the run coincided with the last snapshot. Runs that
+    # did not finish are always marked, though.
+    if cycles == s.prev_cycles and s.num_snaps > 0 and reason == 'end':
+      return
+
+    int_cycles = cycles - s.prev_cycles
+    int_insts  = insts  - s.prev_insts
+
+    snap = {}
+    snap['reason'      ] = reason
+    snap['cycle'       ] = cycles
+    snap['insts'       ] = insts
+    snap['roi'         ] = int(sim.system.roiFlag())
+    snap['int_cycles'  ] = int_cycles
+    snap['int_insts'   ] = int_insts
+    snap['int_ipc'     ] = round(int_insts / int_cycles, 4) if int_cycles > 0 else 0.0
+    snap['ipc'         ] = round(insts / cycles, 4)         if cycles     > 0 else 0.0
+    snap['host_s'      ] = round(elapsed, 3)
+    snap['cycles_per_s'] = round((cycles - s.start_cycles) / elapsed, 1) if elapsed > 0 else 0.0
+
+    # Per-interval deltas of all component counters
+    stats = s.flatten(sim.system.getStats()) if hasattr(sim.system, 'getStats') else {}
+    for key, value in stats.items():
+      snap[key] = value - s.prev_stats.get(key, 0)
+
+    s.write(snap)
+
+    s.prev_cycles = cycles
+    s.prev_insts  = insts
+    s.prev_stats  = stats
+    s.num_snaps  += 1
+
+  def write(s, snap):
+    if s.fmt == 'csv':
+      if s.csv_writer is None:
+        s.csv_writer = csv.DictWriter(s.file, fieldnames=list(snap.keys()))
+        if not s.has_header: s.csv_writer.writeheader()
+      s.csv_writer.writerow(snap)
+    else:
+      s.file.write(json.dumps(snap) + '\n')
+
+    s.file.flush()
+
+  def close(s):
+    if not s.file.closed:
+      s.file.close()
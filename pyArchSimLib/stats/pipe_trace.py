@@ -0,0 +1,203 @@
+# pipe_trace.py
+# --------------------------------------------------------------------
+#   Export of the pipeline activity for graphical viewers.
+#
+#   After every cycle, the pipeline registers of the core are compared
+#   with those of the previous cycle, and the stage changes of every
+#   instruction (identified by its fetch sequence number) are streamed
+#   to a file, either in the log format of the Konata pipeline viewer,
+#   or as Chrome trace events (for chrome://tracing or Perfetto), with
+#   one row per instruction and one microsecond per cycle.
+#
+#   An instruction is in F in the cycle it is fetched, and then in the
+#   stage that reads the pipeline register it sits in (D for f2d, X for
+#   d2x, M for x2m and W for m2w). Squashed instructions flow through
+#   the pipeline as bubbles and are flushed, rather than retired, at
+#   the end.
+#
+#   Only the instructions fetched within a cycle window (and, if asked
+#   for, within the ROI) are traced, so the files stay bounded.
+
+import json
+
+#=========================================================================
+# Writers
+#=========================================================================
+class KonataWriter():
+  def __init__(s, filename):
+    s.file    = open(filename, 'w', buffering=1 << 16)
+    s.cycle   = None
+    s.next_id = 0
+    s.retired = 0
+
+    s.file.write('Kanata\t0004\n')
+
+  def setCycle(s, cycle):
+    if s.cycle is None:
+      s.file.write('C=\t{}\n'.format(cycle))
+    elif cycle > s.cycle:
+      s.file.write('C\t{}\n'.format(cycle - s.cycle))
+    s.cycle = cycle
+
+  def newInst(s, inst, cycle):
+    s.setCycle(cycle)
+    inst['id'] = s.next_id
+    s.next_id += 1
+    s.file.write('I\t{}\t{}\t0\n'.format(inst['id'], inst['seq']))
+    s.file.write('L\t{}\t0\t{:08x}: \n'.format(inst['id'], inst['pc']))
+
+  def label(s, inst, cycle):
+    s.setCycle(cycle)
+    s.file.write('L\t{}\t0\t{}\n'.format(inst['id'], inst['mnemonic']))
+
+  def stage(s, inst, prev_stage, stage, cycle):
+    s.setCycle(cycle)
+    if prev_stage is not None:
+      s.file.write('E\t{}\t0\t{}\n'.format(inst['id'], prev_stage))
+    s.file.write('S\t{}\t0\t{}\n'.format(inst['id'], stage))
+
+  def retire(s, inst, cycle):
+    s.setCycle(cycle)
+    s.file.write('E\t{}\t0\t{}\n'.format(inst['id'], inst['stage']))
+    if inst['squashed']:
+      s.file.write('R\t{}\t0\t1\n'.format(inst['id']))
+    else:
+      s.file.write('R\t{}\t{}\t0\n'.format(inst['id'], s.retired))
+      s.retired += 1
+
+  def close(s, cycle):
+    s.file.close()
+
+class ChromeTraceWriter():
+  def __init__(s, filename):
+    s.file  = open(filename, 'w', buffering=1 << 16)
+    s.first = True
+
+    s.file.write('[\n')
+
+  def emit(s, event):
+    if not s.first: s.file.write(',\n')
+    s.first = False
+    s.file.write(json.dumps(event, separators=(',', ':')))
+
+  def newInst(s, inst, cycle):
+    inst['stages'] = []
+
+  def label(s, inst, cycle):
+    pass
+
+  def stage(s, inst, prev_stage, stage, cycle):
+    inst['stages'].append((stage, cycle))
+
+  # The events of an instruction are written once it leaves the pipeline
+  def retire(s, inst, cycle):
+    name = '{} {:#010x} {}'.format(inst['seq'], inst['pc'], inst['mnemonic'])
+
+    s.emit({'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': inst['seq'],
+            'args': {'name': name}})
+
+    stages = inst['stages'] + [(None, cycle)]
+    for (stage, start), (_, end) in zip(stages, stages[1:]):
+      s.emit({'name': stage, 'ph': 'X', 'pid': 0, 'tid': inst['seq'], 'ts': start, 'dur': end - start})
+
+    if inst['squashed']:
+      s.emit({'name': 'squash', 'ph': 'i', 's': 't', 'pid': 0, 'tid': inst['seq'], 'ts': cycle})
+
+  def close(s, cycle):
+    s.file.write('\n]\n')
+    s.file.close()
+
+#=========================================================================
+# Tracer
+#=========================================================================
+class PipeTracer():
+  # Pipeline registers, and the stage their instruction is in
+  stage_regs = (('f2d', 'D'), ('d2x', 'X'), ('x2m', 'M'), ('m2w', 'W'))
+
+  def __init__(s, filename, fmt=None, window=None, roi_only=False):
+    if fmt is None:
+      fmt = 'chrome' if filename.endswith('.json') else 'konata'
+
+    s.writer   = ChromeTraceWriter(filename) if fmt == 'chrome' else KonataWriter(filename)
+    s.window   = window
+    s.roi_only = roi_only
+
+    s.system = None
+    s.core   = None
+
+    # Traced instructions in the pipeline, by sequence number
+    s.live = {}
+
+    s.num_traced = 0
+    s.last_cycle = 0
+
+  def probeSystem(s, system):
+    # We only know about the default hierarchy for now.
+    s.system = system
+    s.core   = system.proc.core
+
+  def isRecording(s, cycle):
+    if s.window is not None and not (s.window[0] <= cycle < s.window[1]):
+      return False
+    if s.roi_only and not s.system.roiFlag():
+      return False
+    return True
+
+  # Called after the tick of `cycle`
+  def after(s, cycle):
+    # Past the window, with nothing left to follow
+    if s.window is not None and cycle >= s.window[1] and not s.live:
+      return
+
+    core   = s.core
+    writer = s.writer
+    nxt    = cycle + 1
+
+    live = s.live
+    seen = []
+
+    for name, stage in s.stage_regs:
+      reg = getattr(core, name)
+      if reg is None:
+        continue
+
+      seq  = reg['seq']
+      inst = live.get(seq)
+
+      if inst is None:
+        # Only instructions fetched in this cycle can be new
+        if name != 'f2d' or not s.isRecording(cycle):
+          continue
+
+        inst = {}
+        inst['seq'     ] = seq
+        inst['pc'      ] = reg['pc']
+        inst['mnemonic'] = '?'
+        inst['squashed'] = False
+        inst['stage'   ] = 'F'
+        live[seq] = inst
+        s.num_traced += 1
+
+        writer.newInst(inst, cycle)
+        writer.stage(inst, None, 'F', cycle)
+
+      seen.append(seq)
+
+      if inst['stage'] != stage:
+        if stage == 'X':
+          inst['squashed'] = reg['squashed']
+          inst['mnemonic'] = reg['mnemonic'] if not inst['squashed'] else '(squashed)'
+          writer.label(inst, nxt)
+
+        writer.stage(inst, inst['stage'], stage, nxt)
+        inst['stage'] = stage
+
+    # Instructions that left the pipeline
+    if len(seen) != len(live):
+      for seq in [seq for seq in live if seq not in seen]:
+        writer.retire(live.pop(seq), nxt)
+
+    s.last_cycle = nxt
+
+  def close(s):
+    s.writer.close(s.last_cycle)
@@ -0,0 +1,231 @@
+# simpoint.py
+# --------------------------------------------------------------------
+#   SimPoint-style selection of representative simulation regions.
+#
+#   The execution is split into intervals of a fixed number of
+#   instructions. For each interval, a basic-block vector (BBV) counts
+#   the instructions executed in every basic block. Intervals with
+#   similar BBVs behave similarly, so the intervals are clustered with
+#   k-means, and the interval closest to the center of each cluster
+#   stands for the whole cluster, weighted by the share of the
+#   instructions that the cluster covers.
+#
+#   As in SimPoint, the BBVs are normalized and randomly projected to
+#   a few dimensions before clustering, and the number of clusters is
+#   the smallest one whose Bayesian Information Criterion (BIC) score
+#   is within 90% of the best one.
+#
+#   Clustering requires NumPy; collecting the BBVs does not.
+
+from pyArchSimLib.arch.isa import mips32
+
+#=========================================================================
+# Basic-Block Vector Collection
+#=========================================================================
+class BbvCollector():
+  def __init__(s, interval):
+    s.interval = interval
+
+    # Basic blocks are numbered (from 1) by their first PC
+    s.block_ids = {}
+
+    # One {block id: instructions} per interval
+    s.bbvs           = []
+    s.interval_insts = []
+
+    # Current interval and block
+    s.bbv        = {}
+    s.num_insts  = 0
+    s.block_pc   = None
+    s.block_len  = 0
+
+    # Blocks end after control flow and syscalls
+    tbl = mips32.tables()
+    s.ends_block = [is_branch or kind == 'syscall'
+                    for is_branch, kind in zip(tbl['is_branch'], tbl['type'])]
+
+  def record(s, pc, iid):
+    if s.block_pc is None:
+      s.block_pc = pc
+    s.block_len += 1
+    s.num_insts += 1
+
+    if s.ends_block[iid]:
+      s.endBlock()
+
+    if s.num_insts == s.interval:
+      s.endInterval()
+
+  def endBlock(s):
+    if s.block_pc is None:
+      return
+
+    block_id = s.block_ids.get(s.block_pc)
+    if block_id is None:
+      block_id = len(s.block_ids) + 1
+      s.block_ids[s.block_pc] = block_id
+
+    s.bbv[block_id] = s.bbv.get(block_id, 0) + s.block_len
+
+    s.block_pc  = None
+    s.block_len = 0
+
+  def endInterval(s):
+    # A block crossing the boundary is split between the intervals
+    s.endBlock()
+
+    if s.num_insts > 0:
+      s.bbvs          .append(s.bbv      )
+      s.interval_insts.append(s.num_insts)
+
+    s.bbv       = {}
+    s.num_insts = 0
+
+  # Closes the last (partial) interval
+  def finish(s):
+    s.endInterval()
+
+  def getTotalInsts(s):
+    return sum(s.interval_insts)
+
+  # In the format of the SimPoint tool (one "T:id:count ..." line per
+  # interval)
+  def write(s, filename):
+    with open(filename, 'w') as file:
+      for bbv in s.bbvs:
+        file.write('T' + ' '.join(':{}:{}'.format(block_id, count)
+                                  for block_id, count in sorted(bbv.items())) + '\n')
+
+#=========================================================================
+# Region Selection
+#=========================================================================
+class SimPoint():
+  def __init__(s, max_k=10, dims=15, seed=1, max_iters=100, restarts=5, bic_threshold=0.9):
+    s.max_k         = max_k
+    s.dims          = dims
+    s.seed          = seed
+    s.max_iters     = max_iters
+    s.restarts      = restarts
+    s.bic_threshold = bic_threshold
+
+  # Returns the simulation points of the collected BBVs as a list of
+  # (start instruction, weight), ordered by start instruction
+  def pick(s, collector):
+    try:
+      import numpy as np
+    except ImportError:
+      raise ImportError('SimPoint selection requires NumPy')
+
+    num_intervals = len(collector.bbvs)
+    if num_intervals == 0:
+      return []
+
+    rng = np.random.default_rng(s.seed)
+
+    # Normalized BBVs
+    num_blocks = len(collector.block_ids)
+    bbvs = np.zeros((num_intervals, num_blocks))
+    for i, bbv in enumerate(collector.bbvs):
+      for block_id, count in bbv.items():
+        bbvs[i, block_id - 1] = count
+    bbvs /= bbvs.sum(axis=1, keepdims=True)
+
+    # Random projection
+    if num_blocks > s.dims:
+      proj = rng.uniform(-1.0, 1.0, size=(num_blocks, s.dims))
+      data = bbvs @ proj
+    else:
+      data = bbvs
+
+    # Cluster for every k, and keep the smallest k that scores well
+    max_k = min(s.max_k, num_intervals)
+
+    results = []
+    for k in range(1, max_k + 1):
+      labels, centers = s.kmeans(np, rng, data, k)
+      results.append((s.bic(np, data, labels, centers), labels, centers))
+
+    scores = [bic for bic, _, _ in results]
+    lo, hi = min(scores), max(scores)
+    for bic, labels, centers in results:
+      if bic >= lo + s.bic_threshold * (hi - lo):
+        break
+
+    # The interval closest to each center stands for its cluster
+    insts = np.array(collector.interval_insts, dtype=float)
+    total = insts.sum()
+
+    points = []
+    for c in range(len(centers)):
+      members = np.flatnonzero(labels == c)
+      if len(members) == 0:
+        continue
+      dists  = ((data[members] - centers[c]) ** 2).sum(axis=1)
+      rep    = int(members[np.argmin(dists)])
+      weight = float(insts[members].sum() / total)
+      points.append((rep * collector.interval, weight))
+
+    return sorted(points)
+
+  # k-means with k-means++ seeding; the best of a few restarts wins
+  def kmeans(s, np, rng, data, k):
+    best = None
+
+    for _ in range(s.restarts):
+      # Seeding
+      centers = data[[rng.integers(len(data))]]
+      while len(centers) < k:
+        dists = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        if dists.sum() == 0:
+          break
+        nxt     = rng.choice(len(data), p=dists / dists.sum())
+        centers = np.vstack([centers, data[nxt]])
+
+      # Lloyd's iterations
+      labels = None
+      for _ in range(s.max_iters):
+        dists      = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = dists.argmin(axis=1)
+        if labels is not None and (new_labels == labels).all():
+          break
+        labels = new_labels
+        for c in range(len(centers)):
+          members = data[labels == c]
+          if len(members) > 0:
+            centers[c] = members.mean(axis=0)
+
+      distortion = ((data - centers[labels]) ** 2).sum()
+      if best is None or distortion < best[0]:
+        best = (distortion, labels, centers)
+
+    return best[1], best[2]
+
+  # BIC of a clustering, as in X-means (Pelleg and Moore, 2000)
+  def bic(s, np, data, labels, centers):
+    n, d = data.shape
+    k    = len(centers)
+
+    distortion = ((data - centers[labels]) ** 2).sum()
+    variance   = distortion / max(n - k, 1)
+    if variance <= 0:
+      variance = np.finfo(float).tiny
+
+    loglik = 0.0
+    for c in range(k):
+      n_c = int((labels == c).sum())
+      if n_c == 0:
+        continue
+      loglik += (- n_c / 2.0 * np.log(2.0 * np.pi)
+                 - n_c * d / 2.0 * np.log(variance)
+                 - (n_c - k) / 2.0
+                 + n_c * np.log(n_c) - n_c * np.log(n))
+
+    num_params = (k - 1) + k * d + 1
+    return loglik - num_params / 2.0 * np.log(n)
+
+  @staticmethod
+  def write(points, interval, filename):
+    with open(filename, 'w') as file:
+      file.write('# start_inst weight (interval: {} instructions)\n'.format(interval))
+      for start, weight in points:
+        file.write('{} {:.6f}\n'.format(start, weight))
@@ -1 +1,2 @@
 from .basic import BasicSystem
+from .multicore import MulticoreSystem
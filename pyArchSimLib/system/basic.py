@@ -12,10 +12,10 @@ from pyArchSimLib.mem       import SimpleMultiportedMemory
 
 class BasicSystem():
   # Constructor
-  def __init__(s, doLinetrace=False):
+  def __init__(s, doLinetrace=False, core=None, mem_latency=0):
     # hawajkm: basic system includes a memory and a processor (for now).
-    s.proc = FiveStageInorderProcessor()
-    s.mem  = SimpleMultiportedMemory(2)
+    s.proc = FiveStageInorderProcessor(core)
+    s.mem  = SimpleMultiportedMemory(2, mem_latency)
 
     # Connect the parts
     s.proc.setMemCanReq    (s.mem.canReq  )
@@ -29,13 +29,21 @@ class BasicSystem():
     # Linetrace
     s.doLinetrace = doLinetrace
 
+    # Symbols of the loaded program (for profiling)
+    s.sym_tbl = {}
+
   # Executable loader
   def loader(s, elf):
     for section_name in elf['sections']:
       section   = elf['sections'][section_name]
       base_addr = section['base_addr']
       byte_arr  = section['bytes']
-      s.mem.write(base_addr, byte_arr, len(byte_arr))
+      s.mem.load(base_addr, byte_arr)
+
+    if 'entry' in elf:
+      s.proc.setEntryPoint(elf['entry'])
+
+    s.sym_tbl = dict(elf.get('sym_tbl', {}))
 
   # Get memory
   def getMem(s):
@@ -51,6 +59,18 @@ class BasicSystem():
   def instCompletionFlag(s):
     return s.proc.instCompletionFlag()
 
+  # Statistics
+  def getStats(s):
+    stats = s.proc.getStats()
+    stats['mem'] = s.mem.getStats()
+    return stats
+
+  # Functional execution (fast-forwarding)
+  def isDrained(s):
+    return s.proc.isDrained()
+  def step(s):
+    return s.proc.step()
+
   # Clocking
   def tick(s):
     s.proc.tick()
@@ -65,3 +85,6 @@ class BasicSystem():
       trace = '{} | >>=||=>> | {} |'.format(trace_proc, trace_mem)
 
       return trace
+
+  def linetraceHeader(s):
+    return '{} | {: <8} | {} |'.format(s.proc.linetraceHeader(), '', s.mem.linetraceHeader())
@@ -0,0 +1,259 @@
+# multicore.py
+# --------------------------------------------------------------------
+#   A system with several processors sharing one memory.
+#
+#   Every processor is the processor of the basic system, with its own
+#   core and caches; all the caches share the ports of the memory
+#   through a crossbar (see Crossbar), whose links can take
+#   `link_latency` cycles and carry `link_width` bytes per cycle, and
+#   whose ports can be banks interleaved every `mem_interleave` bytes.
+#   With `xbar_priority` ('icache' or 'dcache'), the icaches or the
+#   dcaches of all the cores get the ports first. Every core starts at
+#   its own entry point (the entry of the program by default) with its
+#   own stack, below the stack of the previous core, and can ask for
+#   its ID and the number of cores with syscalls (100 and 101).
+#
+#   A core that exits stops; the system exits once all the cores did,
+#   with the first non-zero exit code (in core order), if any.
+#
+#   With `coherence` ('msi' or 'mesi'), every processor gets a private
+#   write-back dcache, kept coherent over a snooping bus; otherwise the
+#   dcaches are pass-through, and ll/sc are handled by the memory.
+#
+#   The system can also be one group of the cores of a larger one (see
+#   ParallelSimulator): its cores are then numbered from `core_base`
+#   out of `num_cores`, and it is given the memory to share and, if the
+#   groups share it, the crossbar (`xbar`) its caches go through.
+
+# Imports
+from pyArchSimLib.proc import FiveStageInorderProcessor
+from pyArchSimLib.mem  import SimpleMultiportedMemory
+from pyArchSimLib.mem  import Crossbar
+from pyArchSimLib.mem  import SnoopBus
+from pyArchSimLib.mem  import CoherentCache
+
+class MulticoreSystem():
+  # Top of the stack of core 0
+  stack_top = 0x80000000
+
+  # Caches that can be given priority on the crossbar
+  priorities = ('icache', 'dcache')
+
+  # Constructor (`cores` holds one core per processor; None for the
+  # five-stage core)
+  def __init__(s, doLinetrace=False, cores=(None, None), mem_latency=0, mem_ports=2,
+               arbiter='rr', stack_size=0x10000, coherence=None, dcache_size=4096,
+               dcache_line=16, dcache_assoc=2, bus_latency=1, core_base=0, num_cores=None,
+               mem=None, link_latency=0, link_width=None, xbar_queue=1, mem_interleave=None,
+               xbar_priority=None, xbar=None):
+    s.bus = None
+    if coherence is not None:
+      s.bus = SnoopBus(coherence, bus_latency)
+
+    s.procs = []
+    for i, core in enumerate(cores):
+      dcache = None
+      if s.bus is not None:
+        dcache = CoherentCache(2 * i + 1, s.bus, dcache_size, dcache_line, dcache_assoc)
+      s.procs.append(FiveStageInorderProcessor(core, 2 * i, dcache))
+
+    s.xbar  = xbar
+    if xbar is None:
+      s.xbar = Crossbar(2 * len(s.procs), mem_ports, arbiter, link_latency, link_width,
+                        xbar_queue, mem_interleave, s.crossbarPriorities(xbar_priority, len(s.procs)))
+    s.mem   = mem if mem is not None else SimpleMultiportedMemory(mem_ports, mem_latency)
+
+    # Functional accesses see the lines of the coherent dcaches
+    memRead  = s.mem.read
+    memWrite = s.mem.write
+    if s.bus is not None:
+      s.bus.setMemReadFunct (s.mem.read )
+      s.bus.setMemWriteFunct(s.mem.write)
+      memRead  = s.bus.read
+      memWrite = s.bus.write
+
+    s.stack_size = stack_size
+    s.core_base  = core_base
+
+    # Connect the parts
+    for i, proc in enumerate(s.procs):
+      proc.setMemCanReq    (s.xbar.canReq  )
+      proc.setMemSendReq   (s.xbar.sendReq )
+      proc.setMemHasResp   (s.xbar.hasResp )
+      proc.setMemRecvResp  (s.xbar.recvResp)
+
+      proc.setMemReadFunct (memRead       )
+      proc.setMemWriteFunct(memWrite      )
+
+      proc.core.core_id   = core_base + i
+      proc.core.num_cores = num_cores if num_cores is not None else len(s.procs)
+      proc.core.rf[29]    = s.stack_top - (core_base + i) * stack_size
+
+    if xbar is None:
+      s.xbar.setMemCanReq  (s.mem.canReq  )
+      s.xbar.setMemSendReq (s.mem.sendReq )
+      s.xbar.setMemHasResp (s.mem.hasResp )
+      s.xbar.setMemRecvResp(s.mem.recvResp)
+
+    # Linetrace
+    s.doLinetrace = doLinetrace
+
+    # Symbols of the loaded program (for profiling)
+    s.sym_tbl = {}
+
+    # Cores still running, and what each core did
+    s.running    = [True for _ in s.procs]
+    s.inst_c     = 0
+    s.cycle      = 0
+    s.num_insts  = [0 for _ in s.procs]
+    s.num_cycles = [0 for _ in s.procs] # until the core exited
+
+  # Priorities of the requesters of a crossbar for `num_cores` cores
+  # (requesters 2i and 2i + 1 are the icache and dcache of core i)
+  @classmethod
+  def crossbarPriorities(cls, xbar_priority, num_cores):
+    if xbar_priority is None:
+      return None
+    if xbar_priority not in cls.priorities:
+      raise ValueError('unknown crossbar priority "{}" (expected one of: {})'.format(
+                       xbar_priority, ', '.join(cls.priorities)))
+    first = cls.priorities.index(xbar_priority)
+    return [1 if i % 2 == first else 0 for i in range(2 * num_cores)]
+
+  # Executable loader; `entry_points` gives the entry point of the
+  # first cores, as addresses or symbols (the others start at the
+  # entry of the program)
+  def loader(s, elf, entry_points=()):
+    for section_name in elf['sections']:
+      section   = elf['sections'][section_name]
+      base_addr = section['base_addr']
+      byte_arr  = section['bytes']
+      s.mem.load(base_addr, byte_arr)
+
+    s.sym_tbl = dict(elf.get('sym_tbl', {}))
+
+    if 'entry' in elf:
+      for proc in s.procs:
+        proc.setEntryPoint(elf['entry'])
+
+    if len(entry_points) > len(s.procs):
+      raise ValueError('{} entry points for {} cores'.format(len(entry_points), len(s.procs)))
+
+    for proc, entry in zip(s.procs, entry_points):
+      if not isinstance(entry, int):
+        if entry not in s.sym_tbl:
+          raise ValueError('unknown entry point "{}"'.format(entry))
+        entry = s.sym_tbl[entry]
+      proc.setEntryPoint(entry)
+
+  # Get memory
+  def getMem(s):
+    return s.mem
+
+  # Exit
+  def getExitStatus(s):
+    if any(s.running):
+      return False, 0
+    for proc in s.procs:
+      _, code = proc.getExitStatus()
+      if code != 0:
+        return True, code
+    return True, 0
+
+  # Flags (the ROI is open while any core is in it)
+  def roiFlag(s):
+    return any(proc.roiFlag() for proc in s.procs)
+  def instCompletionFlag(s):
+    return s.inst_c
+
+  # Statistics
+  def getStats(s):
+    stats = {}
+    for i, proc in enumerate(s.procs):
+      stats['core{}'.format(i)] = proc.getStats()
+    stats['interconnect'] = s.xbar.getStats()
+    if s.bus is not None:
+      stats['coherence'] = s.bus.getStats()
+    stats['mem'    ] = s.mem.getStats()
+    return stats
+
+  # Every core as (ID, cycles, instructions, memory grants, cycles
+  # waited for memory)
+  def coreStats(s):
+    rows = []
+    for i in range(len(s.procs)):
+      cycles = s.num_cycles[i] if not s.running[i] else s.cycle
+      grants = s.xbar.num_grants[2 * i] + s.xbar.num_grants[2 * i + 1]
+      waits  = s.xbar.num_waits [2 * i] + s.xbar.num_waits [2 * i + 1]
+      rows.append((s.core_base + i, cycles, s.num_insts[i], grants, waits))
+    return rows
+
+  @staticmethod
+  def printCoreStats(rows, cycle):
+    total = sum(row[2] for row in rows)
+
+    print('     {: <6} {: >12} {: >12} {: >8} {: >8} {: >12} {: >12}'.format(
+          'core', 'cycles', 'insts', 'IPC', 'share', 'mem grants', 'mem waits'))
+    for core, cycles, insts, grants, waits in rows:
+      print('     {: <6} {: >12} {: >12} {: >8.3f} {: >7.2f}% {: >12} {: >12}'.format(
+            core, cycles, insts, insts / cycles if cycles > 0 else 0.0,
+            100.0 * insts / total if total > 0 else 0.0, grants, waits))
+    print('     - Aggregate IPC = {:.3f}'.format(total / cycle if cycle > 0 else 0.0))
+    print('')
+
+  def printStats(s):
+    print(' + Cores ({}, sharing {} memory ports, {} arbitration):'.format(
+          len(s.procs), s.xbar.nports, s.xbar.policy))
+    s.printCoreStats(s.coreStats(), s.cycle)
+
+    s.xbar.printStats()
+
+    if s.bus is not None:
+      s.bus.printStats()
+
+  # Every pipeline is empty (there is no functional execution, i.e., no
+  # fast-forwarding, across cores)
+  def isDrained(s):
+    return all(proc.isDrained() for proc in s.procs)
+
+  # Clocking
+  def tick(s):
+    s.cycle += 1
+    s.inst_c = 0
+
+    for i, proc in enumerate(s.procs):
+      if not s.running[i]:
+        continue
+
+      proc.tick()
+
+      completed = proc.instCompletionFlag()
+      s.num_insts[i] += completed
+      s.inst_c       += completed
+
+      # The core stops, and lets go of the memory
+      if proc.getExitStatus()[0]:
+        s.running   [i] = False
+        s.num_cycles[i] = s.cycle
+        s.xbar.release(2 * i    )
+        s.xbar.release(2 * i + 1)
+
+    if s.bus is not None:
+      s.bus.tick()
+    s.xbar.tick()
+    s.mem.tick()
+
+  # Linetracing
+  def linetrace(s):
+    if s.doLinetrace:
+      trace_procs = ' || '.join(proc.linetrace() if s.running[i] else '(exited)'
+                                for i, proc in enumerate(s.procs))
+      trace_mem   = s.mem.linetrace()
+
+      trace = '{} | >>=||=>> | {} |'.format(trace_procs, trace_mem)
+
+      return trace
+
+  def linetraceHeader(s):
+    hdr_procs = ' || '.join(proc.linetraceHeader() for proc in s.procs)
+    return '{} | {: <8} | {} |'.format(hdr_procs, '', s.mem.linetraceHeader())
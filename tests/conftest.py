@@ -0,0 +1,8 @@
+# conftest.py
+# --------------------------------------------------------------------
+#   Makes pyArchSimLib importable from the tests, wherever pytest runs.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+# test_assembler.py
+# --------------------------------------------------------------------
+#   The assembler: the kernels assemble to the same bytes as with the
+#   original assembler, and the data directives pack their values.
+
+import hashlib
+import os
+import random
+import struct
+
+import pytest
+
+from pyArchSimLib.arch.isa import mips32
+from pyArchSimLib.arch     import assembler
+
+from util import KERNELS
+
+# SHA-256 of the sections of every kernel, as assembled by the original
+# assembler (with the uninitialized bytes zeroed; see sectionsDigest())
+KERNEL_DIGESTS = {
+  'isort.asm' : 'be8950286b776eb8867c0fc986dc2a95a30619a92b2ed1e4759c584c91acd3d3',
+  'llist.asm' : '8a1d012fedc7a0f4131c917ac39070584b9abc28f0186fd4ce24c72f5538f684',
+  'matmul.asm': '405e8660edca4dfd6e5568550f688e12400fcfd0b552b57c7957f160829b973b',
+  'memcpy.asm': 'cdf1d16da68245d9410ec846fea8ee4b598cef34c7ee748c26cc5c7153d4d992',
+  'qsort.asm' : '6d683611d68a27028faf8f8de188766dff5330f567051e754f9d0cef9a647edf',
+  'state.asm' : '43c021c3100ba1fe059c5ba19ee85eccf437facafab85672cf11f56cf8c2cd52',
+  'string.asm': 'c41fb707bd4306b8e7cf52a6631ae7f7413c611e08448bb13ca75c19f67dd6bd',
+  'vvadd.asm' : '095667595496ba8cfcb9a25c576aab396c926ae1ca05950d3add65b4ae7c8e7b',
+}
+
+def assemble(lines):
+  return assembler(mips32).assemble(lines)
+
+def sectionsDigest(elf):
+  h = hashlib.sha256()
+  for name in sorted(elf['sections']):
+    section = elf['sections'][name]
+    h.update(name.encode())
+    h.update(section['base_addr'].to_bytes(4, 'little'))
+    h.update(bytes(section['bytes']))
+  return h.hexdigest()
+
+def dataOf(directives):
+  elf = assemble(['.data'] + directives + ['.text', '  addu $t0, $t0, $t0'])
+  return bytes(elf['sections']['data']['bytes'])
+
+def test_all_kernels_have_a_digest():
+  assert sorted(f for f in os.listdir(KERNELS) if f.endswith('.asm')) == sorted(KERNEL_DIGESTS)
+
+@pytest.mark.parametrize('kernel', sorted(KERNEL_DIGESTS))
+def test_kernel_assembles_as_before(kernel, monkeypatch):
+  # .space and alignment padding are random; zero them
+  monkeypatch.setattr(random, 'randbytes', lambda n: bytes(n))
+
+  with open(os.path.join(KERNELS, kernel)) as file:
+    elf = assemble(file.readlines())
+  assert sectionsDigest(elf) == KERNEL_DIGESTS[kernel]
+
+def test_float_directives_pack_floats():
+  # Integer-looking literals are still floating-point values
+  assert dataOf(['  x: .float 1, 2.5', '  y: .double 3']) == struct.pack('<ffd', 1.0, 2.5, 3.0)
+
+def test_int_directives_pack_ints():
+  assert dataOf(['  x: .word -1, 0x10', '  y: .half 0x12345', '  z: .byte 255, -2']) == \
+         bytes.fromhex('ffffffff10000000' '4523' 'fffe')
+
+@pytest.mark.parametrize('directive', ['.word 1.5', '.half 2e3', '.byte x', '.float one'])
+def test_bad_literals_are_errors(directive):
+  with pytest.raises(SystemExit):
+    dataOf(['  x: ' + directive])
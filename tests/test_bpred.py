@@ -0,0 +1,22 @@
+# test_bpred.py
+# --------------------------------------------------------------------
+#   Branch prediction across the cores.
+
+import os
+
+import pytest
+
+from util import KERNELS, pasim, branchStats
+
+QSORT = os.path.join(KERNELS, 'qsort.asm')
+
+# The wider cores redirect fetch in the cycle they repair the
+# predictor; nothing fetched down the wrong path in that cycle may
+# update it afterwards (the RAS and the global history), so every
+# core sees the same mispredictions as the five-stage one
+@pytest.mark.parametrize('core', ['superscalar', 'ooo'])
+def test_no_wrong_path_updates_after_repair(core):
+  expected = branchStats(pasim(QSORT, '--bp', 'gshare'))
+  assert expected['return'] == (339, 3)
+
+  assert branchStats(pasim(QSORT, '--bp', 'gshare', '--core', core)) == expected
@@ -0,0 +1,163 @@
+# test_coherence.py
+# --------------------------------------------------------------------
+#   Directed tests of the coherent dcaches and their snooping bus. The
+#   caches are connected straight to the memory, one port each, and
+#   have a single one-line set, so that touching a second line evicts
+#   the first.
+
+import pytest
+
+from pyArchSimLib.mem import SnoopBus, CoherentCache, SimpleMultiportedMemory
+
+LINE = 16
+A    = 0x1000_0000
+B    = A + LINE
+
+class CoherentPair():
+  def __init__(s, protocol, mem_latency=0):
+    s.bus = SnoopBus(protocol)
+    s.mem = SimpleMultiportedMemory(2, mem_latency)
+    s.bus.setMemReadFunct (s.mem.read )
+    s.bus.setMemWriteFunct(s.mem.write)
+
+    s.caches = [CoherentCache(i, s.bus, LINE, LINE, 1) for i in range(2)]
+    for cache in s.caches:
+      cache.setMemCanReq  (s.mem.canReq  )
+      cache.setMemSendReq (s.mem.sendReq )
+      cache.setMemHasResp (s.mem.hasResp )
+      cache.setMemRecvResp(s.mem.recvResp)
+
+    # Known contents
+    s.mem.write(A, bytes(2 * LINE), 2 * LINE)
+
+  # Ticks as the multicore system does
+  def tick(s):
+    for cache in s.caches:
+      cache.tick()
+    s.bus.tick()
+    s.mem.tick()
+
+  # Sends a word access to cache `i`, and returns its response data
+  # once it is back
+  def access(s, i, op, addr, value=0):
+    req = {}
+    req['op'  ] = op
+    req['addr'] = addr
+    req['data'] = list(value.to_bytes(4, 'little'))
+    req['size'] = 4
+    req['mask'] = None
+    req['tag' ] = None
+
+    cache = s.caches[i]
+    cache.sendReq(req)
+    for _ in range(100):
+      if cache.hasResp():
+        return cache.recvResp()['data']
+      s.tick()
+    raise AssertionError('cache {} never answered'.format(i))
+
+  def load (s, i, addr): return int.from_bytes(s.access(i, 0, addr), 'little')
+  def store(s, i, addr, value): s.access(i, 1, addr, value)
+  def ll   (s, i, addr): return int.from_bytes(s.access(i, 2, addr), 'little')
+  def sc   (s, i, addr, value): return s.access(i, 3, addr, value)[0]
+
+  def state(s, i, addr):
+    line = s.caches[i].find(addr // LINE)
+    return line[0] if line is not None else 'I'
+
+  def memWord(s, addr):
+    return int.from_bytes(s.mem.read(addr, 4), 'little')
+
+@pytest.mark.parametrize('protocol', SnoopBus.protocols)
+def test_ping_pong_reaches_memory(protocol):
+  pair = CoherentPair(protocol)
+
+  # Each cache in turn reads what the other wrote, and writes the next
+  # value (into its own word of the line, too)
+  for n in range(1, 9):
+    i = n % 2
+    assert pair.load(i, A) == n - 1
+    pair.store(i, A, n)
+    pair.store(i, A + 4 + 4 * i, 100 + n)
+    assert pair.state(i, A) == 'M' and pair.state(1 - i, A) == 'I'
+
+  # Every read of the other cache flushed the modified line, but the
+  # last write is only in the cache
+  assert pair.memWord(A) == 7
+  assert pair.bus.num_flushes == 7
+
+  # A read of the other cache leaves both shared, and flushes the line
+  assert pair.load(1, A) == 8
+  assert pair.state(0, A) == 'S' and pair.state(1, A) == 'S'
+  assert pair.memWord(A) == 8
+
+  # Both write the line again, and evict it
+  pair.store(1, A, 9)
+  pair.store(0, A + 12, 200)
+  assert pair.state(0, A) == 'M' and pair.state(1, A) == 'I'
+  pair.load(0, B)
+  pair.load(1, B)
+
+  assert [pair.memWord(A + 4 * j) for j in range(4)] == [9, 108, 107, 200]
+  assert pair.caches[0].num_writebacks == 1
+  assert pair.bus.num_flushes == 8
+
+@pytest.mark.parametrize('protocol', SnoopBus.protocols)
+def test_writeback_in_flight_is_visible(protocol):
+  pair = CoherentPair(protocol, mem_latency=4)
+  pair.store(0, A, 42)
+
+  # Evict the line, and stop while the victim is on its way to memory
+  req = {'op': 0, 'addr': B, 'data': [], 'size': 4, 'mask': None, 'tag': None}
+  pair.caches[0].sendReq(req)
+  while pair.caches[0].inWriteback()[0] is None:
+    pair.tick()
+
+  assert pair.memWord(A) == 0
+  assert int.from_bytes(pair.bus.read(A, 4), 'little') == 42
+
+  # A functional write goes into the victim, and on to memory
+  pair.bus.write(A, (43).to_bytes(4, 'little'), 4)
+  while not pair.caches[0].hasResp():
+    pair.tick()
+  assert pair.memWord(A) == 43
+
+@pytest.mark.parametrize('protocol', SnoopBus.protocols)
+def test_sc_fails_after_remote_write(protocol):
+  pair = CoherentPair(protocol)
+
+  # Undisturbed, the pair goes through
+  assert pair.ll(0, A) == 0
+  assert pair.sc(0, A, 1) == 1
+  assert pair.load(1, A) == 1
+
+  # A write of the other cache invalidates the line, and the link
+  assert pair.ll(0, A) == 1
+  pair.store(1, A, 5)
+  assert pair.sc(0, A, 2) == 0
+  assert pair.load(0, A) == 5
+
+  # So does evicting the line
+  pair.ll(0, A)
+  pair.load(0, B)
+  assert pair.sc(0, A, 3) == 0
+
+  assert pair.caches[0].num_sc_fails == 2
+
+def test_memory_sc_fails_after_remote_write():
+  # Without coherent caches, the memory keeps the links
+  mem = SimpleMultiportedMemory(2)
+  mem.write(A, bytes(4), 4)
+
+  def access(port, op, value=0, src=None):
+    mem.sendReq(port, {'op': op, 'addr': A, 'data': list(value.to_bytes(4, 'little')),
+                       'size': 4, 'mask': None, 'tag': None, 'src': src})
+    return mem.recvResp(port)['data']
+
+  access(0, 2, src=0)
+  assert access(0, 3, 1, src=0)[0] == 1
+
+  access(0, 2, src=0)
+  access(1, 1, 5)
+  assert access(0, 3, 2, src=0)[0] == 0
+  assert int.from_bytes(mem.read(A, 4), 'little') == 5
@@ -0,0 +1,97 @@
+# test_isa.py
+# --------------------------------------------------------------------
+#   The precompiled ISA tables: every instruction decodes back to
+#   itself, and executes as specified on every core.
+
+import pytest
+
+from pyArchSimLib.arch.isa  import mips32
+from pyArchSimLib.arch      import assembler
+from pyArchSimLib.proc.core import SuperscalarInorderCore, OutOfOrderCore
+
+from util import simulate
+
+# An operand for every letter of the syntax
+OPERANDS = {'d': '$t0', 's': '$t1', 't': '$t2', 'T': '$t0', 'i': '5',
+            'S': '3', 'm': '4($t1)', 'p': 'here', 'l': 'here'}
+
+TBL = mips32.tables()
+
+@pytest.mark.parametrize('mnemonic', TBL['mnemonic'][1:])
+def test_instruction_decodes_to_itself(mnemonic):
+  iid  = TBL['ids'][mnemonic]
+  line = '  {} {}'.format(mnemonic, ', '.join(OPERANDS[op] for op in TBL['syntax'][iid]))
+
+  elf  = assembler(mips32).assemble(['.text', 'here:', line])
+  inst = int.from_bytes(bytes(elf['sections']['text']['bytes'][:4]), 'little')
+  assert mips32.decode(inst) == iid
+
+def test_undefined_instruction_decodes_to_0():
+  assert mips32.decode(0xffffffff) == 0
+
+# Loads a 32-bit constant
+def li(reg, value):
+  value &= 0xffffffff
+  return ['  lui   {}, {:#x}'.format(reg, value >> 16),
+          '  ori   {}, {}, {:#x}'.format(reg, reg, value & 0xffff)]
+
+# Every check runs `code`, which leaves its result in $t2, and counts a
+# failure in $s0 unless it is `expected`
+CHECKS = [
+  ('add',   li('$t0', 7) + li('$t1', -3) + ['  add   $t2, $t0, $t1'], 4),
+  ('sub',   li('$t0', 3) + li('$t1', 5)  + ['  subu  $t2, $t0, $t1'], -2),
+  ('nor',   ['  nor   $t2, $0, $0'], -1),
+  ('addiu', ['  addiu $t2, $0, -1'], -1),
+  ('andi',  li('$t0', -1) + ['  andi  $t2, $t0, 0xffff'], 0xffff),
+  ('xori',  li('$t0', -1) + ['  xori  $t2, $t0, 0x8000'], 0xffff7fff),
+  ('lui',   ['  lui   $t2, 0x8001'], 0x80010000),
+  ('mul',   li('$t0', -3) + li('$t1', 5) + ['  mul   $t2, $t0, $t1'], -15),
+  ('muh',   li('$t0', -3) + li('$t1', 1 << 30) + ['  muh   $t2, $t0, $t1'], -1),
+  ('mulu',  li('$t0', -3) + li('$t1', 1 << 30) + ['  mulu  $t2, $t0, $t1'], 0x40000000),
+  ('muhu',  li('$t0', -3) + li('$t1', 1 << 30) + ['  muhu  $t2, $t0, $t1'], 0x3fffffff),
+  ('div',   li('$t0', -7) + li('$t1', 2) + ['  div   $t2, $t0, $t1'], -3),
+  ('mod',   li('$t0', 7)  + li('$t1', 3) + ['  mod   $t2, $t0, $t1'], 1),
+  ('divu',  li('$t0', -7) + li('$t1', 2) + ['  divu  $t2, $t0, $t1'], 0x7ffffffc),
+  ('modu',  li('$t0', -7) + li('$t1', 2) + ['  modu  $t2, $t0, $t1'], 1),
+  ('sll',   li('$t0', 3) + ['  sll   $t2, $t0, 30'], 0xc0000000),
+  ('srl',   li('$t0', 1 << 31) + ['  srl   $t2, $t0, 4'], 0x08000000),
+  ('sra',   li('$t0', 1 << 31) + ['  sra   $t2, $t0, 4'], 0xf8000000),
+  ('sllv',  li('$t0', 1) + li('$t1', 33) + ['  sllv  $t2, $t0, $t1'], 2),
+  ('srav',  li('$t0', 1 << 31) + li('$t1', 36) + ['  srav  $t2, $t0, $t1'], 0xf8000000),
+  ('lb',    li('$t0', 0x8081) + ['  la    $t1, scratch', '  sh    $t0, 0($t1)', '  lb    $t2, 0($t1)'], 0xffffff81),
+  ('lbu',   li('$t0', 0x8081) + ['  la    $t1, scratch', '  sh    $t0, 0($t1)', '  lbu   $t2, 1($t1)'], 0x80),
+  ('lh',    li('$t0', 0x8001) + ['  la    $t1, scratch', '  sw    $t0, 0($t1)', '  lh    $t2, 0($t1)'], 0xffff8001),
+  ('lhu',   li('$t0', 0x8001) + ['  la    $t1, scratch', '  sw    $t0, 0($t1)', '  lhu   $t2, 0($t1)'], 0x8001),
+  ('sb',    li('$t0', 0x11223344) + ['  la    $t1, scratch', '  sw    $t0, 0($t1)',
+                                     '  addiu $t3, $0, 0x55', '  sb    $t3, 2($t1)', '  lw    $t2, 0($t1)'], 0x11553344),
+  ('ll/sc', ['  la    $t1, scratch', '  ll    $t0, 0($t1)', '  addiu $t2, $0, 9',
+             '  sc    $t2, 0($t1)', '  lw    $t3, 0($t1)', '  addu  $t2, $t2, $t3'], 10),
+  ('bltz',  li('$t0', -1) + ['  addu  $t2, $0, $0', '  bltz  $t0, 1f', '  addiu $t2, $0, 1', '1f:'], 0),
+  ('bgez',  li('$t0', -1) + ['  addu  $t2, $0, $0', '  bgez  $t0, 1f', '  addiu $t2, $0, 1', '1f:'], 1),
+  ('blez',  ['  addu  $t2, $0, $0', '  blez  $0, 1f', '  addiu $t2, $0, 1', '1f:'], 0),
+  ('bgtz',  ['  addu  $t2, $0, $0', '  bgtz  $0, 1f', '  addiu $t2, $0, 1', '1f:'], 1),
+  ('jal/jr', ['  addu  $t2, $0, $0', '  jal   1f', '  addiu $t2, $t2, 1', '  j     2f',
+              '1f:', '  addiu $t2, $t2, 2', '  jr    $ra', '2f:'], 3),
+]
+
+def checkProgram():
+  lines = ['.data', '  scratch: .word 0', '.text', '  addu  $s0, $0, $0']
+  for n, (_, code, expected) in enumerate(CHECKS):
+    # Labels are local to every check
+    code = [line.replace('1f', 'c{}_1'.format(n)).replace('2f', 'c{}_2'.format(n)) for line in code]
+    lines += code
+    lines += li('$t3', expected)
+    lines += ['  beq   $t2, $t3, ok{}'.format(n),
+              '  addiu $s0, $s0, 1',
+              'ok{}:'.format(n)]
+  lines += ['  addu  $a0, $s0, $0', '  addiu $v0, $0, 17', '  syscall']
+  return lines
+
+@pytest.mark.parametrize('core', [
+  lambda: None,
+  lambda: SuperscalarInorderCore(width=2),
+  lambda: OutOfOrderCore(width=2),
+], ids=['five-stage', 'superscalar', 'ooo'])
+def test_instructions_execute_as_specified(core):
+  exit_cond, exit_status, _ = simulate(checkProgram(), core())
+  assert exit_cond and exit_status == 0, '{} checks failed'.format(exit_status)
@@ -0,0 +1,35 @@
+# test_linetrace.py
+# --------------------------------------------------------------------
+#   The header of the linetrace against its rows.
+
+import os
+import re
+
+import pytest
+
+from util import KERNELS, PARALLEL, pasim
+
+VVADD  = os.path.join(KERNELS , 'vvadd.asm' )
+PCOUNT = os.path.join(PARALLEL, 'pcount.asm')
+
+# Offsets of the column separators of a line (not the '|' of a stall)
+def separators(line):
+  return [m.start() for m in re.finditer(r' \|\|? ', line)]
+
+@pytest.mark.parametrize('args', [
+  [VVADD],
+  [VVADD, '--fetch-queue', '4'],
+  [VVADD, '--core', 'superscalar'],
+  [VVADD, '--core', 'superscalar', '--issue-width', '3'],
+  [VVADD, '--core', 'ooo'],
+  [PCOUNT, '--cores', '2', '--coherence', 'msi'],
+])
+def test_header_matches_rows(args):
+  lines  = pasim(*args, '-l', '-m', 50, rc=2).splitlines()
+  header = next(line for line in lines if line.startswith('| Cycle'))
+  rows   = [line for line in lines if re.match(r' *\d+ \| ', line)]
+  assert rows
+
+  for row in rows:
+    assert separators(row) == separators(header), row
+    assert len(row) == len(header), row
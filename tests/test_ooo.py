@@ -0,0 +1,97 @@
+# test_ooo.py
+# --------------------------------------------------------------------
+#   The out-of-order core: renaming and speculation leave the results
+#   of the programs alone, and loads get their data from the right
+#   older store.
+
+import os
+
+import pytest
+
+from pyArchSimLib.proc.core  import OutOfOrderCore
+from pyArchSimLib.proc.bpred import BranchPredictor
+
+from util import KERNELS, simulate
+
+# Instructions every kernel completes (as on the five-stage core)
+KERNEL_INSTS = {
+  'isort.asm' : 54446,
+  'llist.asm' : 33300,
+  'matmul.asm': 38827,
+  'memcpy.asm': 29920,
+  'qsort.asm' : 26812,
+  'state.asm' : 50259,
+  'string.asm': 25557,
+  'vvadd.asm' : 40138,
+}
+
+@pytest.mark.parametrize('kernel', sorted(KERNEL_INSTS))
+def test_kernel_passes(kernel):
+  # (with a predictor, for wrong paths to squash)
+  core = OutOfOrderCore(width=2)
+  core.setBranchPredictor(BranchPredictor.make('gshare'))
+
+  exit_cond, exit_status, sim = simulate(os.path.join(KERNELS, kernel), core)
+  assert (exit_cond, exit_status) == (True, 0)
+  assert sim.tot_num_insts == KERNEL_INSTS[kernel]
+
+# Every check compares $t6 to $t7, and counts a failure in $s0
+def check(n):
+  return ['  beq   $t6, $t7, ok{}'.format(n), '  addiu $s0, $s0, 1', 'ok{}:'.format(n)]
+
+LSQ_PROGRAM = [
+  '.data',
+  '  buf: .word 0, 0, 0, 0, 0',
+  '.text',
+  '  la    $t1, buf',
+  '  addu  $s0, $0, $0',
+
+  # The address of a store comes late (after a division), and a younger
+  # load of the same word has to wait for it
+  '  addiu $t0, $0, 64',
+  '  addiu $t2, $0, 16',
+  '  div   $t3, $t0, $t2',
+  '  addu  $t4, $t1, $t3',
+  '  addiu $t5, $0, 77',
+  '  sw    $t5, 0($t4)',
+  '  lw    $t6, 4($t1)',
+  '  addiu $t7, $0, 77',
+] + check(0) + [
+  # ... and so does a load of another word, which reads memory
+  '  div   $t3, $t0, $t2',
+  '  addu  $t4, $t1, $t3',
+  '  sw    $t5, 12($t4)',
+  '  lw    $t6, 0($t1)',
+  '  addu  $t7, $0, $0',
+] + check(1) + [
+  # A load covered by an older store gets its data
+  '  addiu $t5, $0, 55',
+  '  sw    $t5, 8($t1)',
+  '  lw    $t6, 8($t1)',
+  '  addiu $t7, $0, 55',
+] + check(2) + [
+  # A load partially covered by the youngest older store waits for it,
+  # and sees both stores
+  '  lui   $t5, 0x1122',
+  '  ori   $t5, $t5, 0x3344',
+  '  sw    $t5, 12($t1)',
+  '  addiu $t5, $0, 0x55',
+  '  sb    $t5, 13($t1)',
+  '  lw    $t6, 12($t1)',
+  '  lui   $t7, 0x1122',
+  '  ori   $t7, $t7, 0x5544',
+] + check(3) + [
+  '  addu  $a0, $s0, $0',
+  '  addiu $v0, $0, 17',
+  '  syscall',
+]
+
+def test_loads_get_the_right_store():
+  core = OutOfOrderCore(width=2)
+  exit_cond, exit_status, _ = simulate(LSQ_PROGRAM, core)
+  assert (exit_cond, exit_status) == (True, 0), '{} checks failed'.format(exit_status)
+
+  # Every case above was met
+  assert core.stall_stats['ld_addr'   ] > 0
+  assert core.stall_stats['ld_overlap'] > 0
+  assert core.num_forwarded > 0
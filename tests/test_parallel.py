@@ -0,0 +1,31 @@
+# test_parallel.py
+# --------------------------------------------------------------------
+#   Parallel simulation: with the default quantum, splitting the cores
+#   among host processes must not change the simulation.
+
+import os
+import re
+
+import pytest
+
+from util import PARALLEL, pasim, stat
+
+PCOUNT = os.path.join(PARALLEL, 'pcount.asm')
+
+# What has to match: the cycles and instructions, of the whole run and
+# of the ROI, the rows of every core and of every memory port
+def summary(out):
+  rows = re.findall(r'^ +\d+ .*$', out, re.MULTILINE)
+  return ([stat(out, name) for name in ('Total Number of Cycles',
+                                        'Total Number of Completed Instructions',
+                                        'ROI Number of Cycles',
+                                        'ROI Number of Completed Instructions')], rows)
+
+@pytest.mark.parametrize('procs, opts', [
+  (2, []),
+  (4, []),
+  (3, ['--link-latency', 1, '--xbar-queue', 2, '--arbiter', 'fixed']),
+])
+def test_host_procs_match_a_single_process(procs, opts):
+  args = [PCOUNT, '--cores', 4] + opts
+  assert summary(pasim(*args, '--host-procs', procs)) == summary(pasim(*args))
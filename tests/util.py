@@ -0,0 +1,52 @@
+# util.py
+# --------------------------------------------------------------------
+#   Helpers of the tests: runs pasim on a program and reads back the
+#   statistics it prints, or simulates a program in the test itself.
+
+import os
+import re
+import subprocess
+import sys
+
+from pyArchSimLib.arch.isa import mips32
+from pyArchSimLib.arch     import assembler
+from pyArchSimLib.system   import BasicSystem
+from pyArchSimLib.sim      import Simulator
+
+ROOT     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KERNELS  = os.path.join(ROOT, 'benchmarks', 'kernels')
+PARALLEL = os.path.join(ROOT, 'benchmarks', 'parallel')
+
+# Runs pasim with `args` (without the assembly cache), and returns its
+# output; fails on a non-zero exit code unless it is `rc`
+def pasim(*args, rc=0):
+  cmd  = [sys.executable, os.path.join(ROOT, 'pasim'), '--no-asm-cache'] + [str(arg) for arg in args]
+  proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+  assert proc.returncode == rc, proc.stdout + proc.stderr
+  return proc.stdout
+
+# Value of the first "- `name` = value" line of `out`
+def stat(out, name):
+  m = re.search(r'- {} = (\S+)'.format(re.escape(name)), out)
+  assert m is not None, 'no "{}" in the output'.format(name)
+  return m.group(1)
+
+# Branches executed and mispredicted of every kind, from --bp
+def branchStats(out):
+  return {kind: (int(executed), int(mispredicted)) for kind, executed, mispredicted in
+          re.findall(r'- (\w+): +(\d+) executed, +(\d+) mispredicted', out)}
+
+# Assembles `source` (the lines of a program, or the path of one), and
+# simulates it on `core` (None for the five-stage core); returns the
+# exit condition and status, and the simulator
+def simulate(source, core=None, mem_latency=0, max_num_cycle=1000000):
+  if isinstance(source, str):
+    with open(source) as file:
+      source = file.readlines()
+
+  system = BasicSystem(False, core, mem_latency)
+  system.loader(assembler(mips32).assemble(source))
+
+  sim = Simulator(system, max_num_cycle)
+  exit_cond, exit_status = sim.run()
+  return exit_cond, exit_status, sim